@@ -0,0 +1,342 @@
+'''
+Reader for the native PHI (MultiPak) .spe spectrum and .pro depth profile files written by
+the Phi Versaprobe II, so they can be used without exporting VAMAS first.
+
+A native file is a text header between SOFH and EOFH lines ('Key: value' lines describing the
+acquisition and the spectral regions), followed by a binary section:
+    4 uint32         group, number of entries, bytes of entry headers, 16
+    per entry        24 uint32: entry number, 2 flags, spectral region (0 for the
+                     profile tables), data type, number of points, number of rows, 1,
+                     axis and unit names (up to 4 ASCII characters each), ...,
+                     data length [bytes], data offset from the start of the binary section
+    data             little-endian float32, (number of rows, number of points) per entry
+A .pro file has one row per sputter cycle and two extra tables of (region, cycle), the etch
+time in s and the profile intensities. The .sff files next to them are CasaXPS display
+settings, not data.
+
+SPEparser fills the same VAMASExperiment and VAMASBlock records as a VAMAS export of the file
+by CasaXPS (blocks ordered by region, then cycle), so everything written for VAMASparser works
+on it, and VAMASwriter can write it out as VAMAS. The float32 intensities (c/s) are read
+with np.frombuffer, never decoded through text, and converted to float64 counts (c/s times
+the dwell time and number of scans) as in the VAMAS export, so blocks from either source
+can be mixed.
+'''
+
+import mmap
+import re
+
+import numpy as np
+
+from VAMASparse import VAMASparser, VAMASExperiment, VAMASBlock, VAMAS_ENCODING
+from VAMASparse import NUMERIC, REPEATED, ORDINATES
+from VAMASspecs import *
+
+NATIVE_EXTENSIONS = ('.spe', '.pro')
+
+ENTRY_DTYPE = np.dtype('<u4')
+# fields of the 24 uint32 header of each entry of the binary section
+ENTRY_NUMBER = 0
+ENTRY_REGION = 3
+ENTRY_POINTS = 5
+ENTRY_ROWS = 6
+ENTRY_UNITS = 14
+ENTRY_LENGTH = 19
+ENTRY_OFFSET = 20
+ENTRY_SIZE = 24
+
+# VAMAS value for unknown fields
+UNKNOWN = '1e+037'
+
+class SPEparser(VAMASparser):
+    def __init__(self, filename):
+        '''
+        filename: full path+name of .spe or .pro file to read [string]
+
+        This is a class for parsing native PHI files into the VAMASparser containers.
+        To parse data into these variables, use SPEparser.read_SPE()
+        '''
+        super().__init__(filename)
+        # 'Key: value' lines of the text header; keys that repeat hold a list of values
+        self.header = {}
+        self.header_lines = []
+
+    def read_SPE(self, memory_map=False, lazy=False, cache_size=64, stats=None):
+        '''
+        memory_map: if True, mmap the file instead of reading it into memory
+        lazy, cache_size: accepted so SPEparser can stand in for VAMASparser, and ignored;
+            the binary section is read in one piece, so there is nothing to defer
+        stats: must be None, parse statistics (VAMASstats) are only kept for VAMAS files
+
+        reads the file into self.VAMASExperiment and self.blocks
+
+        returns self.VAMASExperiment and list of VAMASBlocks
+        '''
+        if stats is not None:
+            raise TypeError('parse statistics are only recorded for VAMAS files, not %s' % self.filename)
+        with open(self.filename, 'rb') as file:
+            if memory_map:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+                    self.read_data(mapping)
+            else:
+                self.read_data(file.read())
+        return self.VAMASExperiment, self.blocks
+
+    # so code written for VAMASparser can read native files too
+    read_VAMAS = read_SPE
+
+    def read_data(self, data):
+        '''
+        data: contents of the file [bytes or mmap]
+
+        reads data into self.VAMASExperiment and self.blocks; the blocks hold no views of data
+        '''
+        binary_start = self.read_header(data)
+        entries, tables = self.read_entries(data, binary_start)
+        self.build_experiment(tables)
+        self.build_blocks(entries, tables)
+
+    def read_header(self, data):
+        '''
+        data: contents of the file [bytes or mmap]
+
+        reads the text header into self.header, replacing any header read before
+
+        returns byte offset of the binary section
+        '''
+        end = data.find(b'\nEOFH')
+        if end < 0 or not data[:4] == b'SOFH':
+            raise ValueError('%s is not a PHI .spe/.pro file' % self.filename)
+        binary_start = data.find(b'\n', end + 1) + 1
+
+        self.header = {}
+        self.header_lines = data[:end].decode(VAMAS_ENCODING).splitlines() + ['EOFH']
+        for line in self.header_lines:
+            if ':' not in line:
+                continue
+            key, value = line.split(':', 1)
+            value = value.strip()
+            if key in self.header:
+                if not isinstance(self.header[key], list):
+                    self.header[key] = [self.header[key]]
+                self.header[key].append(value)
+            else:
+                self.header[key] = value
+        return binary_start
+
+    def header_list(self, key):
+        '''
+        key: header key
+
+        returns list of the values of key (empty if the header has none)
+        '''
+        value = self.header.get(key, [])
+        return value if isinstance(value, list) else [value]
+
+    def header_word(self, key, default=UNKNOWN):
+        '''
+        key: header key
+
+        returns first word of the value of key, e.g. '4.399' for 'AnalyserWorkFcn: 4.399 eV'
+        '''
+        values = self.header_list(key)
+        words = values[0].split() if values else []
+        return words[0] if words else default
+
+    def read_entries(self, data, binary_start):
+        '''
+        data: contents of the file [bytes or mmap]
+        binary_start: byte offset of the binary section
+
+        returns list of (entry header [uint32 array], values [float32 array of shape
+        (rows, points)]) for the spectral regions, and dictionary of units: values [float32
+        array of shape (regions, cycles)] for the region 0 tables of a depth profile (e.g. 's'
+        for the etch times)
+        '''
+        group, num_entries, entries_length, preamble_length = np.frombuffer(data, ENTRY_DTYPE, 4, binary_start)
+        headers = np.frombuffer(data, ENTRY_DTYPE, num_entries*ENTRY_SIZE,
+            binary_start + 4*4).reshape(num_entries, ENTRY_SIZE)
+
+        entries = []
+        tables = {}
+        for header in headers:
+            num_points, num_rows = int(header[ENTRY_POINTS]), int(header[ENTRY_ROWS])
+            item_size = int(header[ENTRY_LENGTH])//(num_points*num_rows)
+            # a view of the file's bytes, converted by build_blocks
+            values = np.frombuffer(data, '<f%d' % item_size, num_points*num_rows,
+                binary_start + int(header[ENTRY_OFFSET])).reshape(num_rows, num_points)
+            if header[ENTRY_REGION]:
+                entries.append((header, values))
+            else:
+                # (region, cycle)
+                tables[entry_text(header[ENTRY_UNITS])] = values
+        return entries, tables
+
+    def build_experiment(self, tables):
+        '''
+        tables: region 0 tables from read_entries
+
+        fills in self.VAMASExperiment from the header
+        '''
+        experiment = VAMASExperiment()
+        experiment.format_identifier = 'VAMAS Surface Chemical Analysis Standard Data Transfer Format 1988 May 4'
+        experiment.institution_identifier = self.header.get('Institution', '')
+        experiment.instrument_model_identifier = self.header.get('InstrumentModel', '')
+        experiment.operator_identifier = self.header.get('Operator', '')
+        experiment.experiment_identifier = 'FILE:%s;BATCH:%s;DESC:%s' % (self.header.get('AcqFilename', ''),
+            self.header.get('ExperimentID', ''), self.header.get('FileDesc', ''))
+        # the native header is kept as the comment, as CasaXPS does
+        experiment.comment = self.header_lines
+        experiment.number_of_lines_in_comment = len(self.header_lines)
+        experiment.experiment_mode = 'NORM'
+        experiment.scan_mode = 'REGULAR'
+        experiment.experiment_mode_type = ExperimentMode.NORM
+        experiment.scan_mode_type = ScanMode.REGULAR
+        experiment.number_of_spectral_regions = 0
+        if 's' in tables:
+            experiment.number_of_exp_variables = 1
+            experiment.exp_variable_label = ['Etch Time']
+            experiment.exp_variable_unit = ['s']
+        else:
+            experiment.number_of_exp_variables = 0
+        experiment.number_of_entries_include_list = 0
+        experiment.number_of_manually_entered_items = 0
+        experiment.number_of_future_upgrade_exp_entries = 0
+        experiment.number_of_future_upgrade_block_entries = 0
+        self.VAMASExperiment = experiment
+        self.prepare_block_layouts()
+
+    def build_blocks(self, entries, tables):
+        '''
+        entries: spectral region entries from read_entries
+        tables: region 0 tables from read_entries
+
+        fills in self.blocks, one block per row (cycle) of each region, with the intensities
+        converted from c/s to counts
+        '''
+        regions = {}
+        for definition in self.header_list('SpectralRegDef'):
+            words = definition.split()
+            regions[int(words[0])] = words
+
+        # fields shared by all blocks, set up once
+        shared = VAMASBlock()
+        source_words = self.header.get('XraySource', 'Al 1486.6').split()
+        date = (self.header.get('FileDate', '') or '0 0 0').split()
+        shared.sample_identifier = self.header.get('FileDesc', '')
+        shared.year, shared.month, shared.day = date[:3]
+        shared.hours = shared.minutes = shared.seconds = shared.number_of_hours_in_advance_of_GMT = '0'
+        shared.number_of_lines_in_comment = 0
+        shared.comment = []
+        shared.technique = self.header.get('Technique', 'XPS')
+        shared.technique_type = Technique.from_label(shared.technique)
+        shared.analysis_source_label = source_words[0]
+        shared.analysis_source_characteristic_energy = float(source_words[1])
+        shared.analysis_source_strength = self.header_word('XrayPower')
+        shared.analysis_source_beam_width_x = shared.analysis_source_beam_width_y = \
+            '%g' % float(self.header_word('XrayBeamDiameter', 'nan'))
+        shared.analyzer_mode = self.header.get('AnalyserMode', UNKNOWN)
+        shared.analyzer_work_function = self.header_word('AnalyserWorkFcn')
+        shared.charge_of_detected_particle = '-1'
+        # the native file is in binding energy, VAMAS in kinetic energy
+        shared.abscissa_label = 'Kinetic Energy'
+        shared.abscissa_units = 'eV'
+        shared.number_of_corresponding_variables = 1
+        shared.corresponding_variable_label = ['Intensity']
+        shared.signal_mode = 'pulse counting'
+        shared.number_of_scans = '1'
+        shared.number_of_additional_params = 1
+        shared.additional_param_label = ['PHI_AtomicNumber']
+        shared.additional_param_units = ['d']
+        shared.future_upgrade_block_entry = []
+        fill_unknown(shared, self.compile_block_layout(shared.technique_type))
+        shared_fields = [(name, getattr(shared, name)) for name in VAMASBlock.__slots__ if hasattr(shared, name)]
+
+        self.blocks = []
+        for header, values in entries:
+            region = int(header[ENTRY_REGION])
+            # number, ?, name, atomic number, points, step, start, end, ?, ?, dwell time, pass energy, mode
+            words = regions[region]
+            name, step, start = words[2], float(words[5]), float(words[6])
+            species, transition = split_region_name(name)
+            dwell_time = float(words[10])
+            units = entry_text(header[ENTRY_UNITS])
+            if units == 'c/s':
+                counts = values.astype(np.float64)*(dwell_time*float(shared.number_of_scans))
+                # plain counts, as in the VAMAS export
+                units = 'd'
+            else:
+                counts = values.astype(np.float64)
+            minimum = counts.min(axis=1)
+            maximum = counts.max(axis=1)
+            for row in range(len(values)):
+                block = VAMASBlock()
+                for field, value in shared_fields:
+                    setattr(block, field, list(value) if isinstance(value, list) else value)
+                block.block_identifier = ' '.join(part for part in (species, transition, str(len(self.blocks) + 1)) if part)
+                if 's' in tables:
+                    block.value_of_experimental_variable = ['%g' % (tables['s'][region - 1, row] + 0.0)]
+                block.analyzer_pass_energy = '%g' % float(words[11])
+                block.species_label = species
+                block.transition_state_label = transition
+                block.abscissa_start = block.analysis_source_characteristic_energy - start
+                block.abscissa_increment = -step
+                block.corresponding_variable_units = [units]
+                block.signal_collection_time = '%g' % dwell_time
+                block.additional_param_value = [words[3]]
+                block.ordinate_value = counts[row:row + 1]
+                block.number_of_ordinate_values = values.shape[1]
+                block.minimum_ordinate_value = [repr(float(minimum[row]))]
+                block.maximum_ordinate_value = [repr(float(maximum[row]))]
+                self.blocks.append(block)
+        self.VAMASExperiment.number_of_blocks = len(self.blocks)
+
+def entry_text(value):
+    '''
+    value: uint32 of an entry header holding up to 4 ASCII characters
+
+    returns the characters, e.g. 'c/s'
+    '''
+    return int(value).to_bytes(4, 'little').rstrip(b'\x00').decode(VAMAS_ENCODING)
+
+def split_region_name(name):
+    '''
+    name: PHI region name, e.g. 'In3d5'
+
+    returns species and transition, e.g. 'In' and '3d5'; PHI's survey region Su1s is kept whole
+    '''
+    match = re.match(r'([A-Z][a-z]?)(\d.*)$', name)
+    if match is None or name.startswith('Su'):
+        return name, ''
+    return match.group(1), match.group(2)
+
+def fill_unknown(block, layout):
+    '''
+    block: VAMASBlock
+    layout: compiled block layout from VAMASparser.compile_block_layout
+
+    sets every field of layout that block does not have to the VAMAS unknown value
+    '''
+    for kind, names, count in layout:
+        for name in names:
+            if hasattr(block, name):
+                continue
+            if kind == REPEATED:
+                setattr(block, name, [])
+            elif kind == NUMERIC:
+                setattr(block, name, 0)
+            elif kind != ORDINATES:
+                setattr(block, name, UNKNOWN)
+
+def open_parser(filename, memory_map=False):
+    '''
+    filename: full path+name of a .vms, .spe or .pro file [string]
+    memory_map: passed on to read_VAMAS/read_SPE
+
+    returns parsed VAMASparser, or SPEparser for native PHI files
+    '''
+    if filename.lower().endswith(NATIVE_EXTENSIONS):
+        parser = SPEparser(filename)
+    else:
+        parser = VAMASparser(filename)
+    parser.read_VAMAS(memory_map=memory_map)
+    return parser
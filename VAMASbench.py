@@ -0,0 +1,304 @@
+'''
+Benchmarks for VAMASparser.
+
+Generates synthetic VAMAS files whose blocks follow the same optional-field rules as
+VAMASparser.compile_block_layout, and times reading them (eager, memory-mapped and lazy),
+reading out every block with get_x_vals/get_y_vals, and peak memory. The example_data
+.vms files are included as realistic fixtures.
+
+Run from the repository folder, e.g.
+    python VAMASbench.py --quick
+    python VAMASbench.py --save bench_baseline.json
+    python VAMASbench.py --compare bench_baseline.json
+'''
+
+import argparse
+import glob
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from VAMASparse import VAMASparser, FIELD, NUMERIC, FLOAT, REPEATED, ORDINATES
+from VAMASspecs import *
+
+# (experiment mode, number of blocks, points per block, corresponding variables)
+FULL_CASES = (
+    [('NORM', num_blocks, 200, 1) for num_blocks in (1, 10, 100, 500, 2000)]
+    + [('NORM', 4, num_points, 1) for num_points in (100, 1000, 10000, 100000)]
+    + [('NORM', 20, 1000, num_variables) for num_variables in (1, 2, 4)]
+    + [(experiment_mode, 100, 500, 1) for experiment_mode in ('NORM', 'SDP', 'MAP')]
+)
+
+QUICK_CASES = (
+    [('NORM', num_blocks, 200, 1) for num_blocks in (1, 100)]
+    + [('NORM', 4, 10000, 1), ('NORM', 20, 1000, 2)]
+    + [(experiment_mode, 50, 500, 1) for experiment_mode in ('SDP', 'MAP')]
+)
+
+# values written for block fields, anything else gets the VAMAS 'unknown' value
+BLOCK_FIELD_VALUES = {
+    'sample_identifier': 'synthetic',
+    'year': '2021', 'month': '12', 'day': '16',
+    'hours': '0', 'minutes': '0', 'seconds': '0', 'number_of_hours_in_advance_of_GMT': '0',
+    'comment': 'synthetic benchmark block',
+    'technique': 'XPS',
+    'value_of_experimental_variable': '0',
+    'analysis_source_label': 'Al',
+    'sputtering_ion': 'Ar', 'number_of_atoms_in_ion': '1', 'sputtering_ion_charge': '1',
+    'analysis_source_characteristic_energy': '1486.6',
+    'first_linescan_xi': '1', 'first_linescan_yi': '1', 'first_linescan_xf': '10', 'first_linescan_yf': '1',
+    'last_linescan_xf': '10', 'last_linescan_yf': '10',
+    'analyzer_mode': 'FAT',
+    'species_label': 'C', 'transition_state_label': '1s', 'charge_of_detected_particle': '-1',
+    'abscissa_label': 'Kinetic Energy', 'abscissa_units': 'eV',
+    'abscissa_start': '1186.6', 'abscissa_increment': '0.1',
+    'corresponding_variable_label': 'Intensity', 'corresponding_variable_units': 'd',
+    'signal_mode': 'pulse counting', 'signal_collection_time': '0.1', 'number_of_scans': '1',
+    'sputtering_mode': 'cyclic',
+    'additional_param_label': 'PHI_AtomicNumber', 'additional_param_units': 'd', 'additional_param_value': '6',
+    'minimum_ordinate_value': '0', 'maximum_ordinate_value': '1',
+}
+
+def experiment_header(experiment_mode, num_blocks):
+    '''
+    experiment_mode: name of an ExperimentMode
+    num_blocks: number of blocks that will follow
+
+    returns lines of a VAMAS experiment header, with the optional fields of experiment_mode
+    '''
+    mode = ExperimentMode[experiment_mode]
+    lines = [
+        'VAMAS Surface Chemical Analysis Standard Data Transfer Format 1988 May 4',
+        'benchmark', 'synthetic', 'VAMASbench', 'synthetic ' + experiment_mode,
+        '1', 'synthetic benchmark file',
+        experiment_mode, 'REGULAR',
+    ]
+    if mode in (ExperimentMode.MAP, ExperimentMode.MAPDP, ExperimentMode.NORM, ExperimentMode.SDP):
+        lines.append('1')
+    if mode in (ExperimentMode.MAP, ExperimentMode.MAPDP):
+        num_x = int(np.ceil(np.sqrt(num_blocks)))
+        lines.extend([str(num_blocks), str(num_x), str(int(np.ceil(num_blocks/num_x)))])
+    # one experimental variable, no inclusion list, manual entries or future upgrade entries
+    lines.extend(['1', 'Etch Time', 's', '0', '0', '0', '0', str(num_blocks)])
+    return lines
+
+def block_lines(layout, block_number, num_points, num_variables, rng, num_x=1):
+    '''
+    layout: compiled block layout from VAMASparser.compile_block_layout
+    block_number: index of the block in the file
+    num_points: points per corresponding variable
+    num_variables: number of corresponding variables
+    rng: numpy random Generator for the counts
+    num_x: width of the map for MAP/MAPDP blocks, which are placed row by row
+
+    returns text of one block following layout
+    '''
+    counts = {
+        'number_of_lines_in_comment': 1,
+        'number_of_corresponding_variables': num_variables,
+        'number_of_additional_params': 1,
+        'number_of_ordinate_values': num_points*num_variables,
+    }
+    lines = []
+    for kind, names, count in layout:
+        if kind in (FIELD, FLOAT):
+            if names[0] == 'block_identifier':
+                lines.append('C 1s %d' % block_number)
+            elif names[0] == 'x_coord':
+                lines.append(str(block_number % num_x + 1))
+            elif names[0] == 'y_coord':
+                lines.append(str(block_number//num_x + 1))
+            else:
+                lines.append(BLOCK_FIELD_VALUES.get(names[0], '1e+037'))
+        elif kind == NUMERIC:
+            lines.append(str(counts[names[0]]))
+        elif kind == REPEATED:
+            if not isinstance(count, int):
+                count = counts[count]
+            for i in range(count):
+                lines.extend(BLOCK_FIELD_VALUES[name] for name in names)
+        elif kind == ORDINATES:
+            values = rng.poisson(5000, num_points*num_variables)
+            lines.append('\n'.join(map(str, values.tolist())))
+    return '\n'.join(lines) + '\n'
+
+def write_synthetic(filename, experiment_mode='NORM', num_blocks=10, num_points=1000, num_variables=1, seed=0):
+    '''
+    filename: path of the file to write [string]
+    experiment_mode: name of an ExperimentMode
+    num_blocks: number of blocks
+    num_points: points per corresponding variable in each block
+    num_variables: number of corresponding variables in each block
+    seed: seed for the random counts
+
+    Writes a synthetic VAMAS file. The header is read back with VAMASparser to compile
+    the block layout, so blocks get exactly the optional fields the parser expects.
+    '''
+    header = experiment_header(experiment_mode, num_blocks)
+    parser = VAMASparser(filename)
+    parser.read_experiment(iter(io.BytesIO(('\n'.join(header) + '\n').encode()).readline, b''))
+    layout = parser.compile_block_layout(Technique.XPS)
+    rng = np.random.default_rng(seed)
+    num_x = int(np.ceil(np.sqrt(num_blocks)))
+
+    with open(filename, 'w') as file:
+        file.write('\n'.join(header) + '\n')
+        for block_number in range(num_blocks):
+            file.write(block_lines(layout, block_number, num_points, num_variables, rng, num_x))
+        file.write('end of experiment\n')
+
+def time_call(function, repeat):
+    '''
+    function: function to time
+    repeat: number of runs
+
+    returns best wall time of function in seconds
+    '''
+    best = float('inf')
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def read_all(filename):
+    '''
+    filename: VAMAS file to read
+
+    returns parsed VAMASparser
+    '''
+    parser = VAMASparser(filename)
+    parser.read_VAMAS()
+    return parser
+
+def get_all(parser):
+    '''
+    parser: parsed VAMASparser
+
+    reads out x and y of every block
+    '''
+    for block_index in range(len(parser.blocks)):
+        parser.get_x_vals(block_index)
+        parser.get_y_vals(0, block_index)
+
+def bench_file(filename, repeat=3):
+    '''
+    filename: VAMAS file to benchmark
+    repeat: number of runs per timing (best is kept)
+
+    returns dictionary of timings [s], throughput and peak memory [bytes]
+    '''
+    size = os.path.getsize(filename)
+    parser = read_all(filename)
+    num_blocks = len(parser.blocks)
+
+    def read_mapped():
+        VAMASparser(filename).read_VAMAS(memory_map=True)
+    def read_lazy():
+        VAMASparser(filename).read_VAMAS(lazy=True)
+
+    result = {
+        'bytes': size,
+        'blocks': num_blocks,
+        'read': time_call(lambda: read_all(filename), repeat),
+        'read_mmap': time_call(read_mapped, repeat),
+        'read_lazy': time_call(read_lazy, repeat),
+        'get_xy': time_call(lambda: get_all(parser), repeat),
+    }
+    result['MB/s'] = size/2**20/result['read']
+    result['blocks/s'] = num_blocks/result['read']
+
+    tracemalloc.start()
+    read_all(filename)
+    result['peak_memory'] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result
+
+def run(cases, fixtures=True, repeat=3):
+    '''
+    cases: sequence of (experiment mode, number of blocks, points per block, corresponding variables)
+    fixtures: if True, also benchmark the example_data .vms files
+    repeat: number of runs per timing
+
+    returns dictionary of case name: result from bench_file
+    '''
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for experiment_mode, num_blocks, num_points, num_variables in cases:
+            name = '%s_%dblocks_%dpts_%dvars' % (experiment_mode, num_blocks, num_points, num_variables)
+            filename = os.path.join(folder, name + '.vms')
+            write_synthetic(filename, experiment_mode, num_blocks, num_points, num_variables)
+            results[name] = bench_file(filename, repeat)
+            report(name, results[name])
+
+    if fixtures:
+        folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'example_data')
+        for filename in sorted(glob.glob(os.path.join(folder, '*', '*.vms'))):
+            name = os.path.relpath(filename, folder)
+            results[name] = bench_file(filename, repeat)
+            report(name, results[name])
+    return results
+
+def report(name, result, baseline=None):
+    '''
+    name: case name
+    result: dictionary from bench_file
+    baseline: optional result of the same case to compare against
+    '''
+    line = '%-40s %8.1f MB/s %10.0f blocks/s  read %8.2f ms  mmap %8.2f ms  lazy %8.2f ms  get %8.2f ms  peak %7.1f MB' % (
+        name, result['MB/s'], result['blocks/s'], 1e3*result['read'], 1e3*result['read_mmap'],
+        1e3*result['read_lazy'], 1e3*result['get_xy'], result['peak_memory']/2**20)
+    if baseline is not None:
+        line = line + '  (%.2fx baseline read time)' % (result['read']/baseline['read'])
+    print(line)
+
+def compare(results, baseline, threshold=1.2):
+    '''
+    results: dictionary from run
+    baseline: dictionary from run saved earlier
+    threshold: ratio of read times above which a case counts as a regression
+
+    returns list of names of cases that regressed
+    '''
+    regressions = []
+    print('\ncompared to baseline:')
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        report(name, result, baseline[name])
+        if result['read'] > threshold*baseline[name]['read']:
+            regressions.append(name)
+    if regressions:
+        print('\nregressions (read time > %.2fx baseline):' % threshold)
+        for name in regressions:
+            print('    ' + name)
+    return regressions
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Benchmark VAMASparser on synthetic and example VAMAS files')
+    arg_parser.add_argument('--quick', action='store_true', help='run a smaller set of synthetic cases')
+    arg_parser.add_argument('--no-fixtures', action='store_true', help='skip the example_data files')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='runs per timing, best is kept')
+    arg_parser.add_argument('--save', help='save results as a baseline JSON file')
+    arg_parser.add_argument('--compare', help='compare against a saved baseline JSON file')
+    arg_parser.add_argument('--threshold', type=float, default=1.2, help='read time ratio that counts as a regression')
+    args = arg_parser.parse_args()
+
+    results = run(QUICK_CASES if args.quick else FULL_CASES, not args.no_fixtures, args.repeat)
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.threshold):
+            raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
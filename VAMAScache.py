@@ -0,0 +1,175 @@
+'''
+Persistent on-disk cache of parsed VAMAS files.
+
+Each parsed file is stored as an uncompressed .npz holding the packed parser (see
+VAMASparser.pack) together with the size, mtime and content hash of the source file,
+so warm loads skip parsing entirely. Entries are invalidated when any of those change,
+and the cache directory is kept under a maximum size by evicting the least recently
+used entries.
+'''
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from VAMASparse import VAMASparser
+
+class VAMAScache():
+    def __init__(self, cache_dir='.vamas_cache', max_size=512*2**20, check_hash=True):
+        '''
+        cache_dir: directory to keep cache entries in [string]
+        max_size: maximum total size of the cache entries in bytes; an entry is about
+            1.2-2 times the size of its source file, and files whose entry alone is
+            larger than max_size are not cached
+        check_hash: if True, also compare the content hash of the source file on every
+            lookup, not only its size and mtime
+
+        This is a class for caching parsed VAMAS files on disk.
+        Use VAMAScache.load(filename) in place of VAMASparser(filename).read_VAMAS()
+        '''
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.check_hash = check_hash
+
+    def entry_path(self, filename):
+        '''
+        filename: full path+name of the source VAMAS file [string]
+
+        returns path of the cache entry for filename. Raises TypeError for file-like
+        objects, as entries are validated against the size and mtime of a file on disk
+        '''
+        if not isinstance(filename, (str, os.PathLike)):
+            raise TypeError('VAMAScache needs the path of a file on disk, not %r' % (filename,))
+        key = hashlib.sha1(os.path.abspath(filename).encode()).hexdigest()
+        return os.path.join(self.cache_dir, key + '.npz')
+
+    def content_hash(self, filename):
+        '''
+        filename: full path+name of the source VAMAS file [string]
+
+        returns hex digest of the file contents
+        '''
+        digest = hashlib.blake2b()
+        with open(filename, 'rb') as file:
+            for chunk in iter(lambda: file.read(2**20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def source_info(self, filename, content_hash=True):
+        '''
+        filename: full path+name of the source VAMAS file [string]
+        content_hash: if True, include the content hash
+
+        returns dictionary of what a cache entry is valid for
+        '''
+        stat = os.stat(filename)
+        info = {'filename': os.path.abspath(filename), 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+        if content_hash:
+            info['hash'] = self.content_hash(filename)
+        return info
+
+    def get(self, filename):
+        '''
+        filename: full path+name of the source VAMAS file [string]
+
+        returns the packed parser stored for filename, or None if there is no valid entry
+        '''
+        path = self.entry_path(filename)
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path, allow_pickle=False) as entry:
+            stored = json.loads(entry['source'].tobytes())
+            current = self.source_info(filename, content_hash=False)
+            if (stored['filename'] != current['filename'] or stored['size'] != current['size']
+                or stored['mtime'] != current['mtime']):
+                return None
+            if self.check_hash and stored['hash'] != self.content_hash(filename):
+                return None
+            packed = {'header': entry['header'].tobytes().decode(), 'ordinates': entry['ordinates'],
+                'offsets': entry['offsets']}
+
+        # mark as recently used for eviction
+        os.utime(path)
+        return packed
+
+    def put(self, filename, packed):
+        '''
+        filename: full path+name of the source VAMAS file [string]
+        packed: dictionary from VAMASparser.pack for filename
+        '''
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.entry_path(filename)
+        source = json.dumps(self.source_info(filename))
+
+        # write to a temporary file first so a crash never leaves a broken entry
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'wb') as file:
+            # strings as utf-8 bytes, numpy would store them as 4 byte characters
+            np.savez(file, source=text_array(source), header=text_array(packed['header']),
+                ordinates=packed['ordinates'], offsets=packed['offsets'])
+        if os.path.getsize(temporary_path) > self.max_size:
+            # would evict everything else and then itself; an outdated entry goes too
+            os.remove(temporary_path)
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        os.replace(temporary_path, path)
+        self.evict(keep=os.path.basename(path))
+
+    def load(self, filename, memory_map=False):
+        '''
+        filename: full path+name of file to read [string]
+        memory_map: passed on to VAMASparser.read_VAMAS on a cache miss
+
+        returns VAMASparser for filename, from the cache if possible
+        '''
+        packed = self.get(filename)
+        if packed is not None:
+            return VAMASparser.unpack(filename, packed)
+
+        parser = VAMASparser(filename)
+        parser.read_VAMAS(memory_map=memory_map)
+        self.put(filename, parser.pack())
+        return parser
+
+    def evict(self, keep=None):
+        '''
+        keep: file name of an entry never to delete, e.g. the one just written
+
+        Deletes the least recently used entries until the cache is at most max_size bytes
+        '''
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npz'):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            if name == keep:
+                continue
+            os.remove(os.path.join(self.cache_dir, name))
+            total_size = total_size - size
+
+    def clear(self):
+        '''
+        Deletes all cache entries
+        '''
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npz'):
+                os.remove(os.path.join(self.cache_dir, name))
+
+def text_array(text):
+    '''
+    text: string to store in an .npz
+
+    returns uint8 array of the utf-8 encoded text
+    '''
+    return np.frombuffer(text.encode(), dtype=np.uint8)
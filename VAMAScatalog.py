@@ -0,0 +1,264 @@
+'''
+SQLite catalog of VAMAS files, their experiment headers and block metadata.
+
+Building the catalog reads only the headers of each file (the ordinate values are skipped,
+see VAMASparser.scan_blocks), and rebuilding only rescans files whose size or mtime changed.
+Queries return CatalogBlock handles that load the block's data from its file on demand.
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+import sqlite3
+
+from VAMASparse import VAMASparser, MappedLines, open_vamas
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    file_id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    institution_identifier TEXT,
+    instrument_model_identifier TEXT,
+    operator_identifier TEXT,
+    experiment_identifier TEXT,
+    experiment_mode TEXT,
+    scan_mode TEXT,
+    number_of_blocks INTEGER
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    file_id INTEGER NOT NULL REFERENCES files(file_id) ON DELETE CASCADE,
+    block_number INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    block_identifier TEXT,
+    sample_identifier TEXT,
+    technique TEXT,
+    species_label TEXT,
+    transition_state_label TEXT,
+    analysis_source_label TEXT,
+    analysis_source_characteristic_energy REAL,
+    abscissa_label TEXT,
+    abscissa_start REAL,
+    abscissa_end REAL,
+    abscissa_increment REAL,
+    number_of_points INTEGER,
+    number_of_corresponding_variables INTEGER,
+    PRIMARY KEY (file_id, block_number)
+);
+CREATE INDEX IF NOT EXISTS blocks_block_identifier ON blocks(block_identifier);
+CREATE INDEX IF NOT EXISTS blocks_sample_identifier ON blocks(sample_identifier);
+CREATE INDEX IF NOT EXISTS blocks_species ON blocks(species_label, transition_state_label);
+'''
+
+FILE_COLUMNS = ('institution_identifier', 'instrument_model_identifier', 'operator_identifier',
+    'experiment_identifier', 'experiment_mode', 'scan_mode', 'number_of_blocks')
+
+BLOCK_COLUMNS = ('block_number', 'offset', 'block_identifier', 'sample_identifier', 'technique',
+    'species_label', 'transition_state_label', 'analysis_source_label',
+    'analysis_source_characteristic_energy', 'abscissa_label', 'abscissa_start', 'abscissa_end',
+    'abscissa_increment', 'number_of_points', 'number_of_corresponding_variables')
+
+class VAMAScatalog():
+    def __init__(self, database='vamas_catalog.sqlite'):
+        '''
+        database: path of the SQLite file holding the catalog [string]
+
+        This is a class for indexing many VAMAS files and querying their blocks.
+        Use VAMAScatalog.update(folder) to (re)build the catalog and VAMAScatalog.query()
+        to find blocks
+        '''
+        self.database = database
+        self.connection = sqlite3.connect(database)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.executescript(SCHEMA)
+        # parsers with only the experiment header read, for loading blocks
+        self.parsers = {}
+
+    def update(self, folder, extension='.vms', workers=None):
+        '''
+        folder: root of the directory tree to index [string]
+        extension: file extension of VAMAS files, e.g. '.vms.gz' for a compressed archive
+            (compressed files are read transparently, see VAMASparse.open_vamas)
+        workers: number of worker processes for scanning; None uses one per CPU,
+            1 scans in this process
+
+        Adds new files, rescans files whose size or mtime changed and drops files that
+        no longer exist under folder. Files that cannot be read as VAMAS are skipped.
+
+        returns number of files scanned and number of files dropped
+        '''
+        known = {path: (size, mtime) for path, size, mtime
+            in self.connection.execute('SELECT path, size, mtime FROM files')}
+
+        found = set()
+        changed = []
+        for directory, folders, filenames in os.walk(folder):
+            folders.sort()
+            for filename in sorted(filenames):
+                if not filename.lower().endswith(extension):
+                    continue
+                path = os.path.abspath(os.path.join(directory, filename))
+                found.add(path)
+                stat = os.stat(path)
+                if known.get(path) != (stat.st_size, stat.st_mtime_ns):
+                    changed.append(path)
+
+        root = os.path.join(os.path.abspath(folder), '')
+        removed = [path for path in known if path.startswith(root) and path not in found]
+
+        if workers == 1 or len(changed) < 2:
+            self.store(map(scan_file, changed), removed)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                self.store(pool.map(scan_file, changed), removed)
+        return len(changed), len(removed)
+
+    def store(self, scans, removed):
+        '''
+        scans: iterable of results of scan_file
+        removed: list of paths to drop from the catalog
+        '''
+        with self.connection:
+            for path in removed:
+                self.connection.execute('DELETE FROM files WHERE path = ?', (path,))
+                self.parsers.pop(path, None)
+            for scan in scans:
+                if scan is None:
+                    # left out, so it is tried again on the next update
+                    continue
+                file_row, block_rows = scan
+                self.connection.execute('DELETE FROM files WHERE path = ?', (file_row['path'],))
+                self.parsers.pop(file_row['path'], None)
+                columns = ('path', 'size', 'mtime') + FILE_COLUMNS
+                cursor = self.connection.execute('INSERT INTO files (%s) VALUES (%s)'
+                    % (', '.join(columns), ', '.join('?'*len(columns))), [file_row[column] for column in columns])
+                file_id = cursor.lastrowid
+                self.connection.executemany('INSERT INTO blocks (file_id, %s) VALUES (?, %s)'
+                    % (', '.join(BLOCK_COLUMNS), ', '.join('?'*len(BLOCK_COLUMNS))),
+                    [[file_id] + [row[column] for column in BLOCK_COLUMNS] for row in block_rows])
+
+    def query(self, **conditions):
+        '''
+        conditions: column=value pairs, with column any of the block columns or the file
+            columns (plus path). Strings containing % are matched with LIKE (case
+            insensitive), (low, high) tuples as ranges, anything else for equality.
+            e.g. query(block_identifier='O 1s%', sample_identifier='%ITOSA5%',
+                       analysis_source_label='Al')
+
+        returns list of CatalogBlock matching all conditions, ordered by file and block
+        '''
+        allowed = set(BLOCK_COLUMNS) | set(FILE_COLUMNS) | {'path'}
+        clauses = []
+        parameters = []
+        for column, value in conditions.items():
+            if column not in allowed:
+                raise KeyError(column)
+            if isinstance(value, tuple):
+                clauses.append('%s BETWEEN ? AND ?' % column)
+                parameters.extend(value)
+            elif isinstance(value, str) and '%' in value:
+                clauses.append('%s LIKE ?' % column)
+                parameters.append(value)
+            else:
+                clauses.append('%s = ?' % column)
+                parameters.append(value)
+
+        sql = ('SELECT files.path, files.size, files.mtime, %s FROM blocks JOIN files USING (file_id)'
+            % ', '.join('blocks.' + column for column in BLOCK_COLUMNS))
+        if clauses:
+            sql = sql + ' WHERE ' + ' AND '.join(clauses)
+        sql = sql + ' ORDER BY files.path, blocks.block_number'
+        columns = ('path', 'size', 'mtime') + BLOCK_COLUMNS
+        return [CatalogBlock(self, dict(zip(columns, row))) for row in self.connection.execute(sql, parameters)]
+
+    def header_parser(self, path):
+        '''
+        path: full path+name of a catalogued file [string]
+
+        returns (cached) VAMASparser of path with only the experiment header read
+        '''
+        parser = self.parsers.get(path)
+        if parser is None:
+            parser = VAMASparser(path)
+            with open_vamas(path) as file:
+                parser.read_experiment(iter(file.readline, b''))
+            self.parsers[path] = parser
+        return parser
+
+    def close(self):
+        self.connection.close()
+
+class CatalogBlock():
+    def __init__(self, catalog, row):
+        '''
+        catalog: VAMAScatalog the block was found in
+        row: dictionary of the catalog columns of the block
+
+        Lazy handle on a catalogued block: the catalog columns are attributes, the data is
+        only read from the file by load()
+        '''
+        self.catalog = catalog
+        self.row = row
+
+    def __getattr__(self, name):
+        try:
+            return self.row[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self):
+        return 'CatalogBlock(%r, %r, block %d)' % (self.row['block_identifier'], self.row['path'],
+            self.row['block_number'])
+
+    def load(self):
+        '''
+        returns VAMASBlock read from the file at the catalogued byte offset. Raises
+        ValueError if the file changed since it was catalogued
+        '''
+        stat = os.stat(self.path)
+        if (stat.st_size, stat.st_mtime_ns) != (self.size, self.mtime):
+            raise ValueError('%s changed since it was catalogued, update the catalog' % self.path)
+        return self.catalog.header_parser(self.path).load_block(self.offset)
+
+def scan_file(path):
+    '''
+    path: full path+name of a VAMAS file [string]
+
+    worker for VAMAScatalog.update: reads the headers of one file
+
+    returns dictionary of the file columns and list of dictionaries of the block columns,
+    or None if path could not be read as a VAMAS file
+    '''
+    stat = os.stat(path)
+    parser = VAMASparser(path)
+    with open_vamas(path) as file:
+        lines, tell = parser.open_lines(file, memory_map=stat.st_size > 0)
+        try:
+            parser.read_experiment(lines)
+            scanned = list(parser.scan_blocks(lines, tell))
+        except (ValueError, KeyError):
+            # not a (complete) VAMAS file, e.g. still being written
+            return None
+        finally:
+            if isinstance(lines, MappedLines):
+                lines.close()
+
+    experiment = parser.VAMASExperiment
+    file_row = {'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+    for column in FILE_COLUMNS:
+        file_row[column] = getattr(experiment, column, None)
+
+    block_rows = []
+    for block_number, (offset, block) in enumerate(scanned):
+        num_variables = block.number_of_corresponding_variables
+        num_points = block.number_of_ordinate_values//num_variables if num_variables else 0
+        row = {'block_number': block_number, 'offset': offset, 'number_of_points': num_points}
+        for column in BLOCK_COLUMNS:
+            if column not in row and column != 'abscissa_end':
+                row[column] = getattr(block, column, None)
+        if row['abscissa_start'] is not None and num_points:
+            row['abscissa_end'] = row['abscissa_start'] + row['abscissa_increment']*(num_points - 1)
+        else:
+            row['abscissa_end'] = None
+        block_rows.append(row)
+    return file_row, block_rows
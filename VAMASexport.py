@@ -0,0 +1,192 @@
+'''
+Columnar export of parsed VAMAS files to HDF5 or Parquet, and matching loaders.
+
+HDF5 (needs h5py): the layout of VAMASparser.pack, i.e. the experiment and block headers
+as one compressed JSON text dataset, and the ordinate values of all blocks as one chunked,
+compressed dataset with block offsets. Loading reads the headers and reads each block's
+slice of the ordinates on first access, so reading one block of a large depth profile is
+a seek plus one slice read. Uncompressed files are memory-mapped.
+
+Parquet (needs pyarrow): a folder holding blocks.parquet, a table with one row per block
+(its header fields plus the rows it spans in the point table), and points.parquet, a
+long-form table with block, variable, x and y columns. The experiment header is stored in
+the schema metadata of blocks.parquet.
+'''
+
+import json
+import os
+
+import numpy as np
+
+from VAMASparse import VAMASparser, LazyBlocks
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+def export_hdf5(parser, filename, compression='gzip', compression_opts=4, chunk_size=2**14):
+    '''
+    parser: parsed VAMASparser
+    filename: full path+name of the HDF5 file to write [string]
+    compression: h5py compression filter for the ordinate values, None to store them
+        contiguously so load_hdf5 can memory-map them
+    compression_opts: compression level passed on to h5py
+    chunk_size: number of ordinate values per chunk
+    '''
+    if h5py is None:
+        raise ImportError('export_hdf5 needs h5py')
+    packed = parser.pack()
+
+    with h5py.File(filename, 'w') as file:
+        file.attrs['source'] = parser.source_name
+        # headers as compressed utf-8 bytes, variable length strings are stored uncompressed
+        header = np.frombuffer(packed['header'].encode(), dtype=np.uint8)
+        file.create_dataset('header', data=header, chunks=(min(chunk_size, len(header)),),
+            compression='gzip', compression_opts=compression_opts)
+
+        # ordinates of all blocks in one array, a dataset per block costs several kB each
+        file.create_dataset('offsets', data=packed['offsets'])
+        ordinates = packed['ordinates']
+        if compression is None or len(ordinates) == 0:
+            file.create_dataset('ordinates', data=ordinates)
+        else:
+            file.create_dataset('ordinates', data=ordinates, chunks=(min(chunk_size, len(ordinates)),),
+                shuffle=True, compression=compression, compression_opts=compression_opts)
+
+def load_hdf5(filename, cache_size=64):
+    '''
+    filename: full path+name of an HDF5 file from export_hdf5 [string]
+    cache_size: number of blocks kept in memory
+
+    returns VAMASparser whose blocks are read from filename on first access, like
+    VAMASparser.read_VAMAS(lazy=True). The file stays open until parser.close()
+    '''
+    if h5py is None:
+        raise ImportError('load_hdf5 needs h5py')
+    file = h5py.File(filename, 'r')
+    parser = VAMASparser(file.attrs['source'])
+    header = json.loads(file['header'][()].tobytes())
+    parser.restore_experiment(header['experiment'])
+
+    parser.block_index = [(block_index, fields['block_identifier'], fields['sample_identifier'])
+        for block_index, fields in enumerate(header['blocks'])]
+    parser.blocks = HDF5Blocks(parser, parser.block_index, header['blocks'], file, cache_size)
+    return parser
+
+class HDF5Blocks(LazyBlocks):
+    def __init__(self, parser, block_index, block_fields, file, cache_size=64):
+        '''
+        parser: VAMASparser whose experiment header has been restored
+        block_index: list of (block index, block_identifier, sample_identifier)
+        block_fields: list of dictionaries of block option name: value, as in VAMASparser.pack
+        file: open h5py.File from export_hdf5
+        cache_size: maximum number of blocks kept in memory
+
+        Reads blocks of an exported HDF5 file on demand, keeping the most recently used ones
+        '''
+        super().__init__(parser, block_index, cache_size)
+        self.file = file
+        self.block_fields = block_fields
+        self.offsets = file['offsets'][()]
+
+        self.ordinates = file['ordinates']
+        offset = self.ordinates.id.get_offset()
+        if self.ordinates.chunks is None and offset is not None:
+            # contiguous and uncompressed, so the values can be mapped straight from the file
+            self.ordinates = np.memmap(file.filename, dtype=self.ordinates.dtype, mode='r',
+                offset=offset, shape=self.ordinates.shape)
+
+    def load(self, block_index):
+        '''
+        block_index: index of block to read
+
+        returns VAMASBlock read from the file
+        '''
+        fields = self.block_fields[block_index]
+        values = self.ordinates[self.offsets[block_index]:self.offsets[block_index + 1]]
+        values = self.parser.deinterleave(values, fields['number_of_corresponding_variables'])
+        return self.parser.restore_block(fields, values)
+
+    def close(self):
+        '''
+        drops the cached blocks and closes the HDF5 file
+        '''
+        super().close()
+        self.file.close()
+
+def export_parquet(parser, folder, compression='zstd'):
+    '''
+    parser: parsed VAMASparser
+    folder: folder to write blocks.parquet and points.parquet into [string]
+    compression: Parquet compression codec
+    '''
+    if pa is None:
+        raise ImportError('export_parquet needs pyarrow')
+    header = parser.header_fields()
+    os.makedirs(folder, exist_ok=True)
+
+    rows = []
+    block_column = []
+    variable_column = []
+    x_column = []
+    y_column = []
+    row_offset = 0
+    for block_index, (fields, block) in enumerate(zip(header['blocks'], parser.blocks)):
+        num_variables, num_points = block.ordinate_value.shape
+        num_rows = num_variables*num_points
+        rows.append(dict(fields, row_offset=row_offset, num_rows=num_rows))
+        row_offset = row_offset + num_rows
+
+        # variable-major, so each variable of a block is one contiguous run of rows
+        block_column.append(np.full(num_rows, block_index, dtype=np.int32))
+        variable_column.append(np.repeat(np.arange(num_variables, dtype=np.int32), num_points))
+        x_column.append(np.tile(parser.block_x_vals(block), num_variables))
+        y_column.append(block.ordinate_value.ravel())
+
+    blocks = pa.Table.from_pylist(rows)
+    blocks = blocks.replace_schema_metadata({'source': parser.source_name,
+        'experiment': json.dumps(header['experiment'])})
+    pq.write_table(blocks, os.path.join(folder, 'blocks.parquet'), compression=compression)
+
+    points = pa.table({
+        'block': np.concatenate(block_column) if block_column else np.empty(0, dtype=np.int32),
+        'variable': np.concatenate(variable_column) if variable_column else np.empty(0, dtype=np.int32),
+        'x': np.concatenate(x_column) if x_column else np.empty(0),
+        'y': np.concatenate(y_column) if y_column else np.empty(0),
+    })
+    pq.write_table(points, os.path.join(folder, 'points.parquet'), compression=compression)
+
+def load_parquet(folder):
+    '''
+    folder: folder written by export_parquet [string]
+
+    returns VAMASparser holding the exported data. points.parquet is memory-mapped and
+    its y column read in one piece; the ordinate values of each block are views into it
+    '''
+    if pa is None:
+        raise ImportError('load_parquet needs pyarrow')
+    blocks = pq.read_table(os.path.join(folder, 'blocks.parquet'), memory_map=True)
+    metadata = blocks.schema.metadata
+    parser = VAMASparser(metadata[b'source'].decode())
+    parser.restore_experiment(json.loads(metadata[b'experiment']))
+
+    points = pq.read_table(os.path.join(folder, 'points.parquet'), columns=['y'], memory_map=True)
+    y = points.column('y').to_numpy()
+
+    parser.blocks = []
+    for fields in blocks.to_pylist():
+        row_offset = fields.pop('row_offset')
+        num_rows = fields.pop('num_rows')
+        # options missing from some blocks come back as nulls
+        fields = {name: value for name, value in fields.items() if value is not None}
+        values = y[row_offset:row_offset + num_rows].reshape(fields['number_of_corresponding_variables'], -1)
+        parser.blocks.append(parser.restore_block(fields, values))
+    return parser
@@ -0,0 +1,376 @@
+'''
+Imaging (MAP/MAPDP/MAPSV/MAPSVDP/SEM) VAMAS files as lazily loaded (nx, ny, n_energy) cubes.
+
+Opening a map only scans the block headers (see VAMASparser.scan_data), noting where the
+ordinate values of each block are in the file. The cube of each region is a memory-mapped
+array that is filled in on demand: indexing it decodes only the blocks of the pixels (MAP,
+MAPDP) or frames (MAPSV, MAPSVDP, SEM) it touches, straight from the memory-mapped file.
+Energy slices of pixels that are not loaded yet only decode the lines of that slice, so an
+energy-window image never decodes the rest of the spectra.
+'''
+
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+
+import numpy as np
+
+from VAMASparse import VAMASparser, MappedLines
+from VAMASspecs import *
+
+# experiment modes whose blocks are spectra at one analysis position
+SPECTRUM_MAP_MODES = (ExperimentMode.MAP, ExperimentMode.MAPDP)
+# experiment modes whose blocks are whole images at one energy
+IMAGE_MAP_MODES = (ExperimentMode.MAPSV, ExperimentMode.MAPSVDP, ExperimentMode.SEM)
+
+def map_region(block):
+    '''
+    block: VAMASBlock of a map
+
+    returns region of the block, e.g. 'O 1s'
+    '''
+    return (block.species_label + ' ' + block.transition_state_label).strip()
+
+class VAMASmap():
+    def __init__(self, filename, variable_index=None, region_key=map_region, store=None):
+        '''
+        filename: full path+name of the VAMAS map to read [string]
+        variable_index: index of the corresponding variable in the cubes, None for the first
+            one holding y values (the counts, see VAMASparser.first_ordinate_index)
+        region_key: function from VAMASBlock to region, blocks of the same region make up
+            one cube
+        store: folder to keep the cubes in as .npy files, reused while the source file is
+            unchanged; None keeps them in temporary files for the life of the map
+
+        This is a class for reading VAMAS maps. Only the block headers are read here;
+        the data is read through the cubes, e.g. vamas_map.cube('O 1s')[10, 20] for the
+        spectrum of one pixel
+        '''
+        self.filename = filename
+        self.store = store
+        self.parser = VAMASparser(filename)
+
+        self.file = open(filename, 'rb')
+        self.lines = MappedLines(mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ))
+        self.parser.read_experiment(self.lines)
+        self.experiment = self.parser.VAMASExperiment
+        if variable_index is None:
+            variable_index = self.parser.first_ordinate_index()
+        self.variable_index = variable_index
+        experiment_mode = self.experiment.experiment_mode_type
+        if experiment_mode not in SPECTRUM_MAP_MODES + IMAGE_MAP_MODES:
+            raise ValueError('%s is not a map (experiment mode %s)' % (filename, self.experiment.experiment_mode))
+        self.image_blocks = experiment_mode in IMAGE_MAP_MODES
+
+        self.regions = []
+        self.blocks = {}
+        self.data_starts = {}
+        for offset, data_start, data_end, block in self.parser.scan_data(self.lines, self.lines.tell):
+            region = region_key(block)
+            if region not in self.blocks:
+                self.regions.append(region)
+                self.blocks[region] = []
+                self.data_starts[region] = []
+            self.blocks[region].append(block)
+            self.data_starts[region].append(data_start)
+
+        self.cubes = {}
+
+    def close(self):
+        '''
+        writes the loaded data of the cubes to the store and closes the cubes and the file
+        '''
+        for cube in self.cubes.values():
+            cube.close()
+        self.cubes = {}
+        self.lines.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def cube(self, region):
+        '''
+        region: region name
+
+        returns (cached) MapCube of region, a new one if it was closed
+        '''
+        cube = self.cubes.get(region)
+        if cube is None or cube.data is None:
+            cube = MapCube(self, region)
+            self.cubes[region] = cube
+        return cube
+
+    def spectrum(self, region, x, y):
+        '''
+        region: region name
+        x, y: pixel indices
+
+        returns intensity of pixel (x, y) at every energy of region [float64 array]
+        '''
+        return self.cube(region)[x, y]
+
+    def window_image(self, region, lower, upper):
+        '''
+        region: region name
+        lower, upper: binding energy window
+
+        returns summed intensity in the window for every pixel [float64 array of shape (nx, ny)]
+        '''
+        cube = self.cube(region)
+        inside = np.flatnonzero((cube.binding_energy >= lower) & (cube.binding_energy <= upper))
+        if len(inside) == 0:
+            return np.zeros(cube.shape[:2])
+        return cube[:, :, inside[0]:inside[-1] + 1].sum(axis=2)
+
+    def decode_lines(self, data_start, first_line, num_lines):
+        '''
+        data_start: byte offset of the ordinate values of a block
+        first_line: number of lines of the block to skip
+        num_lines: number of lines to decode
+
+        returns values of the lines [float64 array]
+        '''
+        self.lines.seek(data_start)
+        self.lines.skip_lines(first_line)
+        return np.fromstring(self.lines.read_lines(num_lines), dtype=np.float64, sep=' ')
+
+    def store_paths(self, region):
+        '''
+        region: region name
+
+        returns paths of the cube, loaded mask and source info files of region in the store
+        '''
+        key = hashlib.sha1((os.path.abspath(self.filename) + '\n' + region + '\n'
+            + str(self.variable_index)).encode()).hexdigest()
+        path = os.path.join(self.store, key)
+        return path + '.npy', path + '.loaded.npy', path + '.json'
+
+class MapCube():
+    def __init__(self, vamas_map, region):
+        '''
+        vamas_map: VAMASmap the region belongs to
+        region: region name
+
+        (nx, ny, n_energy) array of one region of a map, loaded on demand. Index it like a
+        numpy array; np.asarray(cube) loads everything
+        '''
+        self.map = vamas_map
+        self.region = region
+        blocks = vamas_map.blocks[region]
+        self.data_starts = vamas_map.data_starts[region]
+        self.num_variables = np.array([block.number_of_corresponding_variables for block in blocks])
+        first = blocks[0]
+
+        if vamas_map.image_blocks:
+            self.setup_frames(blocks)
+        else:
+            self.setup_pixels(blocks)
+
+        self.units = first.corresponding_variable_units[vamas_map.variable_index]
+        self.label = first.corresponding_variable_label[vamas_map.variable_index]
+        self.shape = (len(self.x), len(self.y), len(self.energy))
+        self.ndim = 3
+        # temporary file behind data when the map has no store
+        self.temporary_file = None
+        self.open_store()
+
+    def setup_pixels(self, blocks):
+        '''
+        blocks: VAMASBlocks of the region, one spectrum per analysis position
+
+        sets up the pixel grid from the x_coord/y_coord of the blocks
+        '''
+        coords = np.array([(float(block.x_coord), float(block.y_coord)) for block in blocks])
+        self.x, pixel_x = np.unique(coords[:, 0], return_inverse=True)
+        self.y, pixel_y = np.unique(coords[:, 1], return_inverse=True)
+        # block of each pixel, -1 where the map has no spectrum
+        self.pixel_blocks = np.full((len(self.x), len(self.y)), -1)
+        self.pixel_blocks[pixel_x, pixel_y] = np.arange(len(blocks))
+
+        first = blocks[0]
+        num_points = first.number_of_ordinate_values//first.number_of_corresponding_variables
+        irregular = not hasattr(first, 'abscissa_start')
+        for block in blocks:
+            if (block.number_of_ordinate_values != first.number_of_ordinate_values or not irregular
+                and (block.abscissa_start != first.abscissa_start or block.abscissa_increment != first.abscissa_increment)):
+                raise ValueError('block %s does not share the energy axis of region %s'
+                    % (block.block_identifier, self.region))
+        if irregular:
+            # IRREGULAR scan mode: the abscissa is the first corresponding variable, taken
+            # from the first block for all pixels
+            values = self.map.decode_lines(self.data_starts[0], 0, first.number_of_ordinate_values)
+            self.energy = values[::first.number_of_corresponding_variables]
+        else:
+            self.energy = first.abscissa_start + first.abscissa_increment*np.arange(num_points)
+        self.binding_energy = first.analysis_source_characteristic_energy - self.energy
+        self.energy_units = first.abscissa_units
+
+    def setup_frames(self, blocks):
+        '''
+        blocks: VAMASBlocks of the region, one image per block
+
+        sets up the pixel grid from the linescan coordinates of the first block; the images
+        are rasters of linescans along x
+        '''
+        first = blocks[0]
+        num_x = abs(int(first.first_linescan_xf) - int(first.first_linescan_xi)) + 1
+        num_values = first.number_of_ordinate_values//first.number_of_corresponding_variables
+        if num_values % num_x:
+            raise ValueError('block %s does not hold whole linescans of %d points'
+                % (first.block_identifier, num_x))
+        self.x = np.arange(num_x)
+        self.y = np.arange(num_values//num_x)
+        self.pixel_blocks = None
+        # frames stacked in block order; their energy is the abscissa start if the scan is REGULAR
+        if hasattr(first, 'abscissa_start'):
+            self.energy = np.array([block.abscissa_start for block in blocks])
+            self.binding_energy = first.analysis_source_characteristic_energy - self.energy
+            self.energy_units = first.abscissa_units
+        else:
+            self.energy = self.binding_energy = np.arange(len(blocks), dtype=np.float64)
+            self.energy_units = None
+
+    def open_store(self):
+        '''
+        creates or reopens the memory-mapped cube and the mask of what is loaded
+        '''
+        mask_shape = self.shape[:2] if self.pixel_blocks is not None else self.shape[2:]
+        vamas_map = self.map
+        if vamas_map.store is None:
+            self.temporary_file = tempfile.TemporaryFile()
+            self.data = np.memmap(self.temporary_file, dtype=np.float64, mode='w+', shape=self.shape)
+            self.loaded = np.zeros(mask_shape, dtype=bool)
+            return
+
+        os.makedirs(vamas_map.store, exist_ok=True)
+        cube_path, loaded_path, info_path = vamas_map.store_paths(self.region)
+        stat = os.stat(vamas_map.filename)
+        info = {'filename': os.path.abspath(vamas_map.filename), 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+        stored = None
+        if os.path.exists(info_path) and os.path.exists(cube_path) and os.path.exists(loaded_path):
+            with open(info_path) as file:
+                stored = json.load(file)
+        if stored == info:
+            self.data = np.lib.format.open_memmap(cube_path, mode='r+')
+            self.loaded = np.load(loaded_path)
+        else:
+            self.data = np.lib.format.open_memmap(cube_path, mode='w+', dtype=np.float64, shape=self.shape)
+            self.loaded = np.zeros(mask_shape, dtype=bool)
+            with open(info_path, 'w') as file:
+                json.dump(info, file)
+
+    def flush(self):
+        '''
+        writes what has been loaded to the store
+        '''
+        self.data.flush()
+        if self.map.store is not None:
+            np.save(self.map.store_paths(self.region)[1], self.loaded)
+
+    def close(self):
+        '''
+        flushes the cube and releases its memory map and temporary file; the cube cannot
+        be indexed afterwards
+        '''
+        if self.data is None:
+            return
+        self.flush()
+        self.data = None
+        if self.temporary_file is not None:
+            self.temporary_file.close()
+            self.temporary_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        cube = self[:, :, :]
+        return cube if dtype is None else cube.astype(dtype)
+
+    def __getitem__(self, key):
+        '''
+        key: numpy index into (x, y, energy), e.g. cube[3, 4] (spectrum of a pixel) or
+            cube[:, :, 100:120] (energy window image)
+
+        returns cube[key], decoding only the blocks it needs
+        '''
+        if not isinstance(key, tuple):
+            key = (key,)
+        key = key + (slice(None),)*(3 - len(key))
+        if self.pixel_blocks is not None:
+            return self.get_pixels(key)
+        return self.get_frames(key)
+
+    def get_pixels(self, key):
+        '''
+        key: index into (x, y, energy)
+
+        returns cube[key] for a map of spectra
+        '''
+        pixel_x = np.arange(self.shape[0])[key[0]]
+        pixel_y = np.arange(self.shape[1])[key[1]]
+        energies = np.arange(self.shape[2])[key[2]]
+        grid_x, grid_y = np.meshgrid(np.atleast_1d(pixel_x), np.atleast_1d(pixel_y), indexing='ij')
+        missing = ~self.loaded[grid_x, grid_y]
+        if not missing.any():
+            return self.data[key]
+
+        basic = all(isinstance(index, (slice, int, np.integer)) for index in key[:2])
+        if basic and isinstance(key[2], slice) and 0 < len(energies) < self.shape[2] and np.all(np.diff(energies) == 1):
+            # contiguous energy slice: decode only its lines and leave the store as it is
+            result = np.array(self.data[grid_x, grid_y, energies[0]:energies[-1] + 1])
+            for i, j in zip(*np.nonzero(missing)):
+                result[i, j] = self.read_pixel(grid_x[i, j], grid_y[i, j], energies[0], len(energies))
+            return result.reshape([size for size, index in zip(result.shape, (pixel_x, pixel_y))
+                if np.ndim(index)] + [len(energies)])
+
+        for px, py in zip(grid_x[missing], grid_y[missing]):
+            self.data[px, py] = self.read_pixel(px, py)
+            self.loaded[px, py] = True
+        return self.data[key]
+
+    def read_pixel(self, x, y, first_point=0, num_points=None):
+        '''
+        x, y: pixel indices
+        first_point: first energy point to read
+        num_points: number of energy points, None for all
+
+        returns intensities of pixel (x, y), NaN if the map has no spectrum there
+        '''
+        if num_points is None:
+            num_points = self.shape[2] - first_point
+        block_index = self.pixel_blocks[x, y]
+        if block_index < 0:
+            return np.full(num_points, np.nan)
+        num_variables = self.num_variables[block_index]
+        values = self.map.decode_lines(self.data_starts[block_index], first_point*num_variables,
+            num_points*num_variables)
+        return values[self.map.variable_index::num_variables]
+
+    def get_frames(self, key):
+        '''
+        key: index into (x, y, energy)
+
+        returns cube[key] for a map made of images
+        '''
+        frames = np.atleast_1d(np.arange(self.shape[2])[key[2]])
+        for frame in frames[~self.loaded[frames]]:
+            num_variables = self.num_variables[frame]
+            values = self.map.decode_lines(self.data_starts[frame], 0, self.shape[0]*self.shape[1]*num_variables)
+            image = values[self.map.variable_index::num_variables]
+            # linescans along x, one after the other
+            self.data[:, :, frame] = image.reshape(self.shape[1], self.shape[0]).T
+            self.loaded[frame] = True
+        return self.data[key]
@@ -26,12 +26,114 @@ with additional reference to https://github.com/aeronth/wraith.git for Python 2
 #  'V'        volts
 '''
 
+import asyncio
+import bz2
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+import gzip
+import io
+from itertools import islice
+import json
+import lzma
+import mmap
+import os
+import time
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 from VAMASspecs import *
 
+# kinds of steps in a compiled block layout, see VAMASparser.compile_block_layout
+FIELD = 0
+NUMERIC = 1
+REPEATED = 2
+ORDINATES = 3
+FLOAT = 4
+
+# VAMAS files are ASCII; latin-1 maps any stray instrument byte to a character instead of failing
+VAMAS_ENCODING = 'latin-1'
+
+# bytes of a memory-mapped file searched for line ends at once, see MappedLines.skip_lines
+LINE_CHUNK_SIZE = 1 << 20
+NEWLINE = ord('\n')
+
+# magic numbers at the start of the compressed files read transparently, see open_vamas
+COMPRESSION_MAGIC = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'BZh', 'bz2'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+)
+
+# all block options in the order they can appear in a block
+BLOCK_OPTIONS = tuple(VAMASBlockHeader) + tuple(NumberedVAMASBlockOptions) + tuple(VAMASBlockFooter)
+
+# position of the fields kept in the lazy block index, see VAMASparser.index_blocks
+BLOCK_INDEX_FIELDS = {
+    VAMASBlockHeader.block_identifier: 1,
+    VAMASBlockHeader.sample_identifier: 2,
+}
+
+class VAMASRecord():
+    '''
+    Base for VAMASExperiment and VAMASBlock. Fields live in __slots__ named after the 
+    VAMASspecs Enum options, with dictionary-style access by option for compatibility.
+    Fields that are not present in the file are simply unset.
+    '''
+    __slots__ = ()
+    options = ()
+
+    def __getitem__(self, option):
+        try:
+            return getattr(self, option.name)
+        except AttributeError:
+            raise KeyError(option) from None
+
+    def __setitem__(self, option, value):
+        setattr(self, option.name, value)
+
+    def __contains__(self, option):
+        return hasattr(self, option.name)
+
+    def items(self):
+        '''
+        returns iterator over (option, value) of the fields that are set, in file order
+        '''
+        for option in self.options:
+            if hasattr(self, option.name):
+                yield option, getattr(self, option.name)
+
+class VAMASExperiment(VAMASRecord):
+    '''
+    Experiment header of a VAMAS file. Counts are stored as ints; experiment_mode_type
+    and scan_mode_type hold the ExperimentMode and ScanMode of the string fields.
+    '''
+    __slots__ = tuple(option.name for option in VAMASExperimentOptions) + ('experiment_mode_type', 'scan_mode_type')
+    options = tuple(VAMASExperimentOptions)
+
+class VAMASBlock(VAMASRecord):
+    '''
+    One block of a VAMAS file. Counts are stored as ints, the source energy and abscissa 
+    start/increment as floats, multiline fields as lists of strings and the ordinate values
+    as one float64 array of shape (number_of_corresponding_variables, n_points).
+    technique_type holds the Technique of the technique field. In IRREGULAR scan mode,
+    abscissa_value holds the abscissa, which the file stores as the first corresponding
+    variable (a view of ordinate_value[0]).
+    '''
+    __slots__ = tuple(option.name for option in BLOCK_OPTIONS) + ('technique_type', 'abscissa_value')
+    options = BLOCK_OPTIONS
+
 class VAMASparser():
     def __init__(self, filename):
         '''
-        filename: full path+name of file to read [string]
+        filename: full path+name of file to read [string], or a binary file-like object;
+            either may be compressed with gzip, xz, bz2 or zstd (see open_vamas)
 
         This is a class for parsing VAMAS files.
 
@@ -39,8 +141,11 @@ class VAMASparser():
         To parse data into these variables, use VAMASparser.read_VAMAS()
         '''
         self.filename = filename 
+        # printable name of the source for metadata, also for file-like objects
+        self.source_name = source_name(filename)
 
-        self.exp_numerical_labels = dict.fromkeys((
+        # parsed to ints once when read
+        self.exp_numerical_labels = (
             VAMASExperimentOptions.number_of_lines_in_comment,
             VAMASExperimentOptions.number_of_spectral_regions,
             VAMASExperimentOptions.number_of_exp_variables,
@@ -49,12 +154,7 @@ class VAMASparser():
             VAMASExperimentOptions.number_of_future_upgrade_exp_entries,
             VAMASExperimentOptions.number_of_future_upgrade_block_entries,
             VAMASExperimentOptions.number_of_blocks
-        ))
-
-        self.exp_type_labels = dict.fromkeys((
-            VAMASExperimentOptions.experiment_mode,
-            VAMASExperimentOptions.scan_mode,
-        ))
+        )
 
         self.blocks_numerical_labels = (
             NumberedVAMASBlockOptions.number_of_lines_in_comment,
@@ -63,10 +163,19 @@ class VAMASparser():
             VAMASBlockFooter.number_of_ordinate_values
         )
 
-        self.blocks_type_labels = (NumberedVAMASBlockOptions.technique)
+        # parsed to floats once per block, as they are needed for every x axis
+        self.blocks_float_labels = (
+            NumberedVAMASBlockOptions.analysis_source_characteristic_energy,
+            NumberedVAMASBlockOptions.abscissa_start,
+            NumberedVAMASBlockOptions.abscissa_increment
+        )
 
-        self.all_blocks_numerical = []
-        self.all_blocks_type = []
+        self.VAMASExperiment = VAMASExperiment()
+        self.blocks = []
+        self.block_index = None
+        self.mapped_lines = None
+        # byte offset after the last complete block read in follow mode, 0 before the header
+        self.follow_offset = 0
 
     def multiline_decision(self, current_lines, total_lines, index, lines_per_item=1):
         '''
@@ -92,43 +201,72 @@ class VAMASparser():
         '''
         block_index: index of block to read
 
-        returns a list of x values, their label [string] and units [string]
+        returns float64 array of x values, their label [string] and units [string]
         '''
         block = self.blocks[block_index]
-        block_numerical_labels = self.all_blocks_numerical[block_index]
+        return self.block_x_vals(block), block.abscissa_label, block.abscissa_units
+
+    def block_x_vals(self, block):
+        '''
+        block: VAMASBlock
 
-        label = block[NumberedVAMASBlockOptions.abscissa_label]
-        units = block[NumberedVAMASBlockOptions.abscissa_units]
-        start = float(block[NumberedVAMASBlockOptions.abscissa_start])
-        increment = float(block[NumberedVAMASBlockOptions.abscissa_increment])
+        returns float64 array of the block's x values
+        '''
+        if hasattr(block, 'abscissa_value'):
+            return block.abscissa_value
+        num_x = block.number_of_ordinate_values//block.number_of_corresponding_variables
+        return block.abscissa_start + block.abscissa_increment*np.arange(num_x)
 
-        x = []
-        num_x = int(block_numerical_labels[VAMASBlockFooter.number_of_ordinate_values]/block_numerical_labels[NumberedVAMASBlockOptions.number_of_corresponding_variables])
-        for i in range(num_x):
-            x.append(start + increment*i)
-        return x, label, units
+    def block_exp_variable(self, block, variable_index=0):
+        '''
+        block: VAMASBlock
+        variable_index: index of the experimental variable
+
+        returns value of the experimental variable of block [float], NaN if the file has
+        no experimental variables (number_of_exp_variables = 0, e.g. single spectra)
+        '''
+        values = block.value_of_experimental_variable
+        return float(values[variable_index]) if len(values) > variable_index else np.nan
 
     def kinetic_to_binding_energy(self, ke, block_index=0):
         '''
-        ke: kinetic energy at a given point
+        ke: kinetic energy at a given point, or array of kinetic energies
         block_index: index of block to retrieve characteristic energy from
 
-        returns binding energy associated with electron
+        returns binding energy associated with electron (array if ke is an array)
+        '''
+        return self.blocks[block_index].analysis_source_characteristic_energy - ke
+
+    def get_binding_energy_axis(self, block_index=0):
+        '''
+        block_index: index of block to read
+
+        returns float64 array of binding energies for the whole block, their label [string] and units [string]
+        '''
+        x, label, units = self.get_x_vals(block_index)
+        return self.kinetic_to_binding_energy(x, block_index), 'Binding Energy', units
+
+    def first_ordinate_index(self):
         '''
-        characteristic_energy = float(self.get_block_data(NumberedVAMASBlockOptions.analysis_source_characteristic_energy, block_index))
-        return characteristic_energy - ke
+        returns index of the first corresponding variable holding y values: 1 in IRREGULAR
+        scan mode, where variable 0 is the abscissa, otherwise 0
+        '''
+        return 1 if self.VAMASExperiment.scan_mode_type == ScanMode.IRREGULAR else 0
 
     def get_y_vals(self, variable_index, block_index=0):
         '''
         variable_index: index of the corresponding variable for values of interest
         block_index: index of block to read
 
-        returns a list of y values associated with the corresponding variable
-        at variable_index; their label [string] and units [string]
+        returns a float64 array of y values associated with the corresponding variable
+        at variable_index (a view into the block's ordinate array); their label [string] and units [string]
+        In IRREGULAR scan mode, variable 0 is the abscissa (see get_x_vals and
+        first_ordinate_index)
         '''
-        y = self.get_block_data(VAMASBlockFooter.ordinate_value, block_index)[variable_index]
-        label = self.get_block_data(NumberedVAMASBlockOptions.corresponding_variable_label, block_index)[variable_index]
-        units = self.get_block_data(NumberedVAMASBlockOptions.corresponding_variable_units, block_index)[variable_index]
+        block = self.blocks[block_index]
+        y = block.ordinate_value[variable_index]
+        label = block.corresponding_variable_label[variable_index]
+        units = block.corresponding_variable_units[variable_index]
         return y, label, units
 
     def get_experiment_data(self, option):
@@ -144,8 +282,12 @@ class VAMASparser():
         option = VAMASspecs block Enum option from which to read data
         block_index = index of block to read
 
-        returns block data at option
+        returns block data at option (typed: counts as ints, source energy and abscissa 
+        start/increment as floats, ordinate values as an array)
         '''
+        # in lazy mode the identifiers are known without parsing the block
+        if self.block_index is not None and option in BLOCK_INDEX_FIELDS:
+            return self.block_index[block_index][BLOCK_INDEX_FIELDS[option]]
         return self.blocks[block_index][option]
 
     def experiment_parser(self, line, index):
@@ -153,7 +295,7 @@ class VAMASparser():
         line = line of file to be read
         index = current index into Experiment spec enum
 
-        Reads line into the appropriate key of self.VAMASExperiment (dictionary)
+        Reads line into the appropriate field of self.VAMASExperiment (VAMASExperiment)
 
         returns new index & Boolean representing whether the Experiment data is all read
         '''
@@ -164,7 +306,7 @@ class VAMASparser():
         # check for optional/multiline cases
         # Multiline comment
         if option == VAMASExperimentOptions.comment:
-            total_lines = self.exp_numerical_labels[VAMASExperimentOptions.number_of_lines_in_comment]
+            total_lines = self.VAMASExperiment.number_of_lines_in_comment
             index, self.comment_lines, multiline, create = self.multiline_decision(self.comment_lines, total_lines, index)
             if create:
                 self.VAMASExperiment[option] = []
@@ -172,7 +314,7 @@ class VAMASparser():
 
         # Optional: spectral regions
         if option == VAMASExperimentOptions.number_of_spectral_regions:
-            if (self.exp_type_labels[VAMASExperimentOptions.experiment_mode] 
+            if (self.VAMASExperiment.experiment_mode_type
                 in (ExperimentMode.MAP, ExperimentMode.MAPDP, ExperimentMode.NORM, ExperimentMode.SDP)):
                 pass
             # skip if false
@@ -182,7 +324,7 @@ class VAMASparser():
 
         # Optional: analysis positions
         if option == VAMASExperimentOptions.number_of_analysis_pos:
-            if (self.exp_type_labels[VAMASExperimentOptions.experiment_mode]
+            if (self.VAMASExperiment.experiment_mode_type
                 in (ExperimentMode.MAP, ExperimentMode.MAPDP)):
                 pass
             # skip if false
@@ -192,7 +334,7 @@ class VAMASparser():
         
         # Multiline: experimental variables
         if option == VAMASExperimentOptions.exp_variable_label and not self.second_numbered_pair:
-            total_lines = self.exp_numerical_labels[VAMASExperimentOptions.number_of_exp_variables]
+            total_lines = self.VAMASExperiment.number_of_exp_variables
             index, self.exp_variables, multiline, create = self.multiline_decision(self.exp_variables, total_lines, index, 2)
             if create:
                 self.VAMASExperiment[option] = []
@@ -207,7 +349,7 @@ class VAMASparser():
 
         # Multiline: entries_include/exclude_list
         if option == VAMASExperimentOptions.inclusion_prefix_number:
-            total_lines = self.exp_numerical_labels[VAMASExperimentOptions.number_of_entries_include_list]
+            total_lines = self.VAMASExperiment.number_of_entries_include_list
             index, self.entries_included, multiline, create = self.multiline_decision(self.entries_included, total_lines, index)
             if create:
                 self.VAMASExperiment[option] = []
@@ -215,7 +357,7 @@ class VAMASparser():
 
         # Multiline: manual entries
         if option == VAMASExperimentOptions.prefix_number_of_manual_entry:
-            total_lines = self.exp_numerical_labels[VAMASExperimentOptions.number_of_manually_entered_items]
+            total_lines = self.VAMASExperiment.number_of_manually_entered_items
             index, self.manual_entries, multiline, create = self.multiline_decision(self.manual_entries, total_lines, index)
             if create:
                 self.VAMASExperiment[option] = []
@@ -223,10 +365,10 @@ class VAMASparser():
 
         # Multiline: future upgrade experiment entries
         if option == VAMASExperimentOptions.future_upgrade_exp_entry:
-            total_lines = self.exp_numerical_labels[VAMASExperimentOptions.number_of_future_upgrade_exp_entries]
+            total_lines = self.VAMASExperiment.number_of_future_upgrade_exp_entries
             index, self.upgrade_exp_entries, multiline, create = self.multiline_decision(self.upgrade_exp_entries, total_lines, index)
             if create:
-                self.VAMASExperiment[option] = ''
+                self.VAMASExperiment[option] = []
             option = VAMASExperimentOptions(index)
 
         if multiline:
@@ -242,258 +384,366 @@ class VAMASparser():
                 index = 1
 
                 for block in range(int(line.strip())):
-                    self.blocks.append({})
-                    self.all_blocks_numerical.append(dict.fromkeys(self.blocks_numerical_labels))
-                    self.all_blocks_type.append({NumberedVAMASBlockOptions.technique:None})
+                    self.blocks.append(VAMASBlock())
 
-        # add typed info to special dictionaries for future access
+        # convert typed info once for future access
         if option in self.exp_numerical_labels:
-            self.exp_numerical_labels[option] = int(line.strip())
+            self.VAMASExperiment[option] = int(line.strip())
         elif option == VAMASExperimentOptions.experiment_mode:
-            self.exp_type_labels[option] = ExperimentMode[line.strip().upper()]
+            self.VAMASExperiment.experiment_mode_type = ExperimentMode[line.strip().upper()]
         elif option == VAMASExperimentOptions.scan_mode:
-            self.exp_type_labels[option] = ScanMode[line.strip().upper()] 
+            self.VAMASExperiment.scan_mode_type = ScanMode[line.strip().upper()] 
 
         return index, experiment_data_complete
 
-    def block_parser(self, line, index, current_block):
+    def compile_block_layout(self, technique=None):
+        '''
+        technique: Technique of the block (from VAMASspecs), None if not yet known
+
+        Once the experiment header is read, the order of the lines in a block only depends
+        on experiment_mode, scan_mode, the block technique and the block counts. This walks
+        the block enums once and resolves all optional fields into a flat sequence of steps:
+            (FIELD, (name,), None)               one line stored as a string
+            (NUMERIC, (name,), None)             one line stored as an int
+            (FLOAT, (name,), None)               one line stored as a float
+            (REPEATED, (name, ...), count)       count groups of interleaved lines, as lists
+            (ORDINATES, (name,), count)          the data, read in bulk
+        where name is the VAMASBlock field of an option and count is either an int 
+        (experiment counts) or the name of the block field holding it.
+
+        returns tuple of layout steps for a whole block
+        '''
+        experiment_mode = self.VAMASExperiment.experiment_mode_type
+        scan_mode = self.VAMASExperiment.scan_mode_type
+
+        # first option of each optional group: (number of options in group, included)
+        optional = {
+            NumberedVAMASBlockOptions.x_coord: (2, experiment_mode in 
+                (ExperimentMode.MAP, ExperimentMode.MAPDP)),
+            NumberedVAMASBlockOptions.sputtering_ion: (3, experiment_mode in 
+                (ExperimentMode.MAP, ExperimentMode.MAPSVDP, ExperimentMode.SDP, ExperimentMode.SDPSV)),
+            NumberedVAMASBlockOptions.field_of_view_x: (2, experiment_mode in 
+                (ExperimentMode.MAP, ExperimentMode.MAPDP, ExperimentMode.MAPSV, ExperimentMode.SEM)),
+            NumberedVAMASBlockOptions.first_linescan_xi: (6, experiment_mode in 
+                (ExperimentMode.MAPSV, ExperimentMode.MAPSVDP, ExperimentMode.SEM)),
+            NumberedVAMASBlockOptions.differential_width: (1, technique == Technique.AES_diff),
+            NumberedVAMASBlockOptions.abscissa_label: (4, scan_mode == ScanMode.REGULAR),
+            NumberedVAMASBlockOptions.sputtering_source_energy: (7, 
+                technique in (Technique.AES_diff, Technique.AES_dir, Technique.EDX, Technique.ELS,
+                 Technique.UPS, Technique.XPS, Technique.XRF)
+                and experiment_mode in (ExperimentMode.MAPDP, ExperimentMode.MAPSVDP, 
+                 ExperimentMode.SDP, ExperimentMode.SDPSV)),
+        }
+
+        # first option of each multiline group: (options read in turn, count)
+        repeated = {
+            NumberedVAMASBlockOptions.comment: (
+                (NumberedVAMASBlockOptions.comment,),
+                NumberedVAMASBlockOptions.number_of_lines_in_comment),
+            NumberedVAMASBlockOptions.value_of_experimental_variable: (
+                (NumberedVAMASBlockOptions.value_of_experimental_variable,),
+                self.VAMASExperiment.number_of_exp_variables),
+            NumberedVAMASBlockOptions.corresponding_variable_label: (
+                (NumberedVAMASBlockOptions.corresponding_variable_label,
+                 NumberedVAMASBlockOptions.corresponding_variable_units),
+                NumberedVAMASBlockOptions.number_of_corresponding_variables),
+            NumberedVAMASBlockOptions.additional_param_label: (
+                (NumberedVAMASBlockOptions.additional_param_label,
+                 NumberedVAMASBlockOptions.additional_param_units,
+                 NumberedVAMASBlockOptions.additional_param_value),
+                NumberedVAMASBlockOptions.number_of_additional_params),
+            VAMASBlockFooter.future_upgrade_block_entry: (
+                (VAMASBlockFooter.future_upgrade_block_entry,),
+                self.VAMASExperiment.number_of_future_upgrade_block_entries),
+            VAMASBlockFooter.minimum_ordinate_value: (
+                (VAMASBlockFooter.minimum_ordinate_value,
+                 VAMASBlockFooter.maximum_ordinate_value),
+                NumberedVAMASBlockOptions.number_of_corresponding_variables),
+        }
+
+        layout = []
+        i = 0
+        while i < len(BLOCK_OPTIONS):
+            option = BLOCK_OPTIONS[i]
+            if option in optional:
+                group_length, included = optional[option]
+                if not included:
+                    i = i + group_length
+                    continue
+            if option in repeated:
+                options, count = repeated[option]
+                if not isinstance(count, int):
+                    count = count.name
+                layout.append((REPEATED, tuple(option.name for option in options), count))
+                i = i + len(options)
+            elif option == VAMASBlockFooter.ordinate_value:
+                layout.append((ORDINATES, (option.name,), VAMASBlockFooter.number_of_ordinate_values.name))
+                i = i + 1
+            else:
+                if option in self.blocks_numerical_labels:
+                    kind = NUMERIC
+                elif option in self.blocks_float_labels:
+                    kind = FLOAT
+                else:
+                    kind = FIELD
+                layout.append((kind, (option.name,), None))
+                i = i + 1
+        return tuple(layout)
+
+    def prepare_block_layouts(self):
+        '''
+        Compiles the part of the block layout shared by all blocks (everything up to and 
+        including the technique line) and resets the per-technique layout cache.
+        Called once the experiment header is complete.
+        '''
+        layout = self.compile_block_layout()
+        split = layout.index((FIELD, (NumberedVAMASBlockOptions.technique.name,), None)) + 1
+        self.technique_step = split
+        self.block_head_layout = layout[:split]
+        self.block_layouts = {None: layout[split:]}
+
+    def get_block_layout(self, technique):
+        '''
+        technique: Technique of the block
+
+        returns the (cached) layout steps following the technique line
+        '''
+        layout = self.block_layouts.get(technique)
+        if layout is None:
+            layout = self.compile_block_layout(technique)[self.technique_step:]
+            self.block_layouts[technique] = layout
+        return layout
+
+    def read_layout(self, lines, layout, block, read_ordinates=True, phase=None):
+        '''
+        lines: iterator over the (binary) lines of the VAMAS file
+        layout: sequence of layout steps from compile_block_layout
+        block: VAMASBlock to fill in
+        read_ordinates: if False, the ordinate values are skipped instead of decoded
+        phase: optional function called with 'ordinates' before the ordinate values,
+            'ordinates_read' once their lines are read (only if they are decoded) and
+            'ordinates_end' after them, e.g. to note file offsets or times
+
+        Consumes exactly the lines described by layout. Raises ValueError if lines end
+        before the layout is complete
+        '''
+        try:
+            for kind, names, count in layout:
+                if kind == FIELD:
+                    setattr(block, names[0], next(lines).strip().decode(VAMAS_ENCODING))
+                elif kind == NUMERIC:
+                    setattr(block, names[0], int(next(lines)))
+                elif kind == FLOAT:
+                    setattr(block, names[0], float(next(lines)))
+                elif kind == REPEATED:
+                    if not isinstance(count, int):
+                        count = getattr(block, count)
+                    values = [[] for name in names]
+                    for i in range(count):
+                        for variable_values in values:
+                            variable_values.append(next(lines).strip().decode(VAMAS_ENCODING))
+                    for name, variable_values in zip(names, values):
+                        setattr(block, name, variable_values)
+                elif read_ordinates:
+                    # !!! THIS IS THE DATA !!!
+                    total_values = getattr(block, count)
+                    if phase is not None:
+                        phase('ordinates')
+                    if isinstance(lines, (MappedLines, CountedLines)):
+                        first_line = lines.count
+                        values = lines.read_lines(total_values)
+                        num_lines = lines.count - first_line
+                    else:
+                        values = list(islice(lines, total_values))
+                        num_lines = len(values)
+                    if num_lines < total_values:
+                        raise EndOfFileError(end_of_file_message(block))
+                    if phase is not None:
+                        phase('ordinates_read')
+                    setattr(block, names[0], self.decode_ordinates(values, total_values, block.number_of_corresponding_variables))
+                    if phase is not None:
+                        phase('ordinates_end')
+                else:
+                    total_values = getattr(block, count)
+                    if phase is not None:
+                        phase('ordinates')
+                    if isinstance(lines, (MappedLines, CountedLines)):
+                        skipped = lines.skip_lines(total_values)
+                    else:
+                        # skip over the data without converting it
+                        skipped = sum(1 for line in islice(lines, total_values))
+                    if skipped < total_values:
+                        raise EndOfFileError(end_of_file_message(block))
+                    if phase is not None:
+                        phase('ordinates_end')
+        except StopIteration:
+            # a bare StopIteration would end (or, under PEP 479, break) the generators
+            # reading blocks, so it is reported like truncated ordinate values
+            raise EndOfFileError(end_of_file_message(block)) from None
+
+    def decode_ordinates(self, lines, total_values, num_variables):
+        '''
+        lines: list of the lines holding the ordinate values of a block, or the
+            raw bytes spanning those lines (memory-mapped files)
+        total_values: number_of_ordinate_values of the block
+        num_variables: number_of_corresponding_variables of the block
+
+        Converts the whole data section in one go. Values are interleaved by corresponding
+        variable, so they are reshaped to (n_points, num_variables) and transposed.
+
+        returns float64 array of shape (num_variables, n_points); row i is a strided view
+        holding the values of corresponding variable i
+        '''
+        if isinstance(lines, bytes):
+            values = np.fromstring(lines, dtype=np.float64, sep=' ')
+        else:
+            values = np.array(lines, dtype=np.float64)
+        if len(values) < total_values:
+            # the lines were all there (see read_layout), so some are not numbers
+            raise ValueError('malformed ordinate values in a block')
+        return self.deinterleave(values, num_variables)
+
+    def deinterleave(self, values, num_variables):
+        '''
+        values: float64 array of ordinate values as stored in the file
+        num_variables: number_of_corresponding_variables of the block
+
+        returns view of values with shape (num_variables, n_points)
+        '''
+        if num_variables == 0:
+            return values.reshape(0, 0)
+        return values.reshape(-1, num_variables).T
+
+    def block_parser(self, lines, current_block):
         '''
-        line: current line of text file
-        index: index into spec enum
+        lines: iterator over the lines of the VAMAS file, positioned at the start of a block
         current_block: index of block to fill in
 
-        returns: new index, new current_block
+        reads a whole block, including its ordinate values
+
+        returns the filled VAMASBlock
         '''
         block = self.blocks[current_block]
-        block_numerical_labels = self.all_blocks_numerical[current_block]
-        block_type_labels = self.all_blocks_type[current_block]
-        multiline = False
+        self.read_block(lines, block)
+        return block
 
-        # select the correct option from the correct enum
-        # fill in header first
-        if not self.current_block_header:
-            option = VAMASBlockHeader(index)
-            if option == VAMASBlockHeader.sample_identifier:
-                self.current_block_header = True
-
-                # initialize counters for this block
-                self.block_comment_lines = 0
-                self.exp_vars = 0
-                self.corresponding_vars = 0
-                self.additional_params = 0
-                self.upgrade_blocks = 0
-                self.ordinate_val_labels = 0
-                self.ordinate_vals = 0
-
-                self.third_numbered_pair = False
-                index = 0
-        # then the section of numbered options
-        
-        elif not self.current_block_numbered:
-            option = NumberedVAMASBlockOptions(index)
-
-            # MUTLILINE: number_of_lines_in_comment
-            if option == NumberedVAMASBlockOptions.comment:
-                total_lines = block_numerical_labels[NumberedVAMASBlockOptions.number_of_lines_in_comment]
-                index, self.block_comment_lines, multiline, create = self.multiline_decision(self.block_comment_lines, total_lines, index)
-                if create:
-                    block[option] = []
-                option = NumberedVAMASBlockOptions(index)
-
-            # OPTIONAL: ExperimentMode = MAP/MAPDP
-            if option == NumberedVAMASBlockOptions.x_coord:
-                if (self.exp_type_labels[VAMASExperimentOptions.experiment_mode]
-                    in (ExperimentMode.MAP, ExperimentMode.MAPDP)):
-                    pass
-                else:
-                    index = index + 2
-                    option = NumberedVAMASBlockOptions(index)
-
-            # MULTILINE: number_of_exp_variables
-            if option == NumberedVAMASBlockOptions.value_of_experimental_variable:
-                total_lines = self.exp_numerical_labels[VAMASExperimentOptions.number_of_exp_variables]
-                index, self.exp_vars, multiline, create = self.multiline_decision(self.exp_vars, total_lines, index)
-                if create:
-                    block[option] = []
-                option = NumberedVAMASBlockOptions(index)
-
-            # OPTIONAL: ExperimentMode = MAP/MAPSVDP/SDP/SDPSV
-            if option == NumberedVAMASBlockOptions.sputtering_ion:
-                if (self.exp_type_labels[VAMASExperimentOptions.experiment_mode]
-                    in (ExperimentMode.MAP, ExperimentMode.MAPSVDP, ExperimentMode.SDP, ExperimentMode.SDPSV)):
-                    pass 
-                else:
-                    index = index + 3
-                    option = NumberedVAMASBlockOptions(index)     
-
-            # OPTIONAL: ExperimentMode = MAP/MAPDP/MAPSV/SEM
-            if option == NumberedVAMASBlockOptions.field_of_view_x:
-                if (self.exp_type_labels[VAMASExperimentOptions.experiment_mode]
-                    in (ExperimentMode.MAP, ExperimentMode.MAPDP, 
-                    ExperimentMode.MAPSV, ExperimentMode.SEM)):
-                    pass 
-                else:
-                    index = index + 2
-                    option = NumberedVAMASBlockOptions(index)    
-
-            # OPTIONAL: ExperimentMode = MAPSV/MAPSVDP/SEM
-            if option == NumberedVAMASBlockOptions.first_linescan_xi:
-                if (self.exp_type_labels[VAMASExperimentOptions.experiment_mode]
-                    in (ExperimentMode.MAPSV, ExperimentMode.MAPSVDP, ExperimentMode.SEM)):   
-                    pass
-                else:
-                    index = index + 6
-                    option = NumberedVAMASBlockOptions(index)
-            
-            # OPTIONAL: Technique = AES_diff
-            if option == NumberedVAMASBlockOptions.differential_width:
-                if (block_type_labels[NumberedVAMASBlockOptions.technique]
-                    == Technique.AES_diff):
-                    pass 
-                else:
-                    index = index + 1
-                    option = NumberedVAMASBlockOptions(index)
-
-            # OPTIONAL: ScanMode = REGULAR
-            if option == NumberedVAMASBlockOptions.abscissa_label:
-                if (self.exp_type_labels[VAMASExperimentOptions.scan_mode]
-                    == ScanMode.REGULAR):
-                    pass 
-                else:
-                    index = index + 4
-                    option = NumberedVAMASBlockOptions(index)
-
-            # MULTILINE: number_of_corresponding_variables
-            if option == NumberedVAMASBlockOptions.corresponding_variable_label and not self.second_numbered_pair:
-                total_lines = block_numerical_labels[NumberedVAMASBlockOptions.number_of_corresponding_variables]
-                index, self.corresponding_vars, multiline, create = self.multiline_decision(self.corresponding_vars, total_lines, index, 2)
-                if create:
-                    block[option] = []
-                    block[NumberedVAMASBlockOptions.corresponding_variable_units] = []
-                if multiline:
-                    self.second_numbered_pair = True
-                option = NumberedVAMASBlockOptions(index)
-            elif option == NumberedVAMASBlockOptions.corresponding_variable_label and self.second_numbered_pair:
-                block[NumberedVAMASBlockOptions.corresponding_variable_units].append(line.strip())
-                self.second_numbered_pair = False
-                return index, current_block
-
-            # OPTIONAL: Technique = AES_diff/AES_dir/EDX/ELS AND ExperimentMode = MAPDP/MAPSVDP/SDP/SDPSV
-            if option == NumberedVAMASBlockOptions.sputtering_source_energy:
-                if (block_type_labels[NumberedVAMASBlockOptions.technique]
-                    in (Technique.AES_diff, Technique.AES_dir, Technique.EDX, Technique.ELS,
-                     Technique.UPS, Technique.XPS, Technique.XRF)
-                    and self.exp_type_labels[VAMASExperimentOptions.experiment_mode]
-                    in (ExperimentMode.MAPDP, ExperimentMode.MAPSVDP, ExperimentMode.SDP, 
-                     ExperimentMode.SDPSV)):
-                    pass 
-                else:
-                    index = index + 7
-                    option = NumberedVAMASBlockOptions(index)
-
-            # MUTLILINE: number_of_additional_params
-            if option == NumberedVAMASBlockOptions.additional_param_label and not (self.second_numbered_pair or self.third_numbered_pair):
-                total_lines = block_numerical_labels[NumberedVAMASBlockOptions.number_of_additional_params]
-                index, self.additional_params, multiline, create = self.multiline_decision(self.additional_params, total_lines, index, 3)
-                if create:
-                    block[option] = []
-                    block[NumberedVAMASBlockOptions.additional_param_units] = []
-                    block[NumberedVAMASBlockOptions.additional_param_value] = []
-                if multiline:
-                    self.second_numbered_pair = True
-                    self.third_numbered_pair = True 
-                else:
-                    self.current_block_numbered = True
-                    index = 1
-                option = NumberedVAMASBlockOptions(index)
-            elif option == NumberedVAMASBlockOptions.additional_param_label and self.second_numbered_pair:
-                block[NumberedVAMASBlockOptions.additional_param_units].append(line.strip())
-                self.second_numbered_pair = False 
-                return index, current_block
-            elif option == NumberedVAMASBlockOptions.additional_param_label and self.third_numbered_pair:
-                block[NumberedVAMASBlockOptions.additional_param_value].append(line.strip())
-                self.third_numbered_pair = False
-                return index, current_block
-
-        # finally the footer
-        if self.current_block_numbered:
-            option = VAMASBlockFooter(index)
-
-            # MULTILINE: number_of_future_upgrade_block_entries
-            if option == VAMASBlockFooter.future_upgrade_block_entry:
-                total_lines = self.exp_numerical_labels[VAMASExperimentOptions.number_of_future_upgrade_block_entries]
-                index, self.upgrade_blocks, multiline, create = self.multiline_decision(self.upgrade_blocks, total_lines, index)
-                if create:
-                    block[option] = []
-                option = VAMASBlockFooter(index)
-
-            # MUTLILINE: number_of_corresponding_variables
-            if option == VAMASBlockFooter.minimum_ordinate_value and not self.second_numbered_pair:
-                total_lines = block_numerical_labels[NumberedVAMASBlockOptions.number_of_corresponding_variables]
-                index, self.ordinate_val_labels, multiline, create = self.multiline_decision(self.ordinate_val_labels, total_lines, index, 2)
-                if create:
-                    block[option] = []
-                    block[VAMASBlockFooter.maximum_ordinate_value] = []
-                if multiline:
-                    self.second_numbered_pair = True
-                option = VAMASBlockFooter(index)
-            elif option == VAMASBlockFooter.minimum_ordinate_value and self.second_numbered_pair:
-                block[VAMASBlockFooter.maximum_ordinate_value].append(line.strip())
-                self.second_numbered_pair = False 
-                return index, current_block
-
-            # !!! THIS IS THE DATA !!!
-            if option == VAMASBlockFooter.ordinate_value:
-                total_lines = block_numerical_labels[VAMASBlockFooter.number_of_ordinate_values]
-                lines_per_item = block_numerical_labels[NumberedVAMASBlockOptions.number_of_corresponding_variables]
-
-                index, self.ordinate_vals, multiline, create = self.multiline_decision(self.ordinate_vals, total_lines, index, lines_per_item)
-                # create a list for the values in each variable
-                if create:
-                    self.var_index = 0
-                    block[VAMASBlockFooter.ordinate_value] = []
-                    for var in range(lines_per_item):
-                        block[VAMASBlockFooter.ordinate_value].append([])
-
-                if self.var_index >= lines_per_item:
-                    self.var_index = 0
-
-        # populate control dictionaries
-        if option in block_numerical_labels:
-            block_numerical_labels[option] = int(line.strip())
-        elif option == NumberedVAMASBlockOptions.technique:
-            block_type_labels[NumberedVAMASBlockOptions.technique] == Technique[line.strip().upper()]
-
-        if multiline and option == VAMASBlockFooter.ordinate_value:
-            block[option][self.var_index].append(float(line.strip()))
-            self.var_index = self.var_index + 1
-        elif multiline:
-            block[option].append(line.strip())
-        elif option == VAMASBlockFooter.ordinate_value:
-            self.current_block_footer = True 
+    def read_block(self, lines, block, read_ordinates=True, phase=None):
+        '''
+        lines: iterator over the lines of the VAMAS file, positioned at the start of a block
+        block: VAMASBlock to fill in
+        read_ordinates: if False, the ordinate values are skipped instead of decoded
+        phase: optional function called at the ordinate values, see read_layout
+        '''
+        self.read_layout(lines, self.block_head_layout, block)
+        block.technique_type = Technique.from_label(block.technique)
+        self.read_layout(lines, self.get_block_layout(block.technique_type), block, read_ordinates, phase)
+        if self.VAMASExperiment.scan_mode_type == ScanMode.IRREGULAR:
+            self.irregular_abscissa(block)
+
+    def irregular_abscissa(self, block):
+        '''
+        block: VAMASBlock of an IRREGULAR scan mode file
+
+        The abscissa of an irregular scan is not given by start and increment but stored as
+        the first corresponding variable, interleaved with the ordinates. Its label and units
+        become the abscissa label and units, and its values (if read) the abscissa_value view.
+        '''
+        if not block.number_of_corresponding_variables:
+            return
+        block.abscissa_label = block.corresponding_variable_label[0]
+        block.abscissa_units = block.corresponding_variable_units[0]
+        if hasattr(block, 'ordinate_value'):
+            block.abscissa_value = block.ordinate_value[0]
+
+    def read_experiment(self, lines):
+        '''
+        lines: iterator over the (binary) lines of the VAMAS file, from the start of the file
+
+        reads the experiment header and prepares the block layouts; lines is left
+        positioned at the start of the first block. Raises ValueError if lines end
+        before the header is complete
+        '''
+        self.VAMASExperiment = VAMASExperiment()
+        self.blocks = []
+        self.block_index = None
+
+        # counter variables
+        self.comment_lines = 0
+        self.exp_variables = 0
+        self.entries_included = 0
+        self.manual_entries = 0
+        self.upgrade_exp_entries = 0
+
+        # flags to help with variable-length options
+        self.second_numbered_pair = False
+
+        # for indexing into Enums tracking VAMAS specs
+        index = 1
+        # read out experiment data section line by line
+        for line in lines:
+            index, experiment_data_complete = self.experiment_parser(line.decode(VAMAS_ENCODING), index)
+            if experiment_data_complete:
+                break
         else:
-            block[option] = line.strip() 
-            index = index + 1
+            raise EndOfFileError('VAMAS file ended inside the experiment header')
 
-        if self.current_block_footer:
-            index = 1
-            option = VAMASBlockHeader(index)
-            current_block = current_block + 1 
+        # the block layout is fixed by the experiment header, so the blocks are read whole
+        self.prepare_block_layouts()
 
-            if current_block < len(self.blocks):
-                block = self.blocks[current_block]
-                block[option] = line.strip()
-                index = index + 1
+    def scan_blocks(self, lines, tell):
+        '''
+        lines: iterator over the lines of the VAMAS file, positioned at the start of the first block
+        tell: function returning the byte offset of the next line of lines
 
-            self.current_block_header = False 
-            self.current_block_numbered = False 
-            self.current_block_footer = False
+        Quick pass over the blocks that reads their headers but skips the ordinate values
 
-        # TODO if statement that sets current_block += 1 if block completed
-        return index, current_block
+        yields byte offset and VAMASBlock (without ordinate_value) for each block
+        '''
+        for current_block in range(len(self.blocks)):
+            offset = tell()
+            block = VAMASBlock()
+            self.read_block(lines, block, read_ordinates=False)
+            yield offset, block
 
-    def read_VAMAS(self):
+    def scan_data(self, lines, tell):
         '''
+        lines: iterator over the lines of the VAMAS file, positioned at the start of the first block
+        tell: function returning the byte offset of the next line of lines
+
+        Like scan_blocks, but also notes where the ordinate values of each block are, so
+        they can later be decoded straight from the file without reading the block header
+
+        yields byte offset of the block, byte offsets of the start and end of its ordinate
+        values and VAMASBlock (without ordinate_value) for each block
+        '''
+        for current_block in range(len(self.blocks)):
+            offset = tell()
+            block = VAMASBlock()
+            offsets = {}
+            def phase(name):
+                offsets[name] = tell()
+            self.read_block(lines, block, read_ordinates=False, phase=phase)
+            yield offset, offsets['ordinates'], offsets['ordinates_end'], block
+
+    def index_blocks(self, lines, tell):
+        '''
+        lines: iterator over the lines of the VAMAS file, positioned at the start of the first block
+        tell: function returning the byte offset of the next line of lines
+
+        returns list of (byte offset, block_identifier, sample_identifier) for each block
+        '''
+        return [(offset, block.block_identifier, block.sample_identifier)
+            for offset, block in self.scan_blocks(lines, tell)]
+
+    def read_VAMAS(self, lazy=False, cache_size=64, memory_map=False, stats=None):
+        '''
+        lazy: if True, only index the blocks and parse each one when it is first accessed
+        cache_size: number of parsed blocks kept in memory in lazy mode
+        memory_map: if True, mmap the file and read it through MappedLines instead of 
+            reading it line by line
+        stats: optional VAMASstats.ParseStats to record the parse timings, sizes and
+            allocations of the file in (see VAMASstats); None reads without instrumentation
+
         BASIC VAMAS FILESTRUCTURE:
             - Experiment
             - Block 1
@@ -502,38 +752,748 @@ class VAMASparser():
 
         reads VAMAS file into class container variables, obtainable through
         getter functions
+
+        In lazy mode, self.blocks is a sequence backed by a bounded cache of parsed blocks,
+        and block_identifier and sample_identifier are answered from the block index 
+        without parsing.
+        A lazily read memory-mapped file keeps its mapping open for later block loads, until
+        VAMASparser.close() (or the end of a with block on the parser).
+
+        Compressed files are decompressed as they are read; they cannot be memory-mapped, so
+        memory_map is ignored for them. Lazy loads from a compressed file seek in the
+        decompressed stream, which decompresses up to the block again.
         '''
-        self.VAMASExperiment = {}
-        self.blocks = []
+        self.mapped_lines = None
+        with open_vamas(self.filename) as file:
+            lines, tell = self.open_lines(file, memory_map)
+            if stats is not None:
+                lines = stats.track(self, lines, tell)
+                stats.read_experiment(self, lines)
+            else:
+                self.read_experiment(lines)
 
-        with open(self.filename) as file:
-            # flags to help keep track of structure
-            experiment_data_complete = False
-            self.current_block_header = False 
-            self.current_block_numbered = False 
-            self.current_block_footer = False
-            current_block = 0
-
-            # counter variables
-            self.comment_lines = 0
-            self.exp_variables = 0
-            self.entries_included = 0
-            self.manual_entries = 0
-            self.upgrade_exp_entries = 0
-
-            # flags to help with variable-length options
-            self.multiline = False
-            self.second_numbered_pair = False
+            if lazy:
+                if stats is not None:
+                    self.block_index = stats.index_blocks(self, lines)
+                else:
+                    self.block_index = self.index_blocks(lines, tell)
+                self.blocks = LazyBlocks(self, self.block_index, cache_size)
+                if isinstance(lines, MappedLines):
+                    self.mapped_lines = lines
+            elif stats is not None:
+                stats.read_blocks(self, lines)
+            else:
+                for current_block in range(len(self.blocks)):
+                    self.block_parser(lines, current_block)
 
-            # for indexing into Enums tracking VAMAS specs
-            index = 1
-            # iterate over lines in VAMAS file
-            for line in file:
-                # read out experiment data section
-                if not experiment_data_complete:
-                    index, experiment_data_complete = self.experiment_parser(line, index)
-            
-                elif current_block < self.exp_numerical_labels[VAMASExperimentOptions.number_of_blocks]:
-                    index, current_block = self.block_parser(line, index, current_block)
-                    
-        return self.VAMASExperiment, self.blocks
\ No newline at end of file
+            if stats is not None:
+                stats.finish(lines)
+            if not lazy and isinstance(lines, MappedLines):
+                lines.close()
+
+        return self.VAMASExperiment, self.blocks
+
+    def read_buffer(self, data):
+        '''
+        data: contents of a VAMAS file [bytes], plain or compressed
+
+        reads a VAMAS file that is already in memory, like read_VAMAS
+
+        returns VAMASExperiment and list of VAMASBlocks
+        '''
+        with open_vamas(io.BytesIO(data)) as file:
+            lines = iter(file.readline, b'')
+            self.read_experiment(lines)
+            for current_block in range(len(self.blocks)):
+                self.block_parser(lines, current_block)
+        return self.VAMASExperiment, self.blocks
+
+    @classmethod
+    async def aread(cls, filename, executor=None):
+        '''
+        filename: full path+name of file to read [string]
+        executor: concurrent.futures executor to parse in, None for the event loop's
+            default thread pool. A ProcessPoolExecutor parses in parallel, sending the
+            result back packed (see VAMASparser.pack)
+
+        Async version of read_VAMAS: the file is read in a thread and parsed in executor,
+        so waiting on slow (e.g. network) storage overlaps with parsing other files.
+
+        returns parsed VAMASparser
+        '''
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(None, read_file, filename)
+        if isinstance(executor, ProcessPoolExecutor):
+            packed = await loop.run_in_executor(executor, load_packed_buffer, filename, data)
+            return cls.unpack(filename, packed)
+        parser = cls(filename)
+        await loop.run_in_executor(executor, parser.read_buffer, data)
+        return parser
+
+    def iter_blocks(self, memory_map=False):
+        '''
+        memory_map: if True, mmap the file (see read_VAMAS)
+
+        Streaming alternative to read_VAMAS. The experiment header is read into the usual
+        container variables, then each block is yielded as soon as it is parsed and is not
+        kept in self.blocks, so a file can be reduced block by block in constant memory.
+
+        yields VAMASBlock, x values [float64 array] and y values [float64 array of 
+        shape (number_of_corresponding_variables, n_points)] for each block in turn
+        '''
+        with open_vamas(self.filename) as file:
+            lines, tell = self.open_lines(file, memory_map)
+            try:
+                self.read_experiment(lines)
+                num_blocks = len(self.blocks)
+                self.blocks = []
+
+                for current_block in range(num_blocks):
+                    block = VAMASBlock()
+                    self.read_block(lines, block)
+                    yield block, self.block_x_vals(block), block.ordinate_value
+            finally:
+                if isinstance(lines, MappedLines):
+                    lines.close()
+
+    def poll(self):
+        '''
+        Follow mode: parses the complete blocks appended to the file since the last poll,
+        for files that are still being written during acquisition. Only the bytes after
+        the last complete block are read, and a block that runs into the end of the file
+        is left for the next poll. The blocks read so far are kept in self.blocks.
+        Raises ValueError for a malformed header or block.
+
+        returns list of newly read VAMASBlocks
+        '''
+        with open(self.filename, 'rb') as file:
+            if file.seek(0, 2) < self.follow_offset:
+                # file was replaced, start over
+                self.follow_offset = 0
+            file.seek(self.follow_offset)
+            data = file.read()
+
+        # complete lines only, the last one may still be being written
+        start = self.follow_offset
+        buffer = io.BytesIO(data[:data.rfind(b'\n') + 1])
+        lines = iter(buffer.readline, b'')
+
+        if start == 0:
+            try:
+                self.read_experiment(lines)
+            except EndOfFileError:
+                # header not completely written yet
+                return []
+            self.blocks = []
+            self.follow_offset = buffer.tell()
+
+        new_blocks = []
+        while len(self.blocks) < self.VAMASExperiment.number_of_blocks:
+            block = VAMASBlock()
+            try:
+                self.read_block(lines, block)
+            except EndOfFileError:
+                # block not completely written yet; anything else is a malformed block,
+                # which more data cannot fix, so it is raised
+                break
+            self.blocks.append(block)
+            new_blocks.append(block)
+            self.follow_offset = start + buffer.tell()
+        return new_blocks
+
+    def follow(self, interval=1.0, timeout=None):
+        '''
+        interval: seconds to wait between polls of the file
+        timeout: stop after this many seconds without a new block, None to wait until
+            all number_of_blocks blocks are read
+
+        Follow mode: polls a file that is still being written (see poll) and yields each
+        block once it is complete, so a live view costs O(new data) per poll rather than
+        a reparse of the whole file. Can be resumed after stopping, as the parser
+        remembers where it left off. A malformed block raises ValueError instead of
+        being waited for.
+
+        yields VAMASBlock, x values [float64 array] and y values [float64 array of 
+        shape (number_of_corresponding_variables, n_points)] for each new block
+        '''
+        last_block_time = time.monotonic()
+        while True:
+            new_blocks = self.poll()
+            for block in new_blocks:
+                yield block, self.block_x_vals(block), block.ordinate_value
+
+            if self.follow_offset and len(self.blocks) == self.VAMASExperiment.number_of_blocks:
+                return
+            if new_blocks:
+                last_block_time = time.monotonic()
+            elif timeout is not None and time.monotonic() - last_block_time > timeout:
+                return
+            time.sleep(interval)
+
+    async def afollow(self, interval=1.0, timeout=None):
+        '''
+        interval: seconds to wait between polls of the file
+        timeout: stop after this many seconds without a new block, None to wait until
+            all number_of_blocks blocks are read
+
+        Async version of follow, polling the file in a thread
+
+        yields VAMASBlock, x values [float64 array] and y values [float64 array of 
+        shape (number_of_corresponding_variables, n_points)] for each new block
+        '''
+        loop = asyncio.get_running_loop()
+        last_block_time = time.monotonic()
+        while True:
+            new_blocks = await loop.run_in_executor(None, self.poll)
+            for block in new_blocks:
+                yield block, self.block_x_vals(block), block.ordinate_value
+
+            if self.follow_offset and len(self.blocks) == self.VAMASExperiment.number_of_blocks:
+                return
+            if new_blocks:
+                last_block_time = time.monotonic()
+            elif timeout is not None and time.monotonic() - last_block_time > timeout:
+                return
+            await asyncio.sleep(interval)
+
+    def open_lines(self, file, memory_map=False):
+        '''
+        file: VAMAS file opened in binary mode
+        memory_map: if True, read the file through an mmap, if it is a plain file on disk
+            read from its start (not a decompressed stream or other file-like object)
+
+        returns iterator over the (binary) lines of file and a function returning the 
+        byte offset of its next line
+        '''
+        if memory_map and is_mappable(file):
+            lines = MappedLines(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+            return lines, lines.tell
+        # readline keeps file.tell() meaningful, unlike iterating over the file
+        return iter(file.readline, b''), file.tell
+
+    def load_block(self, offset):
+        '''
+        offset: byte offset of the block in the file, from the block index
+
+        returns VAMASBlock at offset
+        '''
+        block = VAMASBlock()
+        if self.mapped_lines is not None:
+            self.mapped_lines.seek(offset)
+            self.read_block(self.mapped_lines, block)
+        else:
+            if not isinstance(self.filename, (str, os.PathLike)):
+                # file-like object, read again from its start
+                self.filename.seek(0)
+            with open_vamas(self.filename) as file:
+                seek_forward(file, offset)
+                self.read_block(iter(file.readline, b''), block)
+        return block
+
+    def close(self):
+        '''
+        releases what a lazy read keeps open: the memory map of the file and, for blocks
+        loaded from an export, its file. Blocks loaded afterwards from a VAMAS file are
+        read by reopening it
+        '''
+        if self.mapped_lines is not None:
+            self.mapped_lines.close()
+            self.mapped_lines = None
+        if isinstance(self.blocks, LazyBlocks):
+            self.blocks.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def pack(self):
+        '''
+        Compact form of the parsed file for moving it between processes or onto disk:
+        the experiment and block headers as one JSON string (Enum options by name) and
+        the ordinate values of all blocks concatenated into one float64 array.
+
+        returns dictionary with 'header' [string], 'ordinates' [float64 array] and
+        'offsets' [int64 array] where block i's values are ordinates[offsets[i]:offsets[i+1]]
+        '''
+        ordinates = []
+        offsets = [0]
+        for block in self.blocks:
+            # back to the interleaved order of the file
+            values = block.ordinate_value.T.ravel()
+            ordinates.append(values)
+            offsets.append(offsets[-1] + len(values))
+
+        return {
+            'header': json.dumps(self.header_fields()),
+            'ordinates': np.concatenate(ordinates) if ordinates else np.empty(0),
+            'offsets': np.array(offsets, dtype=np.int64),
+        }
+
+    def header_fields(self):
+        '''
+        returns dictionary with 'experiment', a dictionary of experiment option name: value,
+        and 'blocks', a list of such dictionaries of block option name: value without the
+        ordinate values
+        '''
+        experiment = {option.name: value for option, value in self.VAMASExperiment.items()}
+        blocks = [{option.name: value for option, value in block.items()
+            if option != VAMASBlockFooter.ordinate_value} for block in self.blocks]
+        return {'experiment': experiment, 'blocks': blocks}
+
+    @classmethod
+    def unpack(cls, filename, packed):
+        '''
+        filename: full path+name of the file that was packed [string]
+        packed: dictionary from VAMASparser.pack
+
+        returns VAMASparser holding the same data as the one that was packed
+        '''
+        parser = cls(filename)
+        header = json.loads(str(packed['header']))
+        ordinates = packed['ordinates']
+        offsets = packed['offsets']
+
+        parser.restore_experiment(header['experiment'])
+        parser.blocks = []
+        for i, fields in enumerate(header['blocks']):
+            values = parser.deinterleave(ordinates[offsets[i]:offsets[i + 1]],
+                fields['number_of_corresponding_variables'])
+            parser.blocks.append(parser.restore_block(fields, values))
+        return parser
+
+    def restore_experiment(self, fields):
+        '''
+        fields: dictionary of experiment option name: value, as in VAMASparser.pack
+
+        sets the experiment header from fields
+        '''
+        # typed fields survive the JSON round trip as ints/floats
+        experiment = self.VAMASExperiment
+        for name, value in fields.items():
+            setattr(experiment, name, value)
+        experiment.experiment_mode_type = ExperimentMode[experiment.experiment_mode.upper()]
+        experiment.scan_mode_type = ScanMode[experiment.scan_mode.upper()]
+
+    def restore_block(self, fields, ordinate_value):
+        '''
+        fields: dictionary of block option name: value, as in VAMASparser.pack
+        ordinate_value: ordinate values of the block [float64 array of shape
+            (number_of_corresponding_variables, n_points)]
+
+        returns VAMASBlock holding fields and ordinate_value
+        '''
+        block = VAMASBlock()
+        for name, value in fields.items():
+            setattr(block, name, value)
+        block.technique_type = Technique.from_label(block.technique)
+        block.ordinate_value = ordinate_value
+        if self.VAMASExperiment.scan_mode_type == ScanMode.IRREGULAR:
+            self.irregular_abscissa(block)
+        return block
+
+def load_packed(filename, memory_map=False):
+    '''
+    filename: full path+name of file to read [string]
+    memory_map: passed on to VAMASparser.read_VAMAS
+
+    worker for load_many: parses one file
+
+    returns the packed parser (see VAMASparser.pack)
+    '''
+    parser = VAMASparser(filename)
+    parser.read_VAMAS(memory_map=memory_map)
+    return parser.pack()
+
+def load_packed_buffer(filename, data):
+    '''
+    filename: full path+name of the file data was read from [string]
+    data: contents of the file [bytes]
+
+    worker for VAMASparser.aread: parses one file already in memory
+
+    returns the packed parser (see VAMASparser.pack)
+    '''
+    parser = VAMASparser(filename)
+    parser.read_buffer(data)
+    return parser.pack()
+
+def source_name(source):
+    '''
+    source: full path+name of a file [string or path], or a file-like object
+
+    returns source as a string: the path, or the name of a file-like object if it
+    has one (e.g. an open file), else its repr
+    '''
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    name = getattr(source, 'name', None)
+    return name if isinstance(name, str) else repr(source)
+
+class EndOfFileError(ValueError):
+    '''
+    VAMAS file ended inside the experiment header or a block, e.g. as it is still being written
+    '''
+
+def end_of_file_message(block):
+    '''
+    block: VAMASBlock being read when the file ended
+
+    returns error message for a file that ends inside block
+    '''
+    return 'unexpected end of file in block ' + getattr(block, 'block_identifier', '')
+
+def read_file(filename):
+    '''
+    filename: full path+name of file to read [string], or a binary file-like object
+
+    returns contents of filename [bytes], still compressed if the file is
+    '''
+    if not isinstance(filename, (str, os.PathLike)):
+        return filename.read()
+    with open(filename, 'rb') as file:
+        return file.read()
+
+def compression(file):
+    '''
+    file: binary file object with a peek method, positioned at the start of the data
+
+    returns name of the compression of file ('gzip', 'xz', 'bz2' or 'zstd'), or None
+    if it is not compressed
+    '''
+    head = file.peek(6)[:6]
+    for magic, name in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return name
+    return None
+
+@contextmanager
+def open_vamas(source):
+    '''
+    source: full path+name of a VAMAS file [string], or a binary file-like object of one,
+        plain or compressed with gzip, xz, bz2 or zstd (needs zstandard)
+
+    The compression is recognised from the start of the data, not the extension. Compressed
+    files are decompressed in chunks as lines are read, so neither the compressed nor the
+    decompressed file is ever held whole in memory or written to disk. File-like objects
+    are read from their current position and left open.
+
+    yields binary file object of the (decompressed) VAMAS file
+    '''
+    with ExitStack() as stack:
+        if isinstance(source, (str, os.PathLike)):
+            file = stack.enter_context(open(source, 'rb'))
+        elif hasattr(source, 'peek'):
+            file = source
+        else:
+            # buffered for peek; detached again so source is not closed with it
+            file = io.BufferedReader(source)
+            stack.callback(file.detach)
+
+        kind = compression(file)
+        if kind == 'gzip':
+            file = stack.enter_context(gzip.GzipFile(fileobj=file, mode='rb'))
+        elif kind == 'xz':
+            file = stack.enter_context(lzma.LZMAFile(file))
+        elif kind == 'bz2':
+            file = stack.enter_context(bz2.BZ2File(file))
+        elif kind == 'zstd':
+            if zstandard is None:
+                raise ImportError('zstandard is needed to read zstd compressed VAMAS files')
+            reader = zstandard.ZstdDecompressor().stream_reader(file, closefd=False)
+            file = stack.enter_context(io.BufferedReader(reader))
+        yield file
+
+def seek_forward(file, offset):
+    '''
+    file: binary file object positioned at its start
+    offset: byte offset to move to
+
+    Streams that cannot seek, like zstd decompression, are read and discarded up to offset
+    '''
+    if file.seekable():
+        file.seek(offset)
+        return
+    while offset > 0:
+        skipped = len(file.read(min(offset, LINE_CHUNK_SIZE)))
+        if not skipped:
+            raise EndOfFileError('file ends before the offset of a block')
+        offset -= skipped
+
+def is_mappable(file):
+    '''
+    file: binary file object
+
+    returns True if file is a plain file on disk positioned at its start, so it can be
+    read through an mmap
+    '''
+    return isinstance(file, io.BufferedReader) and isinstance(file.raw, io.FileIO) and file.tell() == 0
+
+def load_many(filenames, workers=None, memory_map=False, cache=None):
+    '''
+    filenames: list of full path+name of files to read [strings]
+    workers: number of worker processes; None uses one per CPU, 1 parses in this process
+    memory_map: passed on to VAMASparser.read_VAMAS
+    cache: optional VAMAScache; files with a valid cache entry are not parsed at all,
+        and newly parsed files are added to it
+
+    Parses many VAMAS files in a process pool. Workers send each parsed file back
+    packed into one JSON header and one ordinate array (see VAMASparser.pack),
+    which is much cheaper to transfer than the nested block dictionaries.
+
+    returns list of parsed VAMASparsers in the same order as filenames
+    '''
+    parsers = [None]*len(filenames)
+    if cache is not None:
+        for i, filename in enumerate(filenames):
+            packed = cache.get(filename)
+            if packed is not None:
+                parsers[i] = VAMASparser.unpack(filename, packed)
+    missing = [i for i, parser in enumerate(parsers) if parser is None]
+
+    if workers == 1 or len(missing) < 2:
+        for i in missing:
+            parser = VAMASparser(filenames[i])
+            parser.read_VAMAS(memory_map=memory_map)
+            if cache is not None:
+                cache.put(filenames[i], parser.pack())
+            parsers[i] = parser
+        return parsers
+
+    missing_filenames = [filenames[i] for i in missing]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for i, packed in zip(missing, pool.map(load_packed, missing_filenames, [memory_map]*len(missing))):
+            if cache is not None:
+                cache.put(filenames[i], packed)
+            parsers[i] = VAMASparser.unpack(filenames[i], packed)
+    return parsers
+
+async def aload_many(filenames, concurrency=4, executor=None):
+    '''
+    filenames: list of full path+name of files to read [strings]
+    concurrency: maximum number of files being read or parsed at once
+    executor: passed on to VAMASparser.aread
+
+    returns list of parsed VAMASparsers in the same order as filenames
+    '''
+    parsers = []
+    async for parser in aiter_parsers(filenames, concurrency, executor):
+        parsers.append(parser)
+    return parsers
+
+async def aiter_parsers(filenames, concurrency=4, executor=None):
+    '''
+    filenames: list of full path+name of files to read [strings]
+    concurrency: maximum number of files being read or parsed at once
+    executor: passed on to VAMASparser.aread
+
+    Reads files concurrently, at most concurrency at a time. A new file is only started
+    when a parsed one has been taken by the consumer, so a slow consumer holds back the
+    reads instead of piling up parsed files in memory.
+
+    yields parsed VAMASparser for each file, in the order of filenames
+    '''
+    pending = deque()
+    filenames = iter(filenames)
+    try:
+        for filename in islice(filenames, concurrency):
+            pending.append(asyncio.ensure_future(VAMASparser.aread(filename, executor)))
+        while pending:
+            parser = await pending.popleft()
+            for filename in islice(filenames, 1):
+                pending.append(asyncio.ensure_future(VAMASparser.aread(filename, executor)))
+            yield parser
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def aiter_blocks(filenames, concurrency=4, executor=None):
+    '''
+    filenames: list of full path+name of files to read [strings]
+    concurrency: maximum number of files being read or parsed at once
+    executor: passed on to VAMASparser.aread
+
+    Async streaming over the blocks of many files, see aiter_parsers
+
+    yields VAMASparser of the file, VAMASBlock, x values [float64 array] and y values
+    [float64 array of shape (number_of_corresponding_variables, n_points)] for each block
+    of each file in turn
+    '''
+    async for parser in aiter_parsers(filenames, concurrency, executor):
+        for block in parser.blocks:
+            yield parser, block, parser.block_x_vals(block), block.ordinate_value
+
+class MappedLines():
+    def __init__(self, mapping):
+        '''
+        mapping: mmap of a VAMAS file
+
+        Iterates over the lines of a memory-mapped file like iter(file.readline, b'').
+        Whole runs of lines (the ordinate values) are sliced out in one piece or skipped by
+        finding their line ends a chunk at a time, so no index of the lines is kept and
+        opening a file costs nothing however large it is.
+        '''
+        self.mapping = mapping
+        # lines read or skipped so far, for the parse statistics (see VAMASstats)
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.mapping.readline()
+        if not line:
+            raise StopIteration
+        self.count += 1
+        return line
+
+    def read_lines(self, n):
+        '''
+        n: number of lines to read
+
+        returns bytes spanning the next n lines (fewer at the end of the file)
+        '''
+        start = self.mapping.tell()
+        self.skip_lines(n)
+        return self.mapping[start:self.mapping.tell()]
+
+    def skip_lines(self, n):
+        '''
+        n: number of lines to skip
+
+        returns number of lines skipped (fewer than n at the end of the file)
+        '''
+        position = self.mapping.tell()
+        size = len(self.mapping)
+        skipped = 0
+        # a guess of the bytes needed, so short runs do not scan a whole chunk
+        chunk_size = min(max(64*n, 4096), LINE_CHUNK_SIZE)
+        while skipped < n and position < size:
+            chunk = np.frombuffer(self.mapping, np.uint8, min(chunk_size, size - position), position)
+            line_ends = np.flatnonzero(chunk == NEWLINE)
+            if len(line_ends) >= n - skipped:
+                position = position + int(line_ends[n - skipped - 1]) + 1
+                skipped = n
+            else:
+                skipped = skipped + len(line_ends)
+                position = position + len(chunk)
+                if position == size and (len(line_ends) == 0 or line_ends[-1] + 1 < len(chunk)):
+                    # last line without a newline
+                    skipped = skipped + 1
+            chunk_size = LINE_CHUNK_SIZE
+        # the view must be gone before the mapping can be closed
+        chunk = None
+        self.mapping.seek(position)
+        self.count += skipped
+        return skipped
+
+    def tell(self):
+        '''
+        returns byte offset of the next line
+        '''
+        return self.mapping.tell()
+
+    def seek(self, offset):
+        '''
+        offset: byte offset of the start of a line; count is not changed
+        '''
+        self.mapping.seek(offset)
+
+    def close(self):
+        self.mapping.close()
+
+class CountedLines():
+    def __init__(self, lines):
+        '''
+        lines: iterator over the lines of a file, e.g. iter(file.readline, b'')
+
+        Passes on the lines of lines, counting them; runs of lines are read or skipped
+        in bulk like MappedLines. Used for the parse statistics, see VAMASstats
+        '''
+        self.lines = lines
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self.lines)
+        self.count += 1
+        return line
+
+    def read_lines(self, n):
+        '''
+        n: number of lines to read
+
+        returns list of the next n lines (fewer at the end of the file)
+        '''
+        values = list(islice(self.lines, n))
+        self.count += len(values)
+        return values
+
+    def skip_lines(self, n):
+        '''
+        n: number of lines to skip
+
+        returns number of lines skipped (fewer than n at the end of the file)
+        '''
+        skipped = sum(1 for line in islice(self.lines, n))
+        self.count += skipped
+        return skipped
+
+class LazyBlocks():
+    def __init__(self, parser, block_index, cache_size=64):
+        '''
+        parser: VAMASparser whose experiment header has been read
+        block_index: list of (byte offset, block_identifier, sample_identifier) from VAMASparser.index_blocks
+        cache_size: maximum number of parsed blocks kept in memory
+
+        Parses blocks of a VAMAS file on demand, keeping the most recently used ones
+        '''
+        self.parser = parser
+        self.block_index = block_index
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+    def __len__(self):
+        return len(self.block_index)
+
+    def __getitem__(self, block_index):
+        '''
+        block_index: index of block to read, or a slice
+
+        returns VAMASBlock, parsing the block if it is not cached, or list of VAMASBlocks
+        for a slice, as for the list of an eager read
+        '''
+        if isinstance(block_index, slice):
+            return [self[i] for i in range(*block_index.indices(len(self)))]
+        if block_index < 0:
+            block_index = block_index + len(self.block_index)
+        if block_index in self.cache:
+            self.cache.move_to_end(block_index)
+            return self.cache[block_index]
+
+        block = self.load(block_index)
+        self.cache[block_index] = block
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return block
+
+    def load(self, block_index):
+        '''
+        block_index: index of block to read
+
+        returns VAMASBlock parsed from the file
+        '''
+        return self.parser.load_block(self.block_index[block_index][0])
+
+    def __iter__(self):
+        for block_index in range(len(self)):
+            yield self[block_index]
+
+    def close(self):
+        '''
+        drops the cached blocks
+        '''
+        self.cache.clear()
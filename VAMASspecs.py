@@ -31,6 +31,19 @@ class Technique (Enum):
     XPS = auto()
     XRF = auto()
 
+    @classmethod
+    def from_label(cls, label):
+        '''
+        label: technique as written in a VAMAS file, e.g. 'XPS', 'AES diff' or 'SIMS energy spec'
+
+        returns the matching Technique, or None if the label is not recognized
+        '''
+        name = label.strip().upper().replace(' ENERGY SPEC', '_ENSPEC').replace(' ', '_')
+        for technique in cls:
+            if technique.name.upper() == name:
+                return technique
+        return None
+
 class VAMASExperimentOptions(Enum):
     '''
     representation of possible VAMAS experiment options
@@ -0,0 +1,203 @@
+'''
+Optional instrumentation of VAMASparser.read_VAMAS.
+
+Pass a ParseStats to read_VAMAS(stats=...) to record, for one file, the time spent in the
+experiment header, in the block metadata (the layout state machine), in reading the lines
+of ordinate values and in converting them to floats, together with the bytes and lines read
+and per-block timings and allocation counts. Hooks are called with each record as it is
+finished, e.g. to send it on to a metrics collector.
+
+Without stats, read_VAMAS takes its usual path, so the instrumentation costs nothing when
+it is not used.
+'''
+
+import sys
+import time
+
+from VAMASparse import MappedLines, CountedLines
+
+class BlockStats():
+    def __init__(self, index, offset):
+        '''
+        index: index of the block in the file
+        offset: byte offset of the block in the file
+
+        Timings [s], size and allocations of parsing one block
+        '''
+        self.index = index
+        self.offset = offset
+        self.block_identifier = None
+        self.bytes_read = 0
+        self.lines = 0
+        self.metadata_time = 0.0
+        self.read_time = 0.0
+        self.convert_time = 0.0
+        # net change in the number of memory blocks held by the Python allocator
+        self.allocated_blocks = 0
+        self.ordinate_bytes = 0
+
+    @property
+    def total_time(self):
+        return self.metadata_time + self.read_time + self.convert_time
+
+    def as_dict(self):
+        '''
+        returns dictionary of the recorded values, including total_time
+        '''
+        fields = dict(vars(self))
+        fields['total_time'] = self.total_time
+        return fields
+
+class ParseStats():
+    def __init__(self, hooks=(), blocks=True):
+        '''
+        hooks: callables hook(event, record), called with ('header', ParseStats) once the
+            experiment header is read, ('block', BlockStats) after each block and
+            ('file', ParseStats) once the whole file is read
+        blocks: if False, only the per-file totals are kept, not a BlockStats per block
+
+        Parse statistics of one file, filled in by VAMASparser.read_VAMAS(stats=...).
+        Times are in seconds. In lazy mode only the header and the block index scan
+        (as metadata_time) are recorded.
+        '''
+        self.hooks = list(hooks)
+        self.keep_blocks = blocks
+        self.filename = None
+        self.header_time = 0.0
+        self.header_lines = 0
+        self.metadata_time = 0.0
+        self.read_time = 0.0
+        self.convert_time = 0.0
+        self.total_time = 0.0
+        self.bytes_read = 0
+        self.lines = 0
+        self.num_blocks = 0
+        self.allocated_blocks = 0
+        self.blocks = []
+        self.tell = None
+        self.start_time = None
+
+    @property
+    def lines_per_second(self):
+        return self.lines/self.total_time if self.total_time else 0.0
+
+    @property
+    def bytes_per_second(self):
+        return self.bytes_read/self.total_time if self.total_time else 0.0
+
+    def as_dict(self):
+        '''
+        returns dictionary of the per-file values, without the per-block records
+        '''
+        fields = {name: value for name, value in vars(self).items()
+            if name not in ('hooks', 'keep_blocks', 'blocks', 'tell', 'start_time')}
+        fields['lines_per_second'] = self.lines_per_second
+        fields['bytes_per_second'] = self.bytes_per_second
+        return fields
+
+    def emit(self, event, record):
+        for hook in self.hooks:
+            hook(event, record)
+
+    def track(self, parser, lines, tell):
+        '''
+        parser: VAMASparser about to read a file
+        lines: iterator over the (binary) lines of the file, from VAMASparser.open_lines
+        tell: function returning the byte offset of the next line of lines
+
+        Starts the statistics of the file read through lines
+
+        returns lines to read the file through, counting the lines read
+        '''
+        self.filename = parser.source_name
+        self.tell = tell
+        self.start_time = time.perf_counter()
+        if isinstance(lines, MappedLines):
+            return lines
+        return CountedLines(lines)
+
+    def line_number(self, lines):
+        '''
+        lines: iterator returned by track
+
+        returns number of lines read so far
+        '''
+        return lines.count
+
+    def read_experiment(self, parser, lines):
+        '''
+        parser: VAMASparser
+        lines: iterator returned by track, at the start of the file
+
+        VAMASparser.read_experiment, timed
+        '''
+        start = time.perf_counter()
+        parser.read_experiment(lines)
+        self.header_time = time.perf_counter() - start
+        self.header_lines = self.line_number(lines)
+        self.num_blocks = len(parser.blocks)
+        self.emit('header', self)
+
+    def index_blocks(self, parser, lines):
+        '''
+        parser: VAMASparser whose experiment header has been read
+        lines: iterator returned by track, at the start of the first block
+
+        VAMASparser.index_blocks for lazy mode, timed as block metadata
+
+        returns block index
+        '''
+        start = time.perf_counter()
+        block_index = parser.index_blocks(lines, self.tell)
+        self.metadata_time = time.perf_counter() - start
+        return block_index
+
+    def read_blocks(self, parser, lines):
+        '''
+        parser: VAMASparser whose experiment header has been read
+        lines: iterator returned by track, at the start of the first block
+
+        Reads all blocks with VAMASparser.read_block, timing the block metadata, the
+        reading of the ordinate lines and their conversion to floats separately
+        '''
+        clock = time.perf_counter
+        for current_block in range(len(parser.blocks)):
+            block = parser.blocks[current_block]
+            record = BlockStats(current_block, self.tell())
+            first_line = self.line_number(lines)
+            allocated = sys.getallocatedblocks()
+
+            times = {}
+            def phase(name):
+                times[name] = clock()
+            start = clock()
+            parser.read_block(lines, block, phase=phase)
+            end = clock()
+
+            record.block_identifier = block.block_identifier
+            record.metadata_time = (times['ordinates'] - start) + (end - times['ordinates_end'])
+            record.read_time = times['ordinates_read'] - times['ordinates']
+            record.convert_time = times['ordinates_end'] - times['ordinates_read']
+            record.bytes_read = self.tell() - record.offset
+            record.lines = self.line_number(lines) - first_line
+            record.allocated_blocks = sys.getallocatedblocks() - allocated
+            record.ordinate_bytes = block.ordinate_value.nbytes
+
+            self.metadata_time += record.metadata_time
+            self.read_time += record.read_time
+            self.convert_time += record.convert_time
+            self.allocated_blocks += record.allocated_blocks
+            if self.keep_blocks:
+                self.blocks.append(record)
+            self.emit('block', record)
+
+    def finish(self, lines):
+        '''
+        lines: iterator returned by track
+
+        Totals up the file once it is read
+        '''
+        self.total_time = time.perf_counter() - self.start_time
+        self.bytes_read = self.tell()
+        self.lines = self.line_number(lines)
+        self.emit('file', self)
@@ -0,0 +1,192 @@
+'''
+Writes parsed (and possibly processed) VAMAS data back to VAMAS files.
+
+Blocks are written by walking the same compiled block layout that VAMASparser reads them
+with (see VAMASparser.compile_block_layout), so the optional fields follow the same
+VAMASspecs rules in both directions.
+'''
+
+import numpy as np
+
+from VAMASparse import VAMAS_ENCODING, FIELD, NUMERIC, FLOAT, REPEATED, ORDINATES
+from VAMASspecs import *
+
+class VAMASwriter():
+    def __init__(self, parser, newline='\r\n'):
+        '''
+        parser: VAMASparser holding the experiment header (and usually the blocks) to write
+        newline: line terminator, VAMAS files from CasaXPS and PHI use '\r\n'
+
+        This is a class for writing VAMAS files.
+        Use VAMASwriter(parser).write(filename) to write all blocks of parser, or pass
+        processed blocks to write()
+        '''
+        self.parser = parser
+        self.newline = newline
+        self.block_layouts = {}
+
+    def get_block_layout(self, technique):
+        '''
+        technique: Technique of the block
+
+        returns the (cached) layout steps of a whole block
+        '''
+        layout = self.block_layouts.get(technique)
+        if layout is None:
+            layout = self.parser.compile_block_layout(technique)
+            self.block_layouts[technique] = layout
+        return layout
+
+    def experiment_lines(self, num_blocks):
+        '''
+        num_blocks: number of blocks that will follow
+
+        returns list of lines of the experiment header
+        '''
+        experiment = self.parser.VAMASExperiment
+        lines = []
+        for option, value in experiment.items():
+            if option == VAMASExperimentOptions.exp_variable_label:
+                # label and unit of each variable are interleaved in the file
+                for label, unit in zip(value, experiment.exp_variable_unit):
+                    lines.append(label)
+                    lines.append(unit)
+            elif option == VAMASExperimentOptions.exp_variable_unit:
+                continue
+            elif option == VAMASExperimentOptions.number_of_blocks:
+                lines.append(str(num_blocks))
+            elif isinstance(value, list):
+                lines.extend(value)
+            else:
+                lines.append(str(value))
+        return lines
+
+    def block_bytes(self, block):
+        '''
+        block: VAMASBlock to write
+
+        returns encoded lines of block, ending with a newline.
+        number_of_ordinate_values and the minimum and maximum ordinate value of each
+        corresponding variable are written from the ordinate values, so processed
+        spectra only need their ordinate_value replaced.
+        '''
+        values = block.ordinate_value
+        if values.shape[0] != block.number_of_corresponding_variables:
+            raise ValueError('block %s has %d corresponding variables but ordinate values for %d'
+                % (block.block_identifier, block.number_of_corresponding_variables, values.shape[0]))
+        if values.size:
+            limits = {
+                VAMASBlockFooter.minimum_ordinate_value.name: [format_float(value) for value in values.min(axis=1)],
+                VAMASBlockFooter.maximum_ordinate_value.name: [format_float(value) for value in values.max(axis=1)],
+            }
+        else:
+            limits = {}
+
+        lines = []
+        ordinates = b''
+        for kind, names, count in self.get_block_layout(Technique.from_label(block.technique)):
+            if kind == FIELD:
+                lines.append(getattr(block, names[0]))
+            elif kind == NUMERIC:
+                if names[0] == VAMASBlockFooter.number_of_ordinate_values.name:
+                    lines.append(str(values.size))
+                else:
+                    lines.append(str(getattr(block, names[0])))
+            elif kind == FLOAT:
+                lines.append(format_float(getattr(block, names[0])))
+            elif kind == REPEATED:
+                if not isinstance(count, int):
+                    count = getattr(block, count)
+                columns = [limits[name] if name in limits else getattr(block, name) for name in names]
+                for i in range(count):
+                    lines.extend(column[i] for column in columns)
+            elif kind == ORDINATES:
+                # formatted straight to bytes, see format_ordinates
+                ordinates = format_ordinates(values, self.newline)
+        return (self.newline.join(lines) + self.newline).encode(VAMAS_ENCODING) + ordinates
+
+    def write(self, filename, blocks=None):
+        '''
+        filename: full path+name of file to write [string]
+        blocks: sequence of VAMASBlocks to write, by default the blocks of the parser
+            (lazily read blocks are loaded one at a time)
+        '''
+        if blocks is None:
+            blocks = self.parser.blocks
+        with open(filename, 'wb') as file:
+            file.write((self.newline.join(self.experiment_lines(len(blocks))) + self.newline).encode(VAMAS_ENCODING))
+            for block in blocks:
+                file.write(self.block_bytes(block))
+            file.write(('end of experiment' + self.newline).encode(VAMAS_ENCODING))
+
+def format_float(value):
+    '''
+    value: number to write
+
+    returns shortest text that reads back as value, without a trailing .0
+    '''
+    value = float(value)
+    if value.is_integer() and abs(value) < 1e16:
+        return str(int(value))
+    return repr(value)
+
+def format_ordinates(values, newline='\r\n'):
+    '''
+    values: float64 array of shape (number_of_corresponding_variables, n_points)
+    newline: line terminator
+
+    Formats the ordinate values in bulk. When all values are integral (counts), the digits
+    are worked out with array arithmetic; otherwise each corresponding variable is formatted
+    in one go, integral ones through int64 and the others with the shortest text that reads
+    back as the same float.
+
+    returns bytes of the values one per line, in the interleaved order of the file
+    '''
+    interleaved = values.T.ravel()
+    if len(interleaved) == 0:
+        return b''
+    if np.array_equal(interleaved, np.trunc(interleaved)) and np.abs(interleaved).max() < 1e16:
+        return format_integers(interleaved.astype(np.int64), newline)
+
+    num_variables = values.shape[0]
+    lines = [None]*values.size
+    for variable_index, variable_values in enumerate(values):
+        if np.array_equal(variable_values, np.trunc(variable_values)) and np.abs(variable_values).max() < 1e16:
+            text = map(str, variable_values.astype(np.int64).tolist())
+        else:
+            text = map(format_float, variable_values.tolist())
+        lines[variable_index::num_variables] = text
+    return (newline.join(lines) + newline).encode(VAMAS_ENCODING)
+
+def format_integers(values, newline='\r\n'):
+    '''
+    values: int64 array
+    newline: line terminator
+
+    Writes the sign, digits and newline of every value into the rows of one byte matrix,
+    one digit column at a time, then drops the leading zeros with a mask.
+
+    returns bytes of the values one per line
+    '''
+    magnitude = np.abs(values)
+    largest = int(magnitude.max())
+    num_digits = len(str(largest))
+    newline = np.frombuffer(newline.encode(), dtype=np.uint8)
+
+    chars = np.empty((len(values), 1 + num_digits + len(newline)), dtype=np.uint8)
+    keep = np.ones(chars.shape, dtype=bool)
+    chars[:, 0] = ord('-')
+    keep[:, 0] = values < 0
+    chars[:, num_digits + 1:] = newline
+
+    # 32 bit division is much faster where the values fit
+    remaining = magnitude.astype(np.uint32 if largest < 2**32 else np.uint64)
+    for column in range(num_digits, 0, -1):
+        remaining, digit = np.divmod(remaining, 10)
+        chars[:, column] = digit
+        power = num_digits - column
+        if power > 0:
+            # leading zeros, the last digit is kept so 0 is written as 0
+            keep[:, column] = magnitude >= 10**power
+    chars[:, 1:num_digits + 1] += ord('0')
+    return chars[keep].tobytes()
@@ -6,9 +6,12 @@ import json
 from enum import Enum, auto
 import tikzplotlib
 
-from VAMASparse import VAMASparser
+from VAMASparse import load_many
+from VAMAScache import VAMAScache
 from VAMASspecs import *
 from vamas_helpers import *
+from vamas_depth import DepthProfile, apply_offsets
+from vamas_render import *
 
 class PlotType(Enum):
     spectra = auto()
@@ -18,6 +21,8 @@ class PlotType(Enum):
 def main():
     config_folder = 'configs/'
     config_file = 'ITOSAcontrol_depth.json'
+    # parsed VAMAS files are kept here so reruns skip parsing
+    cache_folder = '.vamas_cache/'
     # this variable inserts a vertical offset between spectra for readability
     # recommended to adjust until it looks right
     offset = 5000
@@ -45,12 +50,31 @@ def main():
         colors = config['colors']
         plotType = PlotType[config['plot type']]
 
-    parsers = []
-    for filename in filenames:
-        parser = VAMASparser(filepath+filename)
-        experiment, blocks = parser.read_VAMAS()
-
-        parsers.append(parser)
+    # files are parsed in parallel, or read from the parse cache if unchanged;
+    # parsers come back in the order of filenames
+    parsers = load_many([filepath+filename for filename in filenames], cache=VAMAScache(cache_folder))
+    blocks = parsers[-1].blocks
+
+    if config.get('render') == "True":
+        # batch mode: every figure is written headless (Agg) by a pool of worker processes
+        # instead of being shown one window at a time
+        render_folder = config.get('render folder', 'figures/')
+        specs = []
+        if plotType == PlotType.spectra:
+            specs.append(spectra_figure(parsers, labels, colors, offset, name=render_folder+'spectra'))
+        elif plotType == PlotType.high_res:
+            specs.extend(high_res_figures(parsers, labels, colors, folder=render_folder))
+        elif plotType == PlotType.depth:
+            for parser, label in zip(parsers, labels):
+                profile = DepthProfile(parser, region_key=lambda block_identifier: block_identifier[:2])
+                folder = render_folder + label + '/' if len(parsers) > 1 else render_folder
+                specs.extend(depth_figures(profile, colors, offset, config['sputter stop'], id_to_peak, folder))
+        if config['acsummry'] == "True":
+            x, ys, elmt_labels = read_acsummry(filepath+config['acname'])
+            specs.append(acsummary_figure(x, ys, elmt_labels, name=render_folder+'acsummary'))
+        for filename in render_all(specs, config.get('render formats', ['svg', 'png'])):
+            print(filename)
+        return
 
     if plotType == PlotType.spectra:
         x, y = plot_spectra(parsers, labels, colors, offset)
@@ -66,37 +90,30 @@ def main():
             plt.title(block_identifier)
             plt.show()
     elif plotType == PlotType.depth:
-        unique_identifiers = {}
         for parser in parsers:
-            for i in range(len(blocks)):
-                for j, parser in enumerate(parsers):
-                    x,  y, xunits, xlabel, yunits, ylabel = get_binding_vs_y(parser, i)
-                    block_identifier = parser.get_block_data(VAMASBlockHeader.block_identifier, i)
-
-                    if block_identifier[:2] not in unique_identifiers:
-                        print(block_identifier)
-                        unique_identifiers[block_identifier[:2]] = [[], []]
-                    unique_identifiers[block_identifier[:2]][0].append(x)
-                    unique_identifiers[block_identifier[:2]][1].append(y)
+            # regions keyed by the first two characters of the block identifier, e.g. 'In', 'O '
+            profile = DepthProfile(parser, region_key=lambda block_identifier: block_identifier[:2])
 
-            for identifier, coords in unique_identifiers.items():
-                xs = coords[0]
-                ys = coords[1]
-                cmap_colors = [colorFader(colors[0], colors[1], i/len(xs[1:])) for i in range(len(xs))]
+            for identifier in profile.regions:
+                print(identifier)
+                x = profile.binding_energy[identifier]
+                # the first cycle is left out
+                ys = apply_offsets(profile.intensity[identifier][1:], offset)
+                num_cycles = profile.num_cycles(identifier)
+                cmap_colors = [colorFader(colors[0], colors[1], i/(num_cycles - 1)) for i in range(num_cycles)]
 
-                for i, (x, y) in enumerate(zip(xs[1:], ys[1:])):
-                    plt.plot(x, [yi-i*offset for yi in y], color=cmap_colors[i])
+                for i, y in enumerate(ys):
+                    plt.plot(x, y, color=cmap_colors[i])
 
                 cmap = matplotlib.colors.ListedColormap(cmap_colors)
                 norm = mpl.colors.Normalize(0, config['sputter stop'])
                 cb1 = plt.colorbar(mpl.cm.ScalarMappable(norm=norm, cmap=cmap), label='Sputter Time [min]')
                 cb1.ax.invert_yaxis()
-                plot_formatting(x, xunits, yunits, ylabel, legend=False)
+                plot_formatting(x, profile.energy_units, profile.intensity_units, profile.intensity_label, legend=False)
                 plt.title(id_to_peak[identifier.strip()])
                 tikzplotlib.save(identifier+'_tikzplot.tex')
                 plt.savefig(identifier+'.svg')
                 plt.show()
-                #plt.show()
     
     if config['acsummry'] == "True":
         x, ys, elmt_labels = read_acsummry(filepath+config['acname'])
@@ -0,0 +1,43 @@
+import os
+import sys
+
+import numpy as np
+
+# the modules live at the top of the repository rather than in an installed package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from VAMASparse import VAMASparser
+
+DATA = os.path.join(ROOT, 'example_data')
+# depth profile with its acsummry.txt, regions In 3d5, Sn 3d, O 1s and C 1s over 31 cycles
+DEPTH = os.path.join(DATA, '211216', '103.1.itosa5ei_depth.vms')
+SUMMARY = os.path.join(DATA, '211216', 'acsummry.txt')
+# survey spectrum
+SURVEY = os.path.join(DATA, '211124', '102.1.control.vms')
+# high resolution regions, without an experimental variable
+CONTROL = os.path.join(DATA, '211124', '109.1.control.vms')
+
+def read(source, **options):
+    '''
+    source: VAMAS file or binary file-like object
+    options: passed on to VAMASparser.read_VAMAS
+
+    returns parsed VAMASparser
+    '''
+    parser = VAMASparser(source)
+    parser.read_VAMAS(**options)
+    return parser
+
+def assert_same_blocks(parser, expected):
+    '''
+    parser, expected: parsed VAMASparsers
+
+    asserts both hold the same blocks: identifiers, x values and ordinate values
+    '''
+    assert len(parser.blocks) == len(expected.blocks)
+    for block, expected_block in zip(parser.blocks, expected.blocks):
+        assert block.block_identifier == expected_block.block_identifier
+        np.testing.assert_array_equal(parser.block_x_vals(block), expected.block_x_vals(expected_block))
+        np.testing.assert_array_equal(block.ordinate_value, expected_block.ordinate_value)
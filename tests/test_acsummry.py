@@ -0,0 +1,41 @@
+import os
+
+import numpy as np
+import pytest
+
+from . import DATA, DEPTH, SUMMARY, CONTROL, read
+from vamas_acsummry import ACSummary, read_acsummries
+
+def read_summary(filename):
+    summary = ACSummary(filename)
+    summary.read()
+    return summary
+
+def test_read_table_and_rows():
+    summary = read_summary(SUMMARY)
+    assert summary.elements == ('C1s', 'O1s', 'In3d5', 'Sn3d5')
+    assert summary.file_info['File Type'] == 'XPS DEPTHPRO'
+    assert summary.concentrations.shape == (len(summary.abscissa), 4)
+    np.testing.assert_allclose(summary.concentrations[0], [35.38, 42.48, 20.75, 1.38])
+    assert summary.rows['RSF']['O1s'] == pytest.approx(0.733)
+    assert 'Standard Deviation' in summary.rows
+
+def test_block_rows_of_depth_profile():
+    parser = read(DEPTH)
+    rows = read_summary(SUMMARY).block_rows(parser)
+    assert len(rows) == len(parser.blocks)
+    assert rows[0] == 0 and rows[1] == 1
+
+def test_block_rows_without_experimental_variable():
+    parser = read(CONTROL)
+    assert parser.VAMASExperiment.number_of_exp_variables == 0
+    assert list(read_summary(SUMMARY).block_rows(parser)) == [-1]*len(parser.blocks)
+
+def test_file_without_abscissa_header():
+    with pytest.raises(ValueError, match='Abscissa'):
+        read_summary(os.path.join(DATA, '211124', 'ITO001ctrl-vs-fii-ACS_ratios.txt'))
+
+def test_read_many():
+    summaries, table = read_acsummries([SUMMARY, SUMMARY])
+    assert len(table) == 2*len(summaries[0].table)
+    assert set(table['file']) == {0, 1}
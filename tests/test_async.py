@@ -0,0 +1,49 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import numpy as np
+import pytest
+
+from . import DATA, read
+from VAMASparse import VAMASparser, aload_many, aiter_blocks
+
+FILES = [os.path.join(DATA, '211124', name) for name in
+    ('102.1.control.vms', '103.2.dii.vms', '109.1.control.vms')]
+
+def assert_same(parser, expected):
+    assert parser.filename == expected.filename
+    assert len(parser.blocks) == len(expected.blocks)
+    for block, expected_block in zip(parser.blocks, expected.blocks):
+        assert block.block_identifier == expected_block.block_identifier
+        np.testing.assert_array_equal(block.ordinate_value, expected_block.ordinate_value)
+
+@pytest.mark.parametrize('concurrency', [1, 2, 4])
+def test_aload_many_keeps_order(concurrency):
+    parsers = asyncio.run(aload_many(FILES, concurrency=concurrency))
+    for parser, filename in zip(parsers, FILES):
+        assert_same(parser, read(filename))
+
+def test_aread_in_process_pool():
+    async def load():
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            return await VAMASparser.aread(FILES[0], executor)
+    assert_same(asyncio.run(load()), read(FILES[0]))
+
+def test_aiter_blocks():
+    async def collect():
+        return [(parser.filename, block.block_identifier, x, y)
+            async for parser, block, x, y in aiter_blocks(FILES, concurrency=2)]
+    blocks = asyncio.run(collect())
+    expected = [(filename, block.block_identifier) for filename in FILES for block in read(filename).blocks]
+    assert [row[:2] for row in blocks] == expected
+    parser = read(FILES[-1])
+    np.testing.assert_array_equal(blocks[-1][2], parser.block_x_vals(parser.blocks[-1]))
+
+def test_afollow(tmp_path):
+    path = str(tmp_path / 'done.vms')
+    with open(FILES[0], 'rb') as source, open(path, 'wb') as file:
+        file.write(source.read())
+    async def collect():
+        return [block.block_identifier async for block, x, y in VAMASparser(path).afollow(interval=0)]
+    assert asyncio.run(collect()) == [block.block_identifier for block in read(FILES[0]).blocks]
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from . import DEPTH, SUMMARY, read
+from vamas_acsummry import ACSummary
+from vamas_background import (linear_background, shirley_background, tougaard_background,
+    peak_areas, match_rsf, quantify)
+from vamas_depth import DepthProfile
+
+def peak_on_step():
+    x = np.linspace(525, 540, 301)
+    peak = 100*np.exp(-0.5*((x - 532)/0.8)**2)
+    # step up towards high binding energy, as behind a real peak
+    step = 10 + 20/(1 + np.exp(-(x - 532)/0.5))
+    return x, peak + step, peak
+
+@pytest.mark.parametrize('background_function', [linear_background, shirley_background, tougaard_background])
+def test_backgrounds_meet_end_levels(background_function):
+    x, y, peak = peak_on_step()
+    background = background_function(x, y)
+    assert background.shape == y.shape
+    assert background[0] == pytest.approx(y[0])
+    assert background[-1] == pytest.approx(y[-1])
+
+@pytest.mark.parametrize('background_function', [linear_background, shirley_background, tougaard_background])
+def test_descending_axis_and_stacked_spectra(background_function):
+    x, y, peak = peak_on_step()
+    stacked = np.array([y, 2*y])
+    background = background_function(x[::-1], stacked[:, ::-1])
+    assert background.shape == stacked.shape
+    np.testing.assert_allclose(background[:, ::-1], background_function(x, stacked))
+    np.testing.assert_allclose(background[1], 2*background[0])
+
+def test_shirley_recovers_peak_area():
+    x, y, peak = peak_on_step()
+    area = peak_areas(x, y, shirley_background(x, y))
+    assert area.shape == (1,)
+    assert area[0] == pytest.approx(peak_areas(x, peak)[0], rel=0.05)
+
+def test_match_rsf():
+    rsf = {'C1s': 0.278, 'O1s': 0.733, 'In3d5': 4.359}
+    assert match_rsf(['In 3d5', 'O 1s'], rsf) == {'In 3d5': 4.359, 'O 1s': 0.733}
+    with pytest.raises(KeyError):
+        match_rsf(['Sn 3d5'], rsf)
+
+def test_quantify_depth_profile():
+    parser = read(DEPTH)
+    profile = DepthProfile(parser)
+    summary = ACSummary(SUMMARY)
+    summary.read()
+    areas, concentrations = quantify(profile, summary.rows['RSF'], method='linear')
+    assert set(areas) == set(profile.regions)
+    num_cycles = min(profile.num_cycles(region) for region in profile.regions)
+    assert concentrations.shape == (num_cycles,)
+    total = sum(concentrations[region] for region in profile.regions)
+    np.testing.assert_allclose(total, 100)
+    np.testing.assert_array_equal(concentrations['sputter_time'],
+        profile.sputter_time[profile.regions[0]][:num_cycles])
+
+def test_quantify_matches_acsummry():
+    parser = read(DEPTH)
+    profile = DepthProfile(parser)
+    # regions are acquired with different dwell times
+    assert len({profile.acquisition_time[region][0] for region in profile.regions}) == len(profile.regions)
+    summary = ACSummary(SUMMARY)
+    summary.read()
+
+    # the 3d5/2 peaks only, as the RSFs are for 3d5/2; C 1s is left out, it is at the noise level
+    windows = {'In 3d5': (437, 447.5), 'Sn 3d': (480, 489.5)}
+    regions = ['In 3d5', 'Sn 3d', 'O 1s']
+    areas, concentrations = quantify(profile, summary.rows['CorrectedRSF'], windows=windows, regions=regions)
+
+    num_rows = min(len(concentrations), len(summary.abscissa))
+    expected = summary.concentrations[:num_rows, [summary.elements.index(element) for element in ('In3d5', 'Sn3d5', 'O1s')]]
+    expected = 100*expected/expected.sum(axis=1, keepdims=True)
+    for region, region_expected in zip(regions, expected.T):
+        difference = np.abs(concentrations[region][:num_rows] - region_expected)
+        assert difference.max() < 5
+        assert difference.mean() < 2
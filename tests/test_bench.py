@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from . import read
+from VAMASbench import write_synthetic, QUICK_CASES, bench_file, compare
+from VAMASparse import VAMASparser
+
+@pytest.mark.parametrize('experiment_mode, num_blocks, num_points, num_variables', QUICK_CASES)
+def test_synthetic_files_parse_in_every_mode(tmp_path, experiment_mode, num_blocks, num_points, num_variables):
+    filename = str(tmp_path / 'synthetic.vms')
+    write_synthetic(filename, experiment_mode, num_blocks, num_points, num_variables)
+    parser = read(filename)
+    assert parser.VAMASExperiment.experiment_mode == experiment_mode
+    assert len(parser.blocks) == num_blocks
+    for block in parser.blocks:
+        assert block.ordinate_value.shape == (num_variables, num_points)
+    with VAMASparser(filename) as lazy:
+        lazy.read_VAMAS(lazy=True)
+        np.testing.assert_array_equal(lazy.blocks[-1].ordinate_value, parser.blocks[-1].ordinate_value)
+
+def test_bench_file_and_compare(tmp_path, capsys):
+    filename = str(tmp_path / 'synthetic.vms')
+    write_synthetic(filename, num_blocks=3, num_points=50)
+    result = bench_file(filename, repeat=1)
+    assert result['blocks'] == 3
+    assert result['read'] > 0 and result['peak_memory'] > 0
+    slower = dict(result, read=10*result['read'])
+    assert compare({'case': slower}, {'case': result}) == ['case']
+    assert compare({'case': result}, {'case': slower}) == []
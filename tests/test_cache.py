@@ -0,0 +1,60 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from . import DEPTH, SURVEY
+from VAMAScache import VAMAScache
+
+def copy(tmp_path, filename):
+    path = tmp_path / os.path.basename(filename)
+    shutil.copy(filename, path)
+    return str(path)
+
+def test_cached_load_matches_parse(tmp_path):
+    filename = copy(tmp_path, SURVEY)
+    cache = VAMAScache(str(tmp_path / 'cache'))
+    parsed = cache.load(filename)
+    assert cache.get(filename) is not None
+    cached = cache.load(filename)
+    assert len(cached.blocks) == len(parsed.blocks)
+    for block, expected in zip(cached.blocks, parsed.blocks):
+        assert block.block_identifier == expected.block_identifier
+        np.testing.assert_array_equal(block.ordinate_value, expected.ordinate_value)
+
+def test_changed_file_invalidates_entry(tmp_path):
+    filename = copy(tmp_path, SURVEY)
+    cache = VAMAScache(str(tmp_path / 'cache'))
+    cache.load(filename)
+    with open(filename, 'ab') as file:
+        file.write(b'\n')
+    assert cache.get(filename) is None
+
+def test_entry_larger_than_max_size_is_not_stored(tmp_path):
+    small = copy(tmp_path, SURVEY)
+    large = copy(tmp_path, DEPTH)
+    cache = VAMAScache(str(tmp_path / 'cache'), max_size=300000)
+    cache.load(small)
+    cache.load(large)
+    # the large entry does not fit, and does not push out the small one
+    assert cache.get(large) is None
+    assert cache.get(small) is not None
+
+def test_eviction_keeps_newest_entry(tmp_path):
+    first = copy(tmp_path, SURVEY)
+    second = str(tmp_path / 'second.vms')
+    shutil.copy(SURVEY, second)
+    cache = VAMAScache(str(tmp_path / 'cache'))
+    cache.load(first)
+    entry_size = os.path.getsize(cache.entry_path(first))
+    cache.max_size = int(entry_size*1.5)
+    cache.load(second)
+    assert cache.get(first) is None
+    assert cache.get(second) is not None
+
+def test_file_objects_are_rejected(tmp_path):
+    cache = VAMAScache(str(tmp_path / 'cache'))
+    with open(SURVEY, 'rb') as file:
+        with pytest.raises(TypeError, match='path'):
+            cache.load(file)
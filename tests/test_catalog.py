@@ -0,0 +1,47 @@
+import os
+import shutil
+
+import numpy as np
+
+from . import DEPTH, SURVEY, read
+from VAMAScatalog import VAMAScatalog
+
+def folder_of(tmp_path, *filenames):
+    folder = tmp_path / 'data'
+    folder.mkdir()
+    for filename in filenames:
+        shutil.copy(filename, folder / os.path.basename(filename))
+    return str(folder)
+
+def test_query_and_load(tmp_path):
+    folder = folder_of(tmp_path, SURVEY, DEPTH)
+    catalog = VAMAScatalog(':memory:')
+    assert catalog.update(folder, workers=1) == (2, 0)
+    blocks = catalog.query(block_identifier='O 1s%')
+    assert blocks and all(block.block_identifier.startswith('O 1s') for block in blocks)
+
+    parser = read(DEPTH)
+    expected = {block.block_identifier: block for block in parser.blocks}
+    for handle in blocks:
+        block = handle.load()
+        np.testing.assert_array_equal(block.ordinate_value, expected[block.block_identifier].ordinate_value)
+
+def test_unchanged_files_are_not_rescanned(tmp_path):
+    folder = folder_of(tmp_path, SURVEY)
+    catalog = VAMAScatalog(':memory:')
+    catalog.update(folder, workers=1)
+    assert catalog.update(folder, workers=1) == (0, 0)
+    os.remove(os.path.join(folder, os.path.basename(SURVEY)))
+    assert catalog.update(folder, workers=1) == (0, 1)
+
+def test_truncated_file_is_skipped(tmp_path):
+    folder = folder_of(tmp_path, SURVEY)
+    with open(DEPTH, 'rb') as file:
+        data = file.read()
+    with open(os.path.join(folder, 'truncated.vms'), 'wb') as file:
+        file.write(data[:data.rindex(b'\n', 0, len(data)//2) + 1])
+
+    catalog = VAMAScatalog(':memory:')
+    catalog.update(folder, workers=1)
+    paths = {block.path for block in catalog.query()}
+    assert paths == {os.path.abspath(os.path.join(folder, os.path.basename(SURVEY)))}
@@ -0,0 +1,95 @@
+import asyncio
+import bz2
+import gzip
+import io
+import lzma
+
+import pytest
+
+from . import DEPTH, read, assert_same_blocks
+from VAMASparse import VAMASparser, EndOfFileError, aload_many, open_vamas, seek_forward, source_name
+
+with open(DEPTH, 'rb') as file:
+    CONTENTS = file.read()
+
+def zstd_compress(data):
+    zstandard = pytest.importorskip('zstandard')
+    return zstandard.ZstdCompressor().compress(data)
+
+COMPRESSORS = {'vms': lambda data: data, 'vms.gz': gzip.compress, 'vms.xz': lzma.compress,
+    'vms.bz2': bz2.compress, 'vms.zst': zstd_compress}
+
+class RawStream(io.RawIOBase):
+    '''
+    unbuffered, unseekable stream without peek, like a socket
+    '''
+    def __init__(self, data):
+        self.buffer = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self.buffer.readinto(buffer)
+
+@pytest.fixture(scope='module')
+def expected():
+    parser = read(DEPTH)
+    return parser
+
+@pytest.fixture(params=sorted(COMPRESSORS))
+def compressed(request, tmp_path):
+    path = tmp_path / ('depth.' + request.param)
+    path.write_bytes(COMPRESSORS[request.param](CONTENTS))
+    return str(path)
+
+def test_open_vamas_decompresses(compressed):
+    with open_vamas(compressed) as file:
+        assert file.read() == CONTENTS
+
+@pytest.mark.parametrize('options', [{}, {'memory_map': True}, {'lazy': True}])
+def test_read_compressed_file(compressed, expected, options):
+    parser = VAMASparser(compressed)
+    parser.read_VAMAS(**options)
+    assert_same_blocks(parser, expected)
+
+def test_read_file_objects(compressed, expected):
+    with open(compressed, 'rb') as file:
+        parser = read(file)
+        assert not file.closed
+    assert_same_blocks(parser, expected)
+    assert parser.source_name == compressed
+
+    with open(compressed, 'rb') as file:
+        stream = RawStream(file.read())
+    parser = read(stream)
+    assert not stream.closed
+    assert_same_blocks(parser, expected)
+
+def test_lazy_file_object(compressed, expected):
+    with open(compressed, 'rb') as file:
+        parser = VAMASparser(io.BytesIO(file.read()))
+    with parser:
+        parser.read_VAMAS(lazy=True)
+        assert_same_blocks(parser, expected)
+
+def test_iter_blocks(compressed, expected):
+    blocks = [block for block, x, y in VAMASparser(compressed).iter_blocks()]
+    assert [block.block_identifier for block in blocks] == [block.block_identifier for block in expected.blocks]
+
+def test_aread_compressed(compressed, expected):
+    parser, = asyncio.run(aload_many([compressed]))
+    assert_same_blocks(parser, expected)
+
+def test_seek_forward_without_seeking():
+    file = io.BufferedReader(RawStream(CONTENTS))
+    assert not file.seekable()
+    seek_forward(file, 1000)
+    assert file.read(100) == CONTENTS[1000:1100]
+    with pytest.raises(EndOfFileError):
+        seek_forward(file, len(CONTENTS))
+
+def test_source_name():
+    assert source_name('a/b.vms') == 'a/b.vms'
+    buffer = io.BytesIO(b'')
+    assert source_name(buffer) == repr(buffer)
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from . import DEPTH, CONTROL, read
+from vamas_depth import DepthProfile, apply_offsets
+
+@pytest.fixture(scope='module')
+def parser():
+    return read(DEPTH)
+
+def test_regions_stack_blocks(parser):
+    profile = DepthProfile(parser)
+    assert sum(profile.num_cycles(region) for region in profile.regions) == len(parser.blocks)
+    for region in profile.regions:
+        rows = profile.block_indices[region]
+        for row, block_index in enumerate(rows):
+            np.testing.assert_array_equal(profile.intensity[region][row], parser.blocks[block_index].ordinate_value[0])
+        assert profile.intensity[region].shape[1] == len(profile.binding_energy[region])
+        assert np.all(np.diff(profile.sputter_time[region]) > 0)
+        block = parser.blocks[rows[0]]
+        assert profile.acquisition_time[region][0] == float(block.signal_collection_time)*float(block.number_of_scans)
+    assert profile.time_units == parser.VAMASExperiment.exp_variable_unit[0]
+
+def test_integrate_and_normalize(parser):
+    profile = DepthProfile(parser)
+    region = profile.regions[0]
+    areas = profile.integrate(region)
+    assert areas.shape == (profile.num_cycles(region),)
+    assert np.all(areas > 0)
+    np.testing.assert_allclose(profile.normalized(region).max(axis=1), 1)
+
+def test_apply_offsets():
+    intensity = np.ones((3, 4))
+    np.testing.assert_array_equal(apply_offsets(intensity, 2)[:, 0], [1, -1, -3])
+
+def test_file_without_experimental_variable():
+    parser = read(CONTROL)
+    profile = DepthProfile(parser)
+    assert profile.time_units is None
+    assert len(profile.regions) == len(parser.blocks)
+    assert all(np.isnan(profile.sputter_time[region]).all() for region in profile.regions)
@@ -0,0 +1,31 @@
+import io
+
+import pytest
+
+from . import DEPTH, read, assert_same_blocks
+import VAMASexport
+
+@pytest.fixture(params=['path', 'buffer'])
+def parser(request):
+    if request.param == 'path':
+        return read(DEPTH)
+    with open(DEPTH, 'rb') as file:
+        return read(io.BytesIO(file.read()))
+
+@pytest.mark.skipif(VAMASexport.h5py is None, reason='needs h5py')
+@pytest.mark.parametrize('compression', ['gzip', None])
+def test_hdf5_round_trip(tmp_path, parser, compression):
+    filename = str(tmp_path / 'export.h5')
+    VAMASexport.export_hdf5(parser, filename, compression=compression)
+    with VAMASexport.load_hdf5(filename) as loaded:
+        assert loaded.filename == parser.source_name
+        assert_same_blocks(loaded, parser)
+    assert not loaded.blocks.file
+
+@pytest.mark.skipif(VAMASexport.pa is None, reason='needs pyarrow')
+def test_parquet_round_trip(tmp_path, parser):
+    folder = str(tmp_path / 'export')
+    VAMASexport.export_parquet(parser, folder)
+    loaded = VAMASexport.load_parquet(folder)
+    assert loaded.filename == parser.source_name
+    assert_same_blocks(loaded, parser)
@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+import pytest
+
+from . import DEPTH, read
+from VAMASparse import VAMASparser, EndOfFileError
+
+def write(path, data, mode='wb'):
+    with open(path, mode) as file:
+        file.write(data)
+
+def test_poll_reads_appended_blocks(tmp_path):
+    with open(DEPTH, 'rb') as file:
+        data = file.read()
+    expected = read(DEPTH)
+    path = str(tmp_path / 'growing.vms')
+
+    # the header and part of the first block, cut mid line
+    first_block = data.index(expected.blocks[0].block_identifier.encode())
+    write(path, data[:first_block + 100])
+    parser = VAMASparser(path)
+    assert parser.poll() == []
+    assert parser.follow_offset > 0
+
+    # the rest, appended in a few pieces
+    read_blocks = []
+    for end in np.linspace(first_block + 100, len(data), 5).astype(int)[1:]:
+        write(path, data[os.path.getsize(path):end], 'ab')
+        read_blocks.extend(parser.poll())
+    assert len(read_blocks) == len(expected.blocks)
+    assert parser.poll() == []
+    for block, expected_block in zip(read_blocks, expected.blocks):
+        assert block.block_identifier == expected_block.block_identifier
+        np.testing.assert_array_equal(block.ordinate_value, expected_block.ordinate_value)
+
+def test_poll_before_header_is_complete(tmp_path):
+    path = str(tmp_path / 'growing.vms')
+    with open(DEPTH, 'rb') as file:
+        write(path, file.read(200))
+    parser = VAMASparser(path)
+    assert parser.poll() == []
+    assert parser.follow_offset == 0
+
+def test_follow_stops_at_last_block(tmp_path):
+    path = str(tmp_path / 'done.vms')
+    with open(DEPTH, 'rb') as file:
+        write(path, file.read())
+    followed = list(VAMASparser(path).follow(interval=0))
+    expected = read(DEPTH)
+    assert len(followed) == len(expected.blocks)
+    block, x, y = followed[-1]
+    np.testing.assert_array_equal(x, expected.block_x_vals(expected.blocks[-1]))
+    np.testing.assert_array_equal(y, expected.blocks[-1].ordinate_value)
+
+def test_follow_times_out_on_incomplete_file(tmp_path):
+    path = str(tmp_path / 'stalled.vms')
+    with open(DEPTH, 'rb') as file:
+        data = file.read()
+    write(path, data[:len(data)//2])
+    followed = list(VAMASparser(path).follow(interval=0.01, timeout=0.05))
+    assert 0 < len(followed) < len(read(DEPTH).blocks)
+
+def test_poll_raises_on_malformed_block(tmp_path):
+    with open(DEPTH, 'rb') as file:
+        data = file.read()
+    expected = read(DEPTH)
+    # the last ordinate value of the first block, a complete block follows it
+    second_block = data.index(b'\n' + expected.blocks[1].block_identifier.encode() + b'\r\n') + 1
+    last_value = data.rindex(b'\n', 0, second_block - 1) + 1
+    path = str(tmp_path / 'malformed.vms')
+    write(path, data[:last_value] + b'garbage\r\n' + data[second_block:])
+
+    parser = VAMASparser(path)
+    with pytest.raises(ValueError) as error:
+        parser.poll()
+    assert not isinstance(error.value, EndOfFileError)
+    with pytest.raises(ValueError):
+        list(VAMASparser(path).follow(interval=0, timeout=1))
+
+def test_truncated_block_raises_end_of_file_error(tmp_path):
+    with open(DEPTH, 'rb') as file:
+        data = file.read()
+    path = str(tmp_path / 'truncated.vms')
+    write(path, data[:data.rindex(b'\n', 0, len(data)//2) + 1])
+    with pytest.raises(EndOfFileError):
+        VAMASparser(path).read_VAMAS()
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from . import DEPTH, read
+from VAMASspecs import *
+from VAMASwrite import VAMASwriter
+from vamas_depth import DepthProfile
+from vamas_helpers import get_binding_vs_y
+from vamas_peaks import parser_peaks
+
+@pytest.fixture(scope='module')
+def regular():
+    return read(DEPTH)
+
+@pytest.fixture(scope='module')
+def irregular(regular, tmp_path_factory):
+    '''
+    the depth profile written in IRREGULAR scan mode, with the kinetic energy stored as
+    corresponding variable 0
+    '''
+    converted = read(DEPTH)
+    experiment = converted.VAMASExperiment
+    experiment.scan_mode = 'IRREGULAR'
+    experiment.scan_mode_type = ScanMode.IRREGULAR
+    for block in converted.blocks:
+        x = regular.block_x_vals(block)
+        block.ordinate_value = np.vstack([x, block.ordinate_value])
+        block.number_of_corresponding_variables = len(block.ordinate_value)
+        block.corresponding_variable_label = [block.abscissa_label] + block.corresponding_variable_label
+        block.corresponding_variable_units = [block.abscissa_units] + block.corresponding_variable_units
+    filename = str(tmp_path_factory.mktemp('irregular') / 'irregular.vms')
+    VAMASwriter(converted).write(filename)
+    return read(filename)
+
+def test_abscissa_is_variable_zero(regular, irregular):
+    assert irregular.first_ordinate_index() == 1
+    assert regular.first_ordinate_index() == 0
+    for block, expected in zip(irregular.blocks, regular.blocks):
+        np.testing.assert_array_equal(irregular.block_x_vals(block), regular.block_x_vals(expected))
+        np.testing.assert_array_equal(block.ordinate_value[1:], expected.ordinate_value)
+
+def test_binding_vs_y(regular, irregular):
+    x, y = get_binding_vs_y(irregular)[:2]
+    expected_x, expected_y = get_binding_vs_y(regular)[:2]
+    np.testing.assert_allclose(x, expected_x)
+    np.testing.assert_array_equal(y, expected_y)
+
+def test_depth_profile_stacks_counts(regular, irregular):
+    profile = DepthProfile(irregular)
+    expected = DepthProfile(regular)
+    assert profile.regions == expected.regions
+    for region in profile.regions:
+        np.testing.assert_array_equal(profile.intensity[region], expected.intensity[region])
+    assert profile.intensity_label == expected.intensity_label
+
+def test_peaks_search_counts(regular, irregular):
+    peaks = parser_peaks(irregular)
+    expected = parser_peaks(regular)
+    assert len(peaks) == len(expected) > 0
+    np.testing.assert_allclose(peaks['energy'], expected['energy'])
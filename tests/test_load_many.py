@@ -0,0 +1,37 @@
+import os
+
+import numpy as np
+import pytest
+
+from . import DATA, read
+from VAMAScache import VAMAScache
+from VAMASparse import load_many
+
+FILES = [os.path.join(DATA, '211124', name) for name in
+    ('102.1.control.vms', '103.2.dii.vms', '109.1.control.vms')] + [
+    os.path.join(DATA, '211216', '103.1.itosa5ei_depth.vms')]
+
+def assert_same(parser, expected):
+    assert parser.filename == expected.filename
+    assert parser.VAMASExperiment.experiment_mode == expected.VAMASExperiment.experiment_mode
+    assert len(parser.blocks) == len(expected.blocks)
+    for block, expected_block in zip(parser.blocks, expected.blocks):
+        assert block.block_identifier == expected_block.block_identifier
+        assert block.corresponding_variable_label == expected_block.corresponding_variable_label
+        np.testing.assert_array_equal(block.ordinate_value, expected_block.ordinate_value)
+        np.testing.assert_array_equal(parser.block_x_vals(block), expected.block_x_vals(expected_block))
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_load_many_matches_read_VAMAS(workers):
+    parsers = load_many(FILES, workers=workers)
+    assert len(parsers) == len(FILES)
+    for parser, filename in zip(parsers, FILES):
+        assert_same(parser, read(filename))
+
+def test_load_many_fills_and_uses_cache(tmp_path):
+    cache = VAMAScache(str(tmp_path / 'cache'))
+    first = load_many(FILES, workers=2, cache=cache)
+    assert all(cache.get(filename) is not None for filename in FILES)
+    second = load_many(FILES, workers=2, cache=cache)
+    for parser, expected in zip(second, first):
+        assert_same(parser, expected)
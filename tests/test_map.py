@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from . import read
+from VAMASbench import write_synthetic
+from VAMASmap import VAMASmap
+from VAMASparse import VAMASparser
+
+NUM_BLOCKS = 12
+NUM_POINTS = 50
+
+@pytest.fixture
+def map_file(tmp_path):
+    filename = str(tmp_path / 'map.vms')
+    write_synthetic(filename, 'MAP', num_blocks=NUM_BLOCKS, num_points=NUM_POINTS)
+    return filename
+
+def test_scan_data_offsets(map_file):
+    parser = VAMASparser(map_file)
+    with open(map_file, 'rb') as file:
+        data = file.read()
+        file.seek(0)
+        lines = iter(file.readline, b'')
+        parser.read_experiment(lines)
+        scanned = list(parser.scan_data(lines, file.tell))
+    expected = read(map_file)
+    assert len(scanned) == NUM_BLOCKS
+    for (offset, data_start, data_end, block), parsed in zip(scanned, expected.blocks):
+        assert offset < data_start < data_end
+        assert block.block_identifier == parsed.block_identifier
+        values = np.array(data[data_start:data_end].split(), dtype=np.float64)
+        np.testing.assert_array_equal(values, parsed.ordinate_value[0])
+
+def test_pixels_match_blocks(map_file):
+    expected = read(map_file)
+    with VAMASmap(map_file) as vamas_map:
+        assert vamas_map.regions == ['C 1s']
+        cube = vamas_map.cube('C 1s')
+        assert cube.shape[2] == NUM_POINTS
+        for block in expected.blocks:
+            x, y = int(block.x_coord) - 1, int(block.y_coord) - 1
+            np.testing.assert_array_equal(vamas_map.spectrum('C 1s', x, y), block.ordinate_value[0])
+
+def test_window_image_matches_full_cube(map_file):
+    with VAMASmap(map_file) as vamas_map:
+        cube = vamas_map.cube('C 1s')
+        energy = cube.binding_energy
+        lower, upper = np.sort(energy)[[10, 20]]
+        image = vamas_map.window_image('C 1s', lower, upper)
+        inside = (energy >= lower) & (energy <= upper)
+        np.testing.assert_array_equal(image, np.asarray(cube)[:, :, inside].sum(axis=2))
+
+def test_close_releases_cubes(map_file, tmp_path):
+    expected = read(map_file).blocks[0].ordinate_value[0]
+    with VAMASmap(map_file) as vamas_map:
+        with vamas_map.cube('C 1s') as cube:
+            temporary_file = cube.temporary_file
+            np.testing.assert_array_equal(cube[0, 0], expected)
+        assert temporary_file.closed
+        assert cube.data is None
+        # a closed cube is replaced by a new one
+        np.testing.assert_array_equal(vamas_map.spectrum('C 1s', 0, 0), expected)
+    assert vamas_map.cubes == {}
+
+    store = str(tmp_path / 'store')
+    with VAMASmap(map_file, store=store) as vamas_map:
+        vamas_map.spectrum('C 1s', 0, 0)
+    with VAMASmap(map_file, store=store) as vamas_map:
+        cube = vamas_map.cube('C 1s')
+        assert cube.temporary_file is None
+        assert cube.loaded[0, 0]
+        np.testing.assert_array_equal(cube.data[0, 0], expected)
@@ -0,0 +1,115 @@
+import mmap
+import os
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from . import DEPTH, SURVEY, read
+import VAMASparse
+from VAMASbench import write_synthetic
+from VAMASparse import VAMASparser, MappedLines
+
+def truncated(tmp_path, filename, fraction):
+    with open(filename, 'rb') as file:
+        data = file.read()
+    path = tmp_path / 'truncated.vms'
+    # cut at a line end so the last line is not just shortened
+    path.write_bytes(data[:data.rindex(b'\n', 0, int(len(data)*fraction)) + 1])
+    return str(path)
+
+@pytest.fixture(scope='module')
+def depth():
+    parser = read(DEPTH)
+    return parser
+
+def test_read_depth_profile(depth):
+    assert depth.VAMASExperiment.number_of_blocks == len(depth.blocks) == 124
+    block = depth.blocks[0]
+    assert block.block_identifier == 'In 3d5 1'
+    num_variables = block.number_of_corresponding_variables
+    assert block.ordinate_value.shape == (num_variables, block.number_of_ordinate_values//num_variables)
+    assert len(depth.block_x_vals(block)) == block.ordinate_value.shape[1]
+
+@pytest.mark.parametrize('options', [{'memory_map': True}, {'lazy': True}, {'lazy': True, 'memory_map': True}])
+def test_read_modes_match_eager(depth, options):
+    with VAMASparser(DEPTH) as parser:
+        parser.read_VAMAS(**options)
+        assert len(parser.blocks) == len(depth.blocks)
+        for block, expected in zip(parser.blocks, depth.blocks):
+            assert block.block_identifier == expected.block_identifier
+            np.testing.assert_array_equal(block.ordinate_value, expected.ordinate_value)
+
+@pytest.mark.parametrize('memory_map', [False, True])
+def test_lazy_blocks_slice_and_close(depth, memory_map):
+    with VAMASparser(DEPTH) as parser:
+        parser.read_VAMAS(lazy=True, memory_map=memory_map)
+        for key in (slice(1, 3), slice(-3, None), slice(None, None, 40), slice(5, 2)):
+            blocks = parser.blocks[key]
+            expected = depth.blocks[key]
+            assert [block.block_identifier for block in blocks] == [block.block_identifier for block in expected]
+            for block, expected_block in zip(blocks, expected):
+                np.testing.assert_array_equal(block.ordinate_value, expected_block.ordinate_value)
+        mapped_lines = parser.mapped_lines
+    assert parser.mapped_lines is None
+    if memory_map:
+        assert mapped_lines.mapping.closed
+    # blocks not cached are read again from the file
+    assert len(parser.blocks.cache) == 0
+    np.testing.assert_array_equal(parser.blocks[7].ordinate_value, depth.blocks[7].ordinate_value)
+
+def test_iter_blocks_matches_eager(depth):
+    blocks = list(VAMASparser(DEPTH).iter_blocks())
+    assert len(blocks) == len(depth.blocks)
+    block, x, y = blocks[-1]
+    np.testing.assert_array_equal(x, depth.block_x_vals(depth.blocks[-1]))
+    np.testing.assert_array_equal(y, depth.blocks[-1].ordinate_value)
+
+@pytest.mark.parametrize('fraction', [0.5, 0.999])
+@pytest.mark.parametrize('options', [{}, {'memory_map': True}, {'lazy': True}, {'lazy': True, 'memory_map': True}])
+def test_truncated_file_raises_value_error(tmp_path, fraction, options):
+    parser = VAMASparser(truncated(tmp_path, SURVEY, fraction))
+    with pytest.raises(ValueError):
+        parser.read_VAMAS(**options)
+
+@pytest.mark.parametrize('memory_map', [False, True])
+def test_truncated_file_iter_blocks_raises_value_error(tmp_path, memory_map):
+    parser = VAMASparser(truncated(tmp_path, DEPTH, 0.5))
+    with pytest.raises(ValueError):
+        for block in parser.iter_blocks(memory_map=memory_map):
+            pass
+
+@pytest.mark.parametrize('chunk_size', [3, 7, 1 << 20])
+@pytest.mark.parametrize('data', [b'1\n22\n333\n4444\n', b'1\n22\n333\n4444', b'\n\n1\n\n'])
+def test_mapped_lines_match_readline(tmp_path, monkeypatch, chunk_size, data):
+    monkeypatch.setattr(VAMASparse, 'LINE_CHUNK_SIZE', chunk_size)
+    path = tmp_path / 'lines.txt'
+    path.write_bytes(data)
+    expected = data.splitlines(keepends=True)
+    with open(path, 'rb') as file:
+        lines = MappedLines(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+    for start in range(len(expected) + 1):
+        for n in range(len(expected) + 2):
+            lines.seek(len(b''.join(expected[:start])))
+            assert lines.read_lines(n) == b''.join(expected[start:start + n])
+            assert lines.tell() == len(b''.join(expected[:start + n]))
+            lines.seek(len(b''.join(expected[:start])))
+            assert lines.skip_lines(n) == len(expected[start:start + n])
+    lines.seek(0)
+    lines.count = 0
+    assert list(lines) == expected
+    assert lines.count == len(expected)
+    lines.close()
+
+def test_lazy_memory_map_does_not_index_lines(tmp_path):
+    filename = str(tmp_path / 'large.vms')
+    write_synthetic(filename, num_blocks=20, num_points=200000)
+    tracemalloc.start()
+    with VAMASparser(filename) as parser:
+        parser.read_VAMAS(lazy=True, memory_map=True)
+        peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert len(parser.blocks) == 20
+    # the file is about 20 MB; an index of its lines alone took more than that, while
+    # the chunks searched for line ends are bounded by LINE_CHUNK_SIZE
+    assert peak < os.path.getsize(filename)/4
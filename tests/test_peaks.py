@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from . import DEPTH, read
+from vamas_peaks import ReferenceTable, noise_level, find_peaks_batch, identify, parser_peaks
+
+def two_peaks(noise=0.0, seed=0):
+    x = np.linspace(280, 295, 751)
+    y = 1000*np.exp(-0.5*((x - 284.8)/0.4)**2) + 400*np.exp(-0.5*((x - 288.5)/0.4)**2) + 50
+    return x, y + np.random.default_rng(seed).normal(0, noise, len(x)) if noise else y
+
+def test_reference_table_match():
+    references = ReferenceTable({'b': 2.0, 'a': 1.0})
+    references.update({'c': 10.0})
+    assert len(references) == 3
+    assert list(references.labels) == ['a', 'b', 'c']
+    np.testing.assert_array_equal(references.match([1.2, 1.8, 6.0, 10.5]), [0, 1, -1, 2])
+    np.testing.assert_array_equal(ReferenceTable({}).match([1.0]), [-1])
+
+def test_noise_level():
+    x, y = two_peaks()
+    noisy = two_peaks(noise=5.0)[1]
+    levels = noise_level(np.array([y, noisy]))
+    assert levels[0] == pytest.approx(0, abs=0.5)
+    assert levels[1] == pytest.approx(5.0, rel=0.2)
+
+def test_find_and_identify_peaks():
+    x, y = two_peaks(noise=2.0)
+    table = find_peaks_batch(x, np.array([y, y]))
+    assert list(table['spectrum']) == [0, 0, 1, 1]
+    assert list(table['label'][:2]) == ['C-C', 'O-C=O']
+    np.testing.assert_allclose(table['shift'], 0, atol=0.05)
+
+    identify(table, ReferenceTable({'other': 500.0}))
+    assert list(table['label']) == ['']*4
+    assert np.isnan(table['reference_energy']).all()
+
+def test_parser_peaks():
+    parser = read(DEPTH)
+    table = parser_peaks(parser, prominence=np.inf)
+    assert len(table) == 0
+    table = parser_peaks(parser)
+    assert len(table) > 0
+    assert np.all(np.diff(table['spectrum']) >= 0)
+    for row in table[:10]:
+        x = parser.get_binding_energy_axis(row['spectrum'])[0]
+        assert row['energy'] in x
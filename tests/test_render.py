@@ -0,0 +1,53 @@
+import os
+
+import matplotlib
+matplotlib.use('Agg')
+import pytest
+
+from . import DATA, DEPTH, SUMMARY, read
+from vamas_acsummry import ACSummary
+from vamas_depth import DepthProfile
+from vamas_render import (render_all, draw, spectra_figure, high_res_figures, depth_figures,
+    acsummary_figure)
+
+HIGH_RES = [os.path.join(DATA, '211124', name) for name in ('103.2.dii.vms', '104.3.fi.vms')]
+
+@pytest.fixture(scope='module')
+def parsers():
+    return [read(filename) for filename in HIGH_RES]
+
+def test_spectra_figure(parsers):
+    spec = spectra_figure(parsers, ['dii', 'fi'], ['red', 'blue'], offset=10)
+    assert len(spec.lines) == 2
+    assert spec.xlabel.startswith('Binding Energy')
+    figure = draw(spec)
+    axes = figure.axes[0]
+    left, right = axes.get_xlim()
+    assert left > right
+    assert [text.get_text() for text in axes.get_legend().get_texts()] == ['dii', 'fi']
+
+def test_high_res_and_depth_figures(tmp_path, parsers):
+    specs = high_res_figures(parsers, ['dii', 'fi'], ['red', 'blue'], folder=str(tmp_path / 'high_res'))
+    assert [os.path.basename(spec.name) for spec in specs] == [block.block_identifier for block in parsers[-1].blocks]
+
+    profile = DepthProfile(read(DEPTH))
+    depth_specs = depth_figures(profile, ('blue', 'red'), offset=100, sputter_stop=10,
+        folder=str(tmp_path / 'depth'))
+    assert len(depth_specs) == len(profile.regions)
+    for spec, region in zip(depth_specs, profile.regions):
+        # first cycle left out
+        assert len(spec.lines) == profile.num_cycles(region) - 1
+        assert spec.colorbar['vmax'] == 10
+    assert len(draw(depth_specs[0]).axes) == 2
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_render_all_writes_files(tmp_path, parsers, workers):
+    summary = ACSummary(SUMMARY)
+    summary.read()
+    specs = [spectra_figure(parsers, ['dii', 'fi'], ['red', 'blue'], name=str(tmp_path / 'figures' / 'spectra')),
+        acsummary_figure(summary.abscissa, summary.concentrations.T, summary.elements,
+            name=str(tmp_path / 'figures' / 'acsummary'))]
+    written = render_all(specs, formats=('png', 'svg'), workers=workers)
+    assert written == [spec.name + extension for spec in specs for extension in ('.png', '.svg')]
+    for filename in written:
+        assert os.path.getsize(filename) > 0
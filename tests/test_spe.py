@@ -0,0 +1,82 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from . import DATA, CONTROL, read
+from SPEparse import SPEparser, open_parser
+from VAMASwrite import VAMASwriter
+from vamas_background import quantify
+from vamas_depth import DepthProfile
+
+# native files with a VAMAS export next to them
+PAIRS = [
+    (os.path.join(DATA, '211124', '102.1.control.spe'), os.path.join(DATA, '211124', '102.1.control.vms')),
+    (os.path.join(DATA, '211124', '109.1.control.spe'), CONTROL),
+    (os.path.join(DATA, '211216', '103.1.ITOSA5ei_1.pro'), os.path.join(DATA, '211216', '103.1.itosa5ei_depth.vms')),
+]
+
+RSF = {'In3d5': 4.53, 'Sn3d5': 4.89, 'O1s': 0.733, 'C1s': 0.314}
+
+@pytest.mark.parametrize('native, export', PAIRS)
+@pytest.mark.parametrize('memory_map', [False, True])
+def test_matches_vamas_export(native, export, memory_map):
+    parser = open_parser(native, memory_map=memory_map)
+    assert isinstance(parser, SPEparser)
+    expected = open_parser(export)
+    assert len(parser.blocks) == len(expected.blocks)
+    for block, expected_block in zip(parser.blocks, expected.blocks):
+        assert block.block_identifier == expected_block.block_identifier
+        assert block.value_of_experimental_variable == expected_block.value_of_experimental_variable
+        np.testing.assert_allclose(parser.block_x_vals(block), expected.block_x_vals(expected_block))
+        # both in counts, although the native file stores c/s
+        assert block.ordinate_value.dtype == np.float64
+        assert block.corresponding_variable_units[0] == expected_block.corresponding_variable_units[0]
+        assert block.signal_collection_time == expected_block.signal_collection_time
+        np.testing.assert_allclose(block.ordinate_value[0], expected_block.ordinate_value[0], atol=0.01)
+
+def test_accepts_read_vamas_keywords():
+    parser = SPEparser(PAIRS[0][0])
+    parser.read_VAMAS(lazy=True, cache_size=8)
+    assert len(parser.blocks) > 0
+    with pytest.raises(TypeError):
+        SPEparser(PAIRS[0][0]).read_VAMAS(stats=object())
+
+def test_depth_profile_and_write(tmp_path):
+    parser = open_parser(PAIRS[2][0])
+    profile = DepthProfile(parser)
+    assert profile.regions == DepthProfile(open_parser(PAIRS[2][1])).regions
+
+    path = str(tmp_path / 'converted.vms')
+    VAMASwriter(parser).write(path)
+    converted = read(path)
+    for block, expected in zip(converted.blocks, parser.blocks):
+        assert block.block_identifier == expected.block_identifier
+        np.testing.assert_allclose(block.ordinate_value, expected.ordinate_value, rtol=1e-6)
+
+def test_read_twice():
+    parser = SPEparser(PAIRS[2][0])
+    parser.read_SPE()
+    first = [block.ordinate_value.copy() for block in parser.blocks]
+    parser.read_SPE(memory_map=True)
+    assert len(parser.blocks) == len(first)
+    assert not isinstance(parser.header['FileDesc'], list)
+    for block, values in zip(parser.blocks, first):
+        np.testing.assert_array_equal(block.ordinate_value, values)
+
+def test_quantify_native_depth_profile():
+    native, export = PAIRS[2]
+    areas, concentrations = quantify(DepthProfile(open_parser(native)), RSF)
+    expected_areas, expected = quantify(DepthProfile(open_parser(export)), RSF)
+    for region in expected_areas:
+        np.testing.assert_allclose(concentrations[region], expected[region], atol=0.01)
+
+def test_not_a_native_file():
+    with pytest.raises(ValueError):
+        SPEparser(PAIRS[0][1]).read_SPE()
+
+@pytest.mark.parametrize('native', sorted(glob.glob(os.path.join(DATA, '*', '*.spe'))))
+def test_every_example_spectrum_reads(native):
+    parser = open_parser(native)
+    assert parser.VAMASExperiment.number_of_blocks == len(parser.blocks) > 0
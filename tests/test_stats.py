@@ -0,0 +1,59 @@
+import gzip
+import json
+
+import numpy as np
+import pytest
+
+from . import DEPTH, read
+from VAMASparse import VAMASparser
+from VAMASstats import ParseStats
+
+with open(DEPTH, 'rb') as file:
+    CONTENTS = file.read()
+# the blocks end before the 'end of experiment' line
+BLOCKS_END = CONTENTS.rindex(b'end of experiment')
+
+@pytest.fixture(scope='module')
+def expected():
+    parser = read(DEPTH)
+    return parser
+
+@pytest.mark.parametrize('memory_map', [False, True])
+def test_eager_stats(expected, memory_map):
+    events = []
+    stats = ParseStats(hooks=[lambda event, record: events.append(event)])
+    parser = VAMASparser(DEPTH)
+    parser.read_VAMAS(memory_map=memory_map, stats=stats)
+    for block, expected_block in zip(parser.blocks, expected.blocks):
+        np.testing.assert_array_equal(block.ordinate_value, expected_block.ordinate_value)
+
+    assert events == ['header'] + ['block']*len(parser.blocks) + ['file']
+    assert stats.filename == DEPTH
+    assert stats.bytes_read == BLOCKS_END
+    assert stats.lines == CONTENTS.count(b'\n', 0, BLOCKS_END)
+    assert stats.header_lines + sum(record.lines for record in stats.blocks) == stats.lines
+    assert stats.num_blocks == len(stats.blocks) == len(parser.blocks)
+    assert stats.lines_per_second > 0
+    for record, block in zip(stats.blocks, parser.blocks):
+        assert record.block_identifier == block.block_identifier
+        assert min(record.metadata_time, record.read_time, record.convert_time) >= 0
+        assert record.ordinate_bytes == block.ordinate_value.nbytes
+    assert stats.metadata_time == pytest.approx(sum(record.metadata_time for record in stats.blocks))
+    json.dumps(stats.as_dict())
+    json.dumps(stats.blocks[0].as_dict())
+
+def test_lazy_stats(tmp_path, expected):
+    path = tmp_path / 'depth.vms.gz'
+    path.write_bytes(gzip.compress(CONTENTS))
+    stats = ParseStats(blocks=False)
+    with VAMASparser(str(path)) as parser:
+        parser.read_VAMAS(lazy=True, stats=stats)
+        assert stats.lines == CONTENTS.count(b'\n', 0, BLOCKS_END)
+        assert stats.bytes_read == BLOCKS_END
+        assert stats.blocks == [] and stats.read_time == 0
+        assert parser.blocks[5].block_identifier == expected.blocks[5].block_identifier
+
+def test_without_stats_reads_the_same(expected):
+    parser = VAMASparser(DEPTH)
+    parser.read_VAMAS(stats=None)
+    assert len(parser.blocks) == len(expected.blocks)
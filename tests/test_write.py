@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+import pytest
+
+from . import DATA, read
+from VAMASwrite import VAMASwriter
+
+FILES = [
+    os.path.join(DATA, '211124', '110.4.fii.vms'),
+    os.path.join(DATA, '211216', '103.1.itosa5ei_depth.vms'),
+]
+
+@pytest.mark.parametrize('filename', FILES)
+def test_round_trip(tmp_path, filename):
+    parser = read(filename)
+    path = str(tmp_path / 'written.vms')
+    VAMASwriter(parser).write(path)
+    written = read(path)
+    assert len(written.blocks) == len(parser.blocks)
+    for block, expected in zip(written.blocks, parser.blocks):
+        for option, value in expected.items():
+            if option.name not in ('ordinate_value', 'minimum_ordinate_value', 'maximum_ordinate_value'):
+                assert getattr(block, option.name) == value
+        np.testing.assert_array_equal(block.ordinate_value, expected.ordinate_value)
+
+def test_processed_values_update_footer(tmp_path):
+    parser = read(FILES[0])
+    for block in parser.blocks:
+        block.ordinate_value = block.ordinate_value - 0.5*block.ordinate_value.max()
+    path = str(tmp_path / 'processed.vms')
+    VAMASwriter(parser).write(path)
+    for block in read(path).blocks:
+        values = block.ordinate_value
+        assert [float(value) for value in block.minimum_ordinate_value] == list(values.min(axis=1))
+        assert [float(value) for value in block.maximum_ordinate_value] == list(values.max(axis=1))
@@ -0,0 +1,133 @@
+'''
+Reader for the acsummry.txt atomic concentration tables the Phi Versaprobe II writes
+next to depth profiles.
+'''
+
+import numpy as np
+from numpy.lib import recfunctions
+
+class ACSummary():
+    def __init__(self, filename):
+        '''
+        filename: full path+name of acsummry.txt file to read [string]
+
+        This is a class for reading atomic concentration summaries.
+        To parse the file, use ACSummary.read()
+        '''
+        self.filename = filename
+        # File Information section, e.g. {'File Name': ..., 'File Type': ..., 'Comment': ...}
+        self.file_info = {}
+        self.elements = ()
+        # structured array with an 'Abscissa' field and one field per element
+        self.table = None
+        # labelled rows (RSF, CorrectedRSF, Mean, Standard Deviation), as structured
+        # records with one field per element
+        self.rows = {}
+
+    def read(self):
+        '''
+        reads the file; the concentration rows are converted in one go
+
+        returns self.table
+        '''
+        with open(self.filename) as file:
+            lines = file.read().splitlines()
+
+        header = next((i for i, line in enumerate(lines) if line.split()[:1] == ['Abscissa']), None)
+        if header is None:
+            raise ValueError('%s has no Abscissa header, it is not an acsummry.txt table' % self.filename)
+        for line in lines[:header]:
+            if ':' in line:
+                key, value = line.split(':', 1)
+                self.file_info[key.strip()] = value.strip()
+        self.elements = tuple(lines[header].split()[1:])
+        num_elements = len(self.elements)
+
+        # labelled rows have no abscissa so they start with blanks, the data runs until
+        # the blank line before the Mean/Standard Deviation trailer
+        start = header + 1
+        while start < len(lines) and lines[start].strip() and lines[start][:1].isspace():
+            start = start + 1
+        end = start
+        while end < len(lines) and lines[end].strip():
+            end = end + 1
+
+        values = np.array(' '.join(lines[start:end]).split(), dtype=np.float64)
+        dtype = np.dtype([('Abscissa', np.float64)] + [(element, np.float64) for element in self.elements])
+        self.table = recfunctions.unstructured_to_structured(values.reshape(-1, num_elements + 1), dtype)
+
+        element_dtype = np.dtype([(element, np.float64) for element in self.elements])
+        for line in lines[header + 1:start] + lines[end:]:
+            words = line.split()
+            if len(words) > num_elements:
+                self.rows[' '.join(words[num_elements:])] = np.array(tuple(float(word)
+                    for word in words[:num_elements]), dtype=element_dtype)
+        return self.table
+
+    @property
+    def abscissa(self):
+        '''
+        returns abscissa (sputter time) of each row [float64 array]
+        '''
+        return self.table['Abscissa']
+
+    @property
+    def concentrations(self):
+        '''
+        returns atomic concentrations [float64 array of shape (n_rows, n_elements)]
+        '''
+        return recfunctions.structured_to_unstructured(self.table[list(self.elements)])
+
+    def block_rows(self, parser, time_scale=60.0):
+        '''
+        parser: parsed VAMASparser of the depth profile the summary belongs to
+        time_scale: factor from the abscissa to the experimental variable of the blocks;
+            60 for summaries in minutes and blocks in seconds of etch time
+
+        Joins the depth-profile blocks with the summary rows on sputter time
+
+        returns row of self.table for each block of parser [int array], -1 where a block's
+        time is not in the summary or it has no experimental variable
+        '''
+        times = self.abscissa*time_scale
+        order = np.argsort(times)
+        # NaN for blocks without an experimental variable, which match no row
+        block_times = np.array([parser.block_exp_variable(block) for block in parser.blocks])
+
+        position = np.clip(np.searchsorted(times[order], block_times), 1, max(len(times) - 1, 1))
+        # nearest of the two neighbouring rows
+        left = order[position - 1]
+        right = order[np.minimum(position, len(times) - 1)]
+        rows = np.where(np.abs(times[left] - block_times) <= np.abs(times[right] - block_times), left, right)
+        return np.where(np.isclose(times[rows], block_times, atol=1e-6*time_scale), rows, -1)
+
+def read_acsummries(filenames):
+    '''
+    filenames: list of full path+name of acsummry.txt files [strings]
+
+    Reads many summaries into one table. Elements missing from a file are NaN.
+
+    returns list of ACSummary and structured array with a 'file' field (index into
+    filenames), 'Abscissa' and one field per element found in any file
+    '''
+    summaries = []
+    for filename in filenames:
+        summary = ACSummary(filename)
+        summary.read()
+        summaries.append(summary)
+
+    elements = list(dict.fromkeys(element for summary in summaries for element in summary.elements))
+    dtype = np.dtype([('file', np.int32), ('Abscissa', np.float64)]
+        + [(element, np.float64) for element in elements])
+    table = np.empty(sum(len(summary.table) for summary in summaries), dtype=dtype)
+    for element in elements:
+        table[element] = np.nan
+
+    row = 0
+    for i, summary in enumerate(summaries):
+        rows = slice(row, row + len(summary.table))
+        table['file'][rows] = i
+        for name in summary.table.dtype.names:
+            table[name][rows] = summary.table[name]
+        row = rows.stop
+    return summaries, table
@@ -0,0 +1,215 @@
+'''
+Background subtraction, peak areas and atomic concentrations.
+
+All functions take an energy axis x of shape (n_points,) and intensities y of shape
+(n_spectra, n_points) (or a single spectrum of shape (n_points,)), and work on all spectra
+at once, e.g. every cycle of a region of a DepthProfile. x may be ascending or descending.
+'''
+
+import numpy as np
+
+# universal cross section of Tougaard (Surface and Interface Analysis 11, 453 (1988)) [eV^2]
+TOUGAARD_B = 2866.0
+TOUGAARD_C = 1643.0
+
+def ascending(x, y):
+    '''
+    x: energy axis
+    y: intensities with energy along the last axis
+
+    returns x and y ordered by increasing x, and whether they were flipped
+    '''
+    y = np.atleast_2d(np.asarray(y, dtype=np.float64))
+    if x[0] > x[-1]:
+        return x[::-1], y[:, ::-1], True
+    return x, y, False
+
+def restore_order(background, flipped, shape):
+    '''
+    background: background computed on the ascending axis
+    flipped: whether the axis was flipped by ascending
+    shape: shape of the original intensities
+
+    returns background in the order and shape of the original intensities
+    '''
+    if flipped:
+        background = background[:, ::-1]
+    return background.reshape(shape)
+
+def end_levels(y, average):
+    '''
+    y: intensities on an ascending axis [array of shape (n_spectra, n_points)]
+    average: number of points averaged at each end
+
+    returns intensity at the low and high energy ends [arrays of shape (n_spectra, 1)]
+    '''
+    return y[:, :average].mean(axis=1, keepdims=True), y[:, -average:].mean(axis=1, keepdims=True)
+
+def linear_background(x, y, average=1):
+    '''
+    x: energy axis [float64 array of shape (n_points,)]
+    y: intensities [float64 array of shape (n_spectra, n_points) or (n_points,)]
+    average: number of points averaged at each end for the end levels
+
+    returns straight line background between the end levels, same shape as y
+    '''
+    shape = np.shape(y)
+    x, y, flipped = ascending(x, y)
+    low, high = end_levels(y, average)
+    fraction = (x - x[0])/(x[-1] - x[0])
+    return restore_order(low + (high - low)*fraction, flipped, shape)
+
+def shirley_background(x, y, average=1, max_iterations=50, tolerance=1e-6):
+    '''
+    x: binding energy axis [float64 array of shape (n_points,)]
+    y: intensities [float64 array of shape (n_spectra, n_points) or (n_points,)]
+    average: number of points averaged at each end for the end levels
+    max_iterations: maximum number of Shirley iterations
+    tolerance: iterations stop once no background point changes by more than
+        tolerance times the step between the end levels
+
+    Iterative Shirley background: at each energy, the background rises from the low
+    binding energy level by the fraction of the peak area (above the background) lying at
+    lower binding energy. All spectra are iterated together.
+
+    returns background, same shape as y
+    '''
+    shape = np.shape(y)
+    x, y, flipped = ascending(x, y)
+    low, high = end_levels(y, average)
+    step = high - low
+    scale = max(np.abs(step).max(), np.finfo(np.float64).tiny)
+    half_dx = 0.5*np.diff(x)
+
+    background = np.repeat(low, y.shape[1], axis=1)
+    cumulative = np.zeros_like(y)
+    for iteration in range(max_iterations):
+        signal = y - background
+        # area from the low binding energy end up to each point
+        np.cumsum((signal[:, 1:] + signal[:, :-1])*half_dx, axis=1, out=cumulative[:, 1:])
+        total = cumulative[:, -1:]
+        total = np.where(total == 0, 1, total)
+        new_background = low + step*cumulative/total
+        change = np.abs(new_background - background).max()
+        background = new_background
+        if change <= tolerance*scale:
+            break
+    return restore_order(background, flipped, shape)
+
+def tougaard_background(x, y, average=1, B=TOUGAARD_B, C=TOUGAARD_C):
+    '''
+    x: binding energy axis [float64 array of shape (n_points,)], evenly spaced
+    y: intensities [float64 array of shape (n_spectra, n_points) or (n_points,)]
+    average: number of points averaged at each end for the end levels
+    B, C: parameters of the universal cross section B*T/(C + T^2)^2 [eV^2]
+
+    Tougaard background from the universal inelastic cross section, with the low binding
+    energy level subtracted first. The loss integral is one matrix product for all
+    spectra; each background is then scaled to meet the spectrum at the high binding
+    energy end.
+
+    returns background, same shape as y
+    '''
+    shape = np.shape(y)
+    x, y, flipped = ascending(x, y)
+    low, high = end_levels(y, average)
+    signal = y - low
+
+    # K[i, j] = cross section for losing x[i] - x[j] (only losses, j < i)
+    loss = x[:, None] - x[None, :]
+    kernel = np.where(loss > 0, B*loss/(C + loss**2)**2, 0)
+    background = signal @ kernel.T*abs(x[1] - x[0])
+
+    end = background[:, -1:]
+    scale = np.where(end == 0, 0, (high - low)/np.where(end == 0, 1, end))
+    return restore_order(low + scale*background, flipped, shape)
+
+def peak_areas(x, y, background=None):
+    '''
+    x: energy axis [float64 array of shape (n_points,)]
+    y: intensities [float64 array of shape (n_spectra, n_points) or (n_points,)]
+    background: background to subtract, same shape as y, None for none
+
+    returns trapezoidal area of y above background for each spectrum [float64 array
+    of shape (n_spectra,)]
+    '''
+    y = np.atleast_2d(y)
+    if background is not None:
+        y = y - np.atleast_2d(background)
+    return np.sum(0.5*(y[:, 1:] + y[:, :-1])*np.abs(np.diff(x)), axis=1)
+
+BACKGROUNDS = {
+    'linear': linear_background,
+    'shirley': shirley_background,
+    'tougaard': tougaard_background,
+}
+
+def match_rsf(regions, rsf):
+    '''
+    regions: region names, e.g. DepthProfile.regions ('In 3d5', 'O 1s', ...)
+    rsf: dictionary of element label: RSF, e.g. from an acsummry.txt ('In3d5', 'O1s', ...)
+
+    returns dictionary of region: RSF, matching labels without spaces
+    '''
+    matched = {}
+    for region in regions:
+        name = region.replace(' ', '').lower()
+        for label, value in rsf.items():
+            label_name = label.replace(' ', '').lower()
+            if label_name.startswith(name) or name.startswith(label_name):
+                matched[region] = value
+                break
+        else:
+            raise KeyError('no RSF for region %s' % region)
+    return matched
+
+def quantify(profile, rsf, method='shirley', windows=None, regions=None, **background_options):
+    '''
+    profile: DepthProfile
+    rsf: dictionary of region or element label: relative sensitivity factor; an ACSummary
+        row works too, e.g. summary.rows['RSF'] (labels are matched with match_rsf)
+    method: background, one of BACKGROUNDS
+    windows: optional dictionary of region: (lower, upper) binding energy window
+    regions: regions to quantify, by default all regions of profile
+    background_options: passed on to the background function
+
+    Subtracts the background from every cycle of each region at once, integrates the
+    peak areas and converts them to atomic concentrations. Regions are usually acquired
+    with different dwell times, so each area is divided by the acquisition time of its
+    block (DepthProfile.acquisition_time) before the RSF: (area/time/RSF) normalized to 100%
+
+    returns dictionary of region: peak areas [counts, float64 array of shape (n_cycles,)], and
+    structured array with a 'sputter_time' field and one atomic concentration [%] field
+    per region
+    '''
+    if regions is None:
+        regions = profile.regions
+    windows = windows or {}
+    if not isinstance(rsf, dict):
+        rsf = {name: float(rsf[name]) for name in rsf.dtype.names}
+    rsf = match_rsf(regions, rsf)
+    background_function = BACKGROUNDS[method]
+
+    areas = {}
+    for region in regions:
+        x = profile.binding_energy[region]
+        y = profile.intensity[region]
+        if region in windows:
+            lower, upper = windows[region]
+            inside = (x >= lower) & (x <= upper)
+            x = x[inside]
+            y = y[:, inside]
+        areas[region] = peak_areas(x, y, background_function(x, y, **background_options))
+
+    num_cycles = min(len(area) for area in areas.values())
+    corrected = np.array([areas[region][:num_cycles]/profile.acquisition_time[region][:num_cycles]/rsf[region]
+        for region in regions])
+    total = corrected.sum(axis=0)
+    total = np.where(total == 0, 1, total)
+
+    concentrations = np.empty(num_cycles, dtype=[('sputter_time', np.float64)]
+        + [(region, np.float64) for region in regions])
+    concentrations['sputter_time'] = profile.sputter_time[regions[0]][:num_cycles]
+    for region, region_corrected in zip(regions, corrected):
+        concentrations[region] = 100*region_corrected/total
+    return areas, concentrations
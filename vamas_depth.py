@@ -0,0 +1,137 @@
+'''
+Depth profiles as (cycle x energy) arrays, one per region.
+'''
+
+from collections import OrderedDict
+
+import numpy as np
+
+def region_name(block_identifier):
+    '''
+    block_identifier: block identifier of a depth-profile block, e.g. 'In 3d5 10'
+
+    returns region of the block without the cycle number, e.g. 'In 3d5'
+    '''
+    return block_identifier.rsplit(' ', 1)[0]
+
+def acquisition_time(block):
+    '''
+    block: VAMASBlock
+
+    returns time counted per point of block, signal_collection_time times number_of_scans [s]
+    '''
+    return float(block.signal_collection_time)*float(block.number_of_scans)
+
+class DepthProfile():
+    def __init__(self, parser, variable_index=None, region_key=region_name):
+        '''
+        parser: parsed VAMASparser of a depth profile
+        variable_index: index of the corresponding variable to stack, None for the first
+            one holding y values (the counts, see VAMASparser.first_ordinate_index)
+        region_key: function from block_identifier to region, blocks of the same region
+            are stacked together
+
+        Stacks the blocks of each region, in one pass over the blocks, into
+            intensity[region]         float64 array of shape (n_cycles, n_points)
+            binding_energy[region]    float64 array of shape (n_points,), shared by all cycles
+            sputter_time[region]      float64 array of shape (n_cycles,), the experimental
+                                      variable of each block (units in time_units), NaN
+                                      if the file has none (time_units is then None)
+            block_indices[region]     int array of the blocks in each row
+            acquisition_time[region]  float64 array of shape (n_cycles,), the time counted
+                                      per point of each block (signal_collection_time
+                                      times number_of_scans) [s]
+        '''
+        self.regions = []
+        self.intensity = {}
+        self.binding_energy = {}
+        self.sputter_time = {}
+        self.block_indices = {}
+        self.acquisition_time = {}
+
+        if variable_index is None:
+            variable_index = parser.first_ordinate_index()
+        experiment = parser.VAMASExperiment
+        self.time_units = experiment.exp_variable_unit[0] if experiment.number_of_exp_variables else None
+
+        rows = OrderedDict()
+        first_blocks = {}
+        for block_index, block in enumerate(parser.blocks):
+            region = region_key(block.block_identifier)
+            first = first_blocks.setdefault(region, block)
+            if first is block:
+                rows[region] = []
+                self.binding_energy[region] = parser.get_binding_energy_axis(block_index)[0]
+            elif not np.array_equal(parser.block_x_vals(block), parser.block_x_vals(first)):
+                raise ValueError('block %s does not share the energy axis of region %s'
+                    % (block.block_identifier, region))
+            rows[region].append((block_index, parser.block_exp_variable(block),
+                block.ordinate_value[variable_index], acquisition_time(block)))
+
+        for region, region_rows in rows.items():
+            self.regions.append(region)
+            self.block_indices[region] = np.array([row[0] for row in region_rows])
+            self.sputter_time[region] = np.array([row[1] for row in region_rows])
+            self.intensity[region] = np.array([row[2] for row in region_rows])
+            self.acquisition_time[region] = np.array([row[3] for row in region_rows])
+
+        # labels and units for plotting
+        self.energy_units = self.intensity_label = self.intensity_units = None
+        if self.regions:
+            first = first_blocks[self.regions[0]]
+            self.energy_units = first.abscissa_units
+            self.intensity_label = first.corresponding_variable_label[variable_index]
+            self.intensity_units = first.corresponding_variable_units[variable_index]
+
+    def num_cycles(self, region):
+        '''
+        region: region name
+
+        returns number of cycles (rows) of region
+        '''
+        return len(self.intensity[region])
+
+    def offset(self, region, offset):
+        '''
+        region: region name
+        offset: vertical offset between successive cycles
+
+        returns intensity of region with cycle i shifted down by i*offset
+        '''
+        return apply_offsets(self.intensity[region], offset)
+
+    def normalized(self, region):
+        '''
+        region: region name
+
+        returns intensity of region with each cycle scaled to a maximum of 1
+        '''
+        intensity = self.intensity[region]
+        return intensity/intensity.max(axis=1, keepdims=True)
+
+    def integrate(self, region, lower=None, upper=None):
+        '''
+        region: region name
+        lower, upper: binding energy window to integrate over, None for the whole range
+
+        returns trapezoidal area under each cycle [float64 array of shape (n_cycles,)]
+        '''
+        x = self.binding_energy[region]
+        y = self.intensity[region]
+        inside = np.ones(len(x), dtype=bool)
+        if lower is not None:
+            inside = inside & (x >= lower)
+        if upper is not None:
+            inside = inside & (x <= upper)
+        x = x[inside]
+        y = y[:, inside]
+        return np.sum(0.5*(y[:, 1:] + y[:, :-1])*np.abs(np.diff(x)), axis=1)
+
+def apply_offsets(intensity, offset):
+    '''
+    intensity: float64 array of shape (n_cycles, n_points)
+    offset: vertical offset between successive cycles
+
+    returns intensity with row i shifted down by i*offset
+    '''
+    return intensity - offset*np.arange(len(intensity))[:, None]
@@ -0,0 +1,166 @@
+'''
+Peak detection over batches of spectra and identification against reference energies.
+'''
+
+import numpy as np
+from scipy.signal import find_peaks
+
+# selected XPS binding energies (from ThermoFisher)
+xps_energies = {
+    'Sn':485.2, 'SnO':486, 'SnO2':486.6,
+    'In':443.8, 'In2O3':444, 'In2O3 3p3/2': 666.4,
+    'O (metal)': 529, 'C-O':533, 'C=O':532,
+    'Na': 1071,
+    'C-C': 284.8, 'C-O-C': 286, 'O-C=O': 288.5
+}
+
+PEAK_DTYPE = np.dtype([
+    ('spectrum', np.int64),
+    ('energy', np.float64),
+    ('intensity', np.float64),
+    ('prominence', np.float64),
+    ('label', 'U32'),
+    ('reference_energy', np.float64),
+    ('shift', np.float64),
+])
+
+class ReferenceTable():
+    def __init__(self, energies=xps_energies):
+        '''
+        energies: dictionary of label: binding energy [eV]
+
+        Reference energies kept sorted, so peaks are matched by binary search.
+        Extend it with ReferenceTable.update()
+        '''
+        self.labels = np.empty(0, dtype='U32')
+        self.energies = np.empty(0)
+        self.update(energies)
+
+    def update(self, energies):
+        '''
+        energies: dictionary of label: binding energy [eV] to add
+        '''
+        labels = np.concatenate((self.labels, np.array(list(energies.keys()), dtype='U32')))
+        values = np.concatenate((self.energies, np.array(list(energies.values()), dtype=np.float64)))
+        order = np.argsort(values, kind='stable')
+        self.labels = labels[order]
+        self.energies = values[order]
+
+    def __len__(self):
+        return len(self.energies)
+
+    def match(self, energies, tolerance=1.0):
+        '''
+        energies: peak energies to identify [float64 array]
+        tolerance: maximum distance to a reference energy [eV]
+
+        returns index of the nearest reference energy for each peak [int array], -1 where
+        none is within tolerance
+        '''
+        energies = np.asarray(energies, dtype=np.float64)
+        if len(self.energies) == 0:
+            return np.full(len(energies), -1)
+        right = np.clip(np.searchsorted(self.energies, energies), 0, len(self.energies) - 1)
+        left = np.clip(right - 1, 0, len(self.energies) - 1)
+        nearest = np.where(np.abs(self.energies[left] - energies) <= np.abs(self.energies[right] - energies),
+            left, right)
+        return np.where(np.abs(self.energies[nearest] - energies) <= tolerance, nearest, -1)
+
+def noise_level(y):
+    '''
+    y: intensities [float64 array of shape (n_spectra, n_points) or (n_points,)]
+
+    Robust noise estimate from the median absolute second difference, which is
+    insensitive to the peaks themselves
+
+    returns standard deviation of the noise of each spectrum [float64 array of shape (n_spectra,)]
+    '''
+    y = np.atleast_2d(y)
+    second_difference = np.diff(y, n=2, axis=1)
+    return np.median(np.abs(second_difference), axis=1)/(0.6745*np.sqrt(6))
+
+def find_peaks_batch(x, y, prominence=None, noise_factor=5.0, references=None, tolerance=1.0):
+    '''
+    x: binding energy axis [float64 array of shape (n_points,)]
+    y: intensities [float64 array of shape (n_spectra, n_points) or (n_points,)]
+    prominence: minimum peak prominence, None to use noise_factor times the noise level
+        of each spectrum
+    noise_factor: prominence in units of the noise level when prominence is None
+    references: ReferenceTable to identify peaks with, None for the default table
+    tolerance: maximum distance of a peak to its reference energy [eV]
+
+    returns peak table [structured array of PEAK_DTYPE], one row per peak with the index
+    of its spectrum; unidentified peaks have an empty label and NaN reference_energy and shift
+    '''
+    y = np.atleast_2d(y)
+    if prominence is None:
+        prominences = noise_factor*noise_level(y)
+    else:
+        prominences = np.full(len(y), prominence, dtype=np.float64)
+
+    spectra = []
+    indices = []
+    peak_prominences = []
+    for spectrum, (row, row_prominence) in enumerate(zip(y, prominences)):
+        peaks, properties = find_peaks(row, prominence=max(row_prominence, np.finfo(np.float64).tiny))
+        spectra.append(np.full(len(peaks), spectrum))
+        indices.append(peaks)
+        peak_prominences.append(properties['prominences'])
+
+    spectra = np.concatenate(spectra) if spectra else np.empty(0, dtype=np.int64)
+    indices = np.concatenate(indices) if indices else np.empty(0, dtype=np.int64)
+    table = np.zeros(len(indices), dtype=PEAK_DTYPE)
+    table['spectrum'] = spectra
+    table['energy'] = x[indices]
+    table['intensity'] = y[spectra, indices]
+    table['prominence'] = np.concatenate(peak_prominences) if peak_prominences else []
+    identify(table, references, tolerance)
+    return table
+
+def identify(table, references=None, tolerance=1.0):
+    '''
+    table: peak table [structured array of PEAK_DTYPE]
+    references: ReferenceTable, None for the default table
+    tolerance: maximum distance of a peak to its reference energy [eV]
+
+    fills in label, reference_energy and shift (energy - reference_energy) of table
+    '''
+    if references is None:
+        references = ReferenceTable()
+    matches = references.match(table['energy'], tolerance)
+    found = matches >= 0
+    table['label'] = ''
+    table['reference_energy'] = np.nan
+    table['label'][found] = references.labels[matches[found]]
+    table['reference_energy'][found] = references.energies[matches[found]]
+    table['shift'] = table['energy'] - table['reference_energy']
+
+def parser_peaks(parser, variable_index=None, **options):
+    '''
+    parser: parsed VAMASparser
+    variable_index: corresponding variable to search, None for the first one holding
+        y values (the counts, see VAMASparser.first_ordinate_index)
+    options: passed on to find_peaks_batch
+
+    Blocks sharing the same binding energy axis are searched as one batch
+
+    returns peak table [structured array of PEAK_DTYPE] with spectrum the block index
+    '''
+    if variable_index is None:
+        variable_index = parser.first_ordinate_index()
+    groups = {}
+    for block_index, block in enumerate(parser.blocks):
+        # the x values themselves, so irregular scans are grouped correctly too
+        key = (parser.block_x_vals(block).tobytes(), block.analysis_source_characteristic_energy)
+        groups.setdefault(key, []).append(block_index)
+
+    tables = []
+    for block_indices in groups.values():
+        x = parser.get_binding_energy_axis(block_indices[0])[0]
+        y = np.array([parser.blocks[block_index].ordinate_value[variable_index] for block_index in block_indices])
+        table = find_peaks_batch(x, y, **options)
+        table['spectrum'] = np.array(block_indices)[table['spectrum']]
+        tables.append(table)
+
+    table = np.concatenate(tables) if tables else np.zeros(0, dtype=PEAK_DTYPE)
+    return table[np.argsort(table['spectrum'], kind='stable')]
@@ -0,0 +1,231 @@
+'''
+Headless batch rendering of the spectra, high_res, depth and acsummary figures.
+
+The figures are described by FigureSpec objects holding only the data arrays and labels, built
+from a single parse in the main process, and drawn on object-oriented Figure instances (Agg
+canvas, no pyplot state) in a pool of worker processes, one figure per task.
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import matplotlib as mpl
+import matplotlib.colors
+from matplotlib.cm import ScalarMappable
+from matplotlib.figure import Figure
+import numpy as np
+
+from vamas_depth import apply_offsets
+from vamas_helpers import colorFader
+
+try:
+    import tikzplotlib
+except ImportError:
+    tikzplotlib = None
+
+# font sizes main.py sets on the pyplot state, passed on to the workers explicitly
+RC_PARAMS = {
+    'font.size': 12,
+    'axes.titlesize': 12,
+    'axes.labelsize': 14,
+    'xtick.labelsize': 12,
+    'ytick.labelsize': 12,
+    'legend.fontsize': 12,
+    'figure.titlesize': 16,
+}
+
+class FigureSpec():
+    def __init__(self, name, lines, xlabel, ylabel, title=None, binding_energy=True, legend=True,
+        ylim=None, colorbar=None):
+        '''
+        name: output path without extension, e.g. 'figures/O 1s' [string]
+        lines: list of (x, y, keyword arguments of Axes.plot)
+        xlabel, ylabel: axis labels
+        title: axes title, None for none
+        binding_energy: reversed x axis with the y ticks hidden, as plot_formatting does
+        legend: draw a legend
+        ylim: (bottom, top), None for automatic
+        colorbar: None, or dictionary with 'colors', 'vmax' and 'label' for a colorbar
+            of the line colors from 0 to vmax (depth profiles)
+
+        Picklable description of one figure
+        '''
+        self.name = name
+        self.lines = lines
+        self.xlabel = xlabel
+        self.ylabel = ylabel
+        self.title = title
+        self.binding_energy = binding_energy
+        self.legend = legend
+        self.ylim = ylim
+        self.colorbar = colorbar
+
+def draw(spec):
+    '''
+    spec: FigureSpec
+
+    returns Figure drawn from spec, not attached to pyplot
+    '''
+    figure = Figure()
+    axes = figure.add_subplot()
+    for x, y, options in spec.lines:
+        axes.plot(x, y, **options)
+
+    if spec.binding_energy:
+        x = np.concatenate([line[0] for line in spec.lines])
+        axes.set_xlim(x.max() + 1, x.min() - 1)
+        axes.tick_params(axis='y', which='both', left=False, labelleft=False)
+    axes.set_xlabel(spec.xlabel)
+    axes.set_ylabel(spec.ylabel)
+    if spec.ylim is not None:
+        axes.set_ylim(spec.ylim)
+    if spec.title is not None:
+        axes.set_title(spec.title)
+    if spec.colorbar is not None:
+        cmap = matplotlib.colors.ListedColormap(spec.colorbar['colors'])
+        norm = mpl.colors.Normalize(0, spec.colorbar['vmax'])
+        colorbar = figure.colorbar(ScalarMappable(norm=norm, cmap=cmap), ax=axes, label=spec.colorbar['label'])
+        colorbar.ax.invert_yaxis()
+    if spec.legend:
+        axes.legend()
+    return figure
+
+def render(spec, formats=('svg',), rc=RC_PARAMS):
+    '''
+    spec: FigureSpec
+    formats: file formats to write, any matplotlib format (svg, png, pdf, ...) or 'tex'
+        for a TikZ file (needs tikzplotlib)
+    rc: matplotlib rc parameters to draw with
+
+    worker for render_all: draws and saves one figure
+
+    returns list of the files written
+    '''
+    written = []
+    with mpl.rc_context(rc):
+        figure = draw(spec)
+        for file_format in formats:
+            if file_format == 'tex':
+                if tikzplotlib is None:
+                    raise ImportError('tikzplotlib is needed for TikZ output')
+                filename = spec.name + '_tikzplot.tex'
+                tikzplotlib.save(filename, figure=figure)
+            else:
+                filename = spec.name + '.' + file_format
+                figure.savefig(filename, format=file_format)
+            written.append(filename)
+    return written
+
+def render_all(specs, formats=('svg',), rc=RC_PARAMS, workers=None):
+    '''
+    specs: list of FigureSpec
+    formats: file formats to write for each figure, see render
+    rc: matplotlib rc parameters to draw with
+    workers: number of worker processes; None uses one per CPU, 1 renders in this process
+
+    returns list of the files written, in the order of specs
+    '''
+    for spec in specs:
+        folder = os.path.dirname(spec.name)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+    if workers == 1 or len(specs) < 2:
+        results = [render(spec, formats, rc) for spec in specs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(render, specs, [formats]*len(specs), [rc]*len(specs)))
+    return [filename for result in results for filename in result]
+
+def binding_energy_labels(parser, block_index=0, variable_index=None):
+    '''
+    parser: parsed VAMASparser
+    block_index: block to take the labels from
+    variable_index: corresponding variable plotted, None for the first one holding y values
+
+    returns x and y axis labels as plot_formatting writes them
+    '''
+    if variable_index is None:
+        variable_index = parser.first_ordinate_index()
+    xunits = parser.get_binding_energy_axis(block_index)[2]
+    ylabel = parser.get_y_vals(variable_index, block_index)[1]
+    return 'Binding Energy [' + xunits + ']', ylabel + ' [a.u.]'
+
+def spectra_figure(parsers, labels, colors, offset=0, name='spectra'):
+    '''
+    parsers: parsed VAMASparsers, the first block of each is plotted
+    labels, colors: legend label and color of each parser
+    offset: vertical offset between successive spectra
+    name: output path without extension
+
+    returns FigureSpec of the overlaid spectra
+    '''
+    lines = []
+    for i, (parser, label, color) in enumerate(zip(parsers, labels, colors)):
+        x = parser.get_binding_energy_axis(0)[0]
+        y = parser.get_y_vals(parser.first_ordinate_index(), 0)[0]
+        lines.append((x, y + i*offset, {'label': label, 'color': color}))
+    xlabel, ylabel = binding_energy_labels(parsers[-1])
+    return FigureSpec(name, lines, xlabel, ylabel)
+
+def high_res_figures(parsers, labels, colors, folder=''):
+    '''
+    parsers: parsed VAMASparsers with the same high resolution regions
+    labels, colors: legend label and color of each parser
+    folder: folder to write the figures to
+
+    returns list of FigureSpec, one per block of the last parser, named by block identifier
+    '''
+    specs = []
+    for block_index, block in enumerate(parsers[-1].blocks):
+        lines = []
+        for parser, label, color in zip(parsers, labels, colors):
+            x = parser.get_binding_energy_axis(block_index)[0]
+            y = parser.get_y_vals(parser.first_ordinate_index(), block_index)[0]
+            lines.append((x, y, {'label': label, 'color': color}))
+        xlabel, ylabel = binding_energy_labels(parsers[-1], block_index)
+        specs.append(FigureSpec(os.path.join(folder, block.block_identifier), lines, xlabel, ylabel,
+            title=block.block_identifier))
+    return specs
+
+def depth_figures(profile, colors, offset, sputter_stop, titles=None, folder=''):
+    '''
+    profile: DepthProfile
+    colors: (first, last) color of the cycles
+    offset: vertical offset between successive cycles
+    sputter_stop: sputter time at the end of the colorbar [min]
+    titles: optional dictionary of stripped region name: title, e.g. {'O': 'Oxygen 1s'}
+    folder: folder to write the figures to
+
+    returns list of FigureSpec, one per region, with the first cycle left out as in main.py
+    '''
+    titles = titles or {}
+    specs = []
+    for region in profile.regions:
+        x = profile.binding_energy[region]
+        ys = apply_offsets(profile.intensity[region][1:], offset)
+        num_cycles = profile.num_cycles(region)
+        cmap_colors = [colorFader(colors[0], colors[1], i/max(num_cycles - 1, 1)) for i in range(num_cycles)]
+        lines = [(x, y, {'color': color}) for y, color in zip(ys, cmap_colors)]
+        specs.append(FigureSpec(os.path.join(folder, region), lines,
+            'Binding Energy [' + profile.energy_units + ']', profile.intensity_label + ' [a.u.]',
+            title=titles.get(region.strip(), region), legend=False,
+            colorbar={'colors': cmap_colors, 'vmax': sputter_stop, 'label': 'Sputter Time [min]'}))
+    return specs
+
+def acsummary_figure(abscissa, concentrations, elements, name='acsummary'):
+    '''
+    abscissa: sputter times [min]
+    concentrations: atomic concentrations [array of shape (n_elements, n_rows)]
+    elements: element labels
+    name: output path without extension
+
+    returns FigureSpec of the atomic concentrations against sputter time, styled as in main.py
+    '''
+    linetypes = np.flip(['-', ':', '--', '-.'])
+    lines = []
+    for i, (y, label) in enumerate(zip(np.flip(concentrations, 0), np.flip(elements))):
+        lines.append((abscissa, y, {'label': label, 'linestyle': linetypes[i % len(linetypes)],
+            'color': colorFader('black', 'gray', i/2)}))
+    return FigureSpec(name, lines, 'Sputter Time [min]', 'Atomic Concentration [%]',
+        binding_energy=False, ylim=(0, 100))